@@ -0,0 +1 @@
+"""Throughput benchmarks for the CyBot GUI hot paths (run with ``python -m benchmarks.<name>``)."""
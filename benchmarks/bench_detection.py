@@ -0,0 +1,81 @@
+"""Scans/sec of the point-by-point segmentation vs. the NumPy paths and the cache in cybot.detection.
+
+Both paths run over the same archive of synthetic sweeps. Every result is
+compared before timing, so a mismatch fails the run instead of only being slow.
+Run from the repo root:  python -m benchmarks.bench_detection [--scans N]
+"""
+import argparse
+import random
+import time
+
+from cybot.detection import DetectionCache, DetectionParams, detect_objects, detect_objects_batch
+from cybot.model import ScanPoint
+from cybot.protocol import parse_scan
+from cybot.scanbuffer import ScanBuffer
+from benchmarks.streams import scan_lines
+
+# SomewhatWorkingGUI.py / pathtrace.py thresholds
+PARAMS = (DetectionParams(750, 300, 250, 250.0, 3, 6.0), DetectionParams(600, 200, 150, 250.0, 3, 6.0))
+
+
+def scan_archive(count, seed=288):
+    rng = random.Random(seed)
+    scans = []
+    for _ in range(count):
+        scan = ScanBuffer()
+        for line in scan_lines(rng, objects=rng.randint(0, 6)):
+            if line.startswith("SCAN:"):
+                record = parse_scan(line[len("SCAN:"):])
+                if isinstance(record, ScanPoint):
+                    scan.append(record)
+        scans.append(scan)
+    return scans
+
+
+def run(scans, params, use_numpy):
+    t0 = time.perf_counter()
+    for scan in scans:
+        detect_objects(scan, params, use_numpy=use_numpy)
+    return time.perf_counter() - t0
+
+
+def run_batch(scans, params):
+    t0 = time.perf_counter()
+    detect_objects_batch(scans, params)
+    return time.perf_counter() - t0
+
+
+def run_cached(scans, params, cache):
+    """Redraw of already processed scans: every lookup is a hit."""
+    t0 = time.perf_counter()
+    for scan in scans:
+        cache.get(scan, params)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scans", type=int, default=2000, help="number of archived 92-point sweeps")
+    args = parser.parse_args()
+
+    scans = scan_archive(args.scans)
+    for params in PARAMS:
+        expected = [detect_objects(scan, params, use_numpy=False) for scan in scans]
+        assert [detect_objects(scan, params, use_numpy=True) for scan in scans] == expected, params
+        assert detect_objects_batch(scans, params) == expected, params
+        old_t = min(run(scans, params, False) for _ in range(args.repeat))
+        one_t = min(run(scans, params, True) for _ in range(args.repeat))
+        batch_t = min(run_batch(scans, params) for _ in range(args.repeat))
+        cache = DetectionCache(maxsize=len(scans))
+        assert [cache.get(scan, params)[1] for scan in scans] == expected, params
+        cached_t = min(run_cached(scans, params, cache) for _ in range(args.repeat))
+        print(f"{params}: {sum(map(len, expected))} objects in {len(scans)} scans, results identical")
+        print(f"  state machine:   {len(scans) / old_t:>10,.0f} scans/s")
+        print(f"  numpy per scan:  {len(scans) / one_t:>10,.0f} scans/s   speedup x{old_t / one_t:.2f}")
+        print(f"  numpy batch:     {len(scans) / batch_t:>10,.0f} scans/s   speedup x{old_t / batch_t:.2f}")
+        print(f"  cache hit:       {len(scans) / cached_t:>10,.0f} scans/s   speedup x{old_t / cached_t:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Lines/sec of the old parse_cybot_message if-chain vs. cybot.protocol.MessageDispatcher.
+
+Both sides parse every field a handler needs (STATUS fields, SCAN angle/dist/IR,
+MOVE angle/dist), build the same cybot.model record from it and hand that to a
+no-op sink, so only parsing and routing are measured, like for like. Run from the repo root:  python -m benchmarks.bench_dispatch
+"""
+import argparse
+import time
+
+from cybot.protocol import default_dispatcher
+from cybot.model import StatusSample, ScanPoint, ScanEnd, MoveEvent, BumpEvent
+from benchmarks.streams import session_lines
+
+
+# --- The old code paths, as they were in SomewhatWorkingGUI.py (GUI calls replaced by the sink) ---
+# The old handlers went on to convert the strings where they used them; here every path ends in
+# the record the dispatcher's handlers get, so both sides do the same work.
+def legacy_status(status_string, sink):
+    fields = {}
+    for part in status_string.split(','):
+        key_value = part.split('=')
+        if len(key_value) == 2:
+            fields[key_value[0].strip()] = key_value[1].strip()
+    sink(StatusSample.from_fields(fields))
+
+def legacy_scan(scan_data_string, sink):
+    angle_deg, dist_cm, ir_raw = None, None, None
+    for part in scan_data_string.split(','):
+        key_value = part.split('=')
+        if len(key_value) == 2:
+            key, value = key_value[0].strip(), key_value[1].strip()
+            if key == "ANGLE": angle_deg = float(value)
+            elif key == "DIST_CM": dist_cm = float(value)
+            elif key == "IR_RAW": ir_raw = int(value)
+    if angle_deg is not None and dist_cm is not None and ir_raw is not None:
+        sink(ScanPoint(angle_deg, dist_cm, ir_raw))
+
+def legacy_move(move_data_string, sink):
+    dist_cm, angle_deg_delta = 0.0, 0.0
+    for part in move_data_string.split(','):
+        key_value = part.split('=')
+        if len(key_value) == 2:
+            key, value = key_value[0].strip(), key_value[1].strip()
+            if key == "DIST_CM": dist_cm = float(value)
+            elif key == "ANGLE_DEG": angle_deg_delta = float(value)
+    sink(MoveEvent(angle_deg_delta, dist_cm))
+
+def legacy_parse(message, sink):
+    line = message.strip()
+    if not line: return
+    if "END SCAN" in line.upper() and line.startswith("SCAN:"):
+        sink(ScanEnd(line))
+        return
+    elif line.startswith("STATUS:"):
+        legacy_status(line[len("STATUS:"):], sink)
+    elif line.startswith("SCAN:"):
+        legacy_scan(line[len("SCAN:"):], sink)
+    elif line.startswith("MOVE:"):
+        legacy_move(line[len("MOVE:"):], sink)
+    elif line.startswith("BUMP_EVENT:"):
+        text = line[len("BUMP_EVENT:"):]
+        upper = text.upper()
+        sink(BumpEvent("LEFT" if "LEFT" in upper else "RIGHT" if "RIGHT" in upper else "", text))
+    elif line.startswith("INFO:") or line.startswith("DEBUG:") or line.startswith("ERROR:") or line.startswith("ACK:"):
+        pass
+
+
+def run_legacy(lines):
+    sink = [].append
+    t0 = time.perf_counter()
+    for line in lines:
+        legacy_parse(line, sink)
+    return time.perf_counter() - t0
+
+def run_dispatcher(lines):
+    sink = [].append
+    dispatcher = default_dispatcher()
+    for record_type in (StatusSample, ScanPoint, ScanEnd, MoveEvent, BumpEvent):
+        dispatcher.on(record_type, sink)
+    dispatch = dispatcher.dispatch
+    t0 = time.perf_counter()
+    for line in lines:
+        dispatch(line)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--scans", type=int, default=200, help="number of 92-point scans in the stream")
+    args = parser.parse_args()
+
+    # The framer hands lines over without the trailing newline
+    lines = [line.rstrip("\n") for line in session_lines(scans=args.scans)]
+    # Alternate the two so a noisy machine slows both alike; the best run of each counts
+    old_t = new_t = float("inf")
+    for _ in range(args.repeat):
+        old_t = min(old_t, run_legacy(lines))
+        new_t = min(new_t, run_dispatcher(lines))
+    print(f"Stream: {len(lines):,} lines")
+    print(f"if-chain:   {len(lines) / old_t:>12,.0f} lines/s")
+    print(f"dispatcher: {len(lines) / new_t:>12,.0f} lines/s   speedup x{old_t / new_t:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Lines/sec of the old str-split listener loop vs. cybot.framing.LineFramer.
+
+Run from the repo root:  python -m benchmarks.bench_framing [--repeat N]
+"""
+import argparse
+import queue
+import time
+
+from cybot.framing import LineFramer
+from benchmarks.streams import session_bytes
+
+
+class ReplaySocket:
+    """Minimal socket stand-in that hands out a byte string in recv-sized chunks."""
+
+    def __init__(self, data, chunk_size=1024):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.chunk_size = chunk_size
+
+    def recv(self, bufsize):
+        n = min(bufsize, self.chunk_size)
+        chunk = self.data[self.pos:self.pos + n].tobytes()
+        self.pos += len(chunk)
+        return chunk
+
+    def recv_into(self, view):
+        n = min(len(view), self.chunk_size, len(self.data) - self.pos)
+        view[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def legacy_listener(sock, sink):
+    """The loop body of the old listen_for_messages (recv(1024) + str buffer + split)."""
+    buffer = ""
+    count = 0
+    while True:
+        data_bytes = sock.recv(1024)
+        if not data_bytes:
+            return count
+        buffer += data_bytes.decode('utf-8', errors='replace')
+        while '\n' in buffer:
+            message, buffer = buffer.split('\n', 1)
+            sink(message + '\n')
+            count += 1
+
+
+def framer_listener(sock, sink):
+    """The new loop body: recv_into a reused buffer, one queue put per batch of lines."""
+    framer = LineFramer()
+    count = 0
+    while True:
+        lines = framer.recv_lines(sock)
+        if lines is None:
+            return count
+        if lines:
+            sink(lines)
+            count += len(lines)
+
+
+def run(listener, data, chunk_size, repeat):
+    best = None
+    lines = 0
+    for _ in range(repeat):
+        sink = queue.Queue() # Same thread-safe queue the GUI scripts use
+        sock = ReplaySocket(data, chunk_size)
+        t0 = time.perf_counter()
+        lines = listener(sock, sink.put)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return lines, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scans", type=int, default=200, help="number of 92-point scans in the stream")
+    args = parser.parse_args()
+
+    data = session_bytes(scans=args.scans)
+    print(f"Stream: {len(data) / 1024:.0f} KiB")
+    for chunk_size in (1024, 4096, 65536):
+        old_lines, old_t = run(legacy_listener, data, chunk_size, args.repeat)
+        new_lines, new_t = run(framer_listener, data, chunk_size, args.repeat)
+        assert old_lines == new_lines, (old_lines, new_lines)
+        print(f"chunk={chunk_size:>6}B  old: {old_lines / old_t:>12,.0f} lines/s   "
+              f"new: {new_lines / new_t:>12,.0f} lines/s   speedup x{old_t / new_t:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""End-to-end pipeline benchmark: per-stage throughput and p50/p99 latency of every GUI variant.
+
+The other benchmarks compare one old and one new code path in isolation. This
+one times each stage a received line goes through, call by call, on the same
+input for all five GUI scripts, and saves the results as JSON so a regression
+in one variant (or between two commits) shows up as a number:
+
+  headless (no Tk):  framing (LineFramer.feed per 1 KiB recv), dispatch (parser +
+                     routing only), engine (cybot.engine.CyBotEngine.process_line,
+                     the whole headless pipeline), detect_objects and occupancy
+                     per sweep
+  per GUI script:    parse_cybot_message, update_sensor_status, append_scan_data,
+                     detect_and_plot_objects, draw_radar_plot,
+                     update_robot_position_and_trail and the trail redraw
+                     (redraw_trail_on_panel, or the map trail in
+                     SomewhatWorkingGUI.py)
+
+Drawing stages include ``update_idletasks()``, so Tk's own redraw is counted.
+The GUI stages need a display; for an offscreen one run under Xvfb
+(``xvfb-run python -m benchmarks.bench_pipeline``). Without a display they are
+skipped, and the reason is recorded.
+
+Input is the synthetic session of benchmarks.streams, or captured logs
+(--log): session recordings (cybot.recording) or plain text, one line per
+protocol line (Raw Data Log "[HH:MM:SS] " prefixes are stripped).
+
+Run from the repo root:  python -m benchmarks.bench_pipeline [--log FILE] [--json OUT] [--compare OLD.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+from cybot.framing import LineFramer
+from cybot.protocol import default_dispatcher
+from cybot.model import ScanPoint, ScanEnd, StatusSample, MoveEvent, BumpEvent
+from cybot.scanbuffer import ScanBuffer
+from cybot.detection import detect_objects
+from cybot.engine import CyBotEngine, DEFAULT_DETECTION_PARAMS
+from cybot.recording import read_recording
+from benchmarks.streams import session_lines
+
+GUI_SCRIPTS = ("SomewhatWorkingGUI.py", "borderandholes.py", "bordertest2.py", "pathtrace.py", "cyBot_gui.py")
+RECV_CHUNK = 1024 # Bytes per simulated recv, like the socket reads
+_LOG_PREFIX = re.compile(r"^\[\d\d:\d\d:\d\d\] ")
+# Globals run_gui() calls into. Scripts built on cybot.engine draw what cybot_engine publishes; the
+# others assemble scans and the pose themselves.
+GUI_GLOBALS = ("app", "parse_cybot_message", "update_sensor_status", "detect_and_plot_objects", "draw_radar_plot")
+ENGINE_GUI_GLOBALS = ("map_trail",)
+LEGACY_GUI_GLOBALS = ("append_scan_data", "handle_scan_end", "update_robot_position_and_trail", "last_scan_data",
+                      "redraw_trail_on_panel")
+
+
+class StageTimer:
+    """Per-call wall times of one stage (perf_counter_ns) and the number of items those calls handled."""
+
+    def __init__(self, unit):
+        self.unit = unit
+        self.times_ns = []
+        self.items = 0
+
+    def call(self, fn, *args, items=1):
+        t0 = time.perf_counter_ns()
+        result = fn(*args)
+        self.times_ns.append(time.perf_counter_ns() - t0)
+        self.items += items
+        return result
+
+    def result(self):
+        times = sorted(self.times_ns)
+        if not times:
+            return {"unit": self.unit, "calls": 0}
+        total_s = sum(times) / 1e9
+        return {
+            "unit": self.unit,
+            "calls": len(times),
+            "items": self.items,
+            "total_s": total_s,
+            "items_per_s": self.items / total_s if total_s else None,
+            "p50_us": _percentile(times, 0.50) / 1e3,
+            "p99_us": _percentile(times, 0.99) / 1e3,
+            "max_us": times[-1] / 1e3,
+        }
+
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+# --- Input ---
+def load_log(path):
+    """Protocol lines (without newline) of a session recording or a text log."""
+    with open(path, "rb") as f:
+        is_recording = f.read(2) == b"\x1f\x8b" # gzip magic
+    if is_recording:
+        return [line for _, line in read_recording(path)]
+    lines = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = _LOG_PREFIX.sub("", line.rstrip("\r\n"))
+            if line and not line.startswith(("-->", "---")): # Sent commands and log notes
+                lines.append(line)
+    return lines
+
+
+class StreamParts:
+    """One input stream, split up the way the stages consume it."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.data = "".join(line + "\n" for line in lines).encode("utf-8")
+        self.statuses, self.sweeps, self.moves = [], [], []
+        sweep = []
+        dispatcher = default_dispatcher()
+        dispatcher.on(StatusSample, self.statuses.append)
+        dispatcher.on(ScanPoint, sweep.append)
+        dispatcher.on(MoveEvent, self.moves.append)
+
+        def end_sweep(record):
+            if sweep:
+                self.sweeps.append(list(sweep))
+                sweep.clear()
+        dispatcher.on(ScanEnd, end_sweep)
+        for line in lines:
+            dispatcher.dispatch(line)
+
+    def scan_buffers(self):
+        buffers = []
+        for sweep in self.sweeps:
+            scan = ScanBuffer()
+            for point in sweep:
+                scan.append(point)
+            buffers.append(scan)
+        return buffers
+
+    def describe(self):
+        return {"lines": len(self.lines), "bytes": len(self.data), "status": len(self.statuses),
+                "sweeps": len(self.sweeps), "moves": len(self.moves)}
+
+
+# --- Headless stages ---
+def run_headless(parts):
+    stages = {}
+    framing = stages["framing"] = StageTimer("line")
+    framer = LineFramer()
+    view = memoryview(parts.data)
+    for pos in range(0, len(view), RECV_CHUNK):
+        chunk = view[pos:pos + RECV_CHUNK]
+        t0 = time.perf_counter_ns()
+        lines = framer.feed(chunk)
+        framing.times_ns.append(time.perf_counter_ns() - t0)
+        framing.items += len(lines)
+
+    dispatch = stages["dispatch"] = StageTimer("line")
+    dispatcher = default_dispatcher()
+    sink = [].append
+    for record_type in (StatusSample, ScanPoint, ScanEnd, MoveEvent, BumpEvent):
+        dispatcher.on(record_type, sink)
+    for line in parts.lines:
+        dispatch.call(dispatcher.dispatch, line)
+
+    engine_stage = stages["engine"] = StageTimer("line")
+    engine = CyBotEngine()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # Bad lines are reported on stdout
+        for line in parts.lines:
+            engine_stage.call(engine.process_line, line)
+
+    scans = parts.scan_buffers()
+    detection = stages["detect_objects"] = StageTimer("scan")
+    for scan in scans:
+        detection.call(detect_objects, scan, DEFAULT_DETECTION_PARAMS)
+    if engine.grid is not None:
+        occupancy = stages["occupancy"] = StageTimer("scan")
+        engine.grid.clear()
+        for scan in scans:
+            occupancy.call(engine.grid.integrate_scan, scan, 0.0, 0.0, 90.0)
+    return {name: timer.result() for name, timer in stages.items()}
+
+
+# --- GUI stages ---
+def display_problem():
+    """None if Tk can open a window here, else the reason."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.destroy()
+    except Exception as e: # ImportError (no _tkinter) or TclError (no display)
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def load_gui(path):
+    """Runs a GUI script up to (not into) its mainloop and returns its globals."""
+    import tkinter as tk
+    with open(path, encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+    mainloop = tk.Misc.mainloop
+    tk.Misc.mainloop = lambda self, n=0: None # The scripts build everything at import, then block here
+    try:
+        namespace = {"__name__": "__bench__", "__file__": path}
+        exec(code, namespace)
+    finally:
+        tk.Misc.mainloop = mainloop
+    expected = GUI_GLOBALS + (ENGINE_GUI_GLOBALS if "cybot_engine" in namespace else LEGACY_GUI_GLOBALS)
+    missing = [name for name in expected if name not in namespace]
+    if missing: # A renamed function would otherwise only show up as a KeyError halfway through the run
+        if "app" in namespace:
+            namespace["app"].destroy()
+        raise RuntimeError(f"{path} does not define {', '.join(missing)} (update run_gui for it)")
+    app = namespace["app"]
+    app.geometry("1200x800")
+    app.update()
+    time.sleep(0.15) # Let the scripts' startup after(100, ...) calls run
+    app.update()
+    return namespace
+
+
+def run_gui(path, parts):
+    namespace = load_gui(path)
+    app = namespace["app"]
+    engine = namespace.get("cybot_engine")
+    if engine is not None: # The engine owns scans and pose; the script draws what it publishes
+        append_point, end_sweep, apply_move = engine.append_scan_point, engine.end_scan, engine.apply_move
+        def set_last_scan(scan): engine.last_scan = scan
+    else:
+        append_point, apply_move = namespace["append_scan_data"], namespace["update_robot_position_and_trail"]
+        def end_sweep(): namespace["handle_scan_end"](ScanEnd("END Scan"))
+        def set_last_scan(scan): namespace["last_scan_data"] = scan
+    if "redraw_trail_on_panel" in namespace:
+        trail_redraw = namespace["redraw_trail_on_panel"]
+    else:
+        trail_redraw = namespace["map_trail"].redraw
+
+    def drawn(fn):
+        def call(*args):
+            fn(*args)
+            app.update_idletasks() # Tk's redraw of what fn changed
+        return call
+
+    stages = {}
+    parse = stages["parse_cybot_message"] = StageTimer("line")
+    for line in parts.lines:
+        parse.call(namespace["parse_cybot_message"], line)
+    app.update()
+
+    sensor = stages["update_sensor_status"] = StageTimer("sample")
+    update_sensor_status = drawn(namespace["update_sensor_status"])
+    for sample in parts.statuses:
+        sensor.call(update_sensor_status, sample)
+
+    append = stages["append_scan_data"] = StageTimer("point")
+    for sweep in parts.sweeps:
+        for point in sweep:
+            append.call(append_point, point)
+        end_sweep()
+    app.update()
+
+    scans = parts.scan_buffers()
+    detect = stages["detect_and_plot_objects"] = StageTimer("scan")
+    radar = stages["draw_radar_plot"] = StageTimer("scan")
+    detect_and_plot, draw_radar = drawn(namespace["detect_and_plot_objects"]), drawn(namespace["draw_radar_plot"])
+    for scan in scans:
+        set_last_scan(scan)
+        detect.call(detect_and_plot, scan)
+        radar.call(draw_radar)
+
+    move = stages["update_robot_position_and_trail"] = StageTimer("move")
+    redraw = stages["trail_redraw"] = StageTimer("redraw")
+    apply_move, trail_redraw = drawn(apply_move), drawn(trail_redraw)
+    for record in parts.moves:
+        move.call(apply_move, record)
+        redraw.call(trail_redraw)
+    app.destroy()
+    return {name: timer.result() for name, timer in stages.items()}
+
+
+# --- Report ---
+def print_results(results):
+    for variant, stages in results["variants"].items():
+        print(f"\n{variant}")
+        if "error" in stages:
+            print(f"  skipped: {stages['error']}")
+            continue
+        for name, r in stages.items():
+            if not r.get("calls"):
+                print(f"  {name:<32} no calls")
+                continue
+            print(f"  {name:<32} {r['items_per_s']:>12,.0f} {r['unit']}s/s   p50 {r['p50_us']:>9.1f} us   p99 {r['p99_us']:>9.1f} us")
+
+
+def print_comparison(results, old):
+    """Throughput and p99 of each stage relative to an older results file (>1 = faster/lower now)."""
+    print(f"\nCompared with {old['meta'].get('created', '?')}:")
+    for variant, stages in results["variants"].items():
+        old_stages = old.get("variants", {}).get(variant, {})
+        for name, r in stages.items():
+            o = old_stages.get(name) if isinstance(old_stages, dict) else None
+            if not isinstance(r, dict) or not isinstance(o, dict) or not r.get("calls") or not o.get("calls"):
+                continue
+            speed = r["items_per_s"] / o["items_per_s"]
+            p99 = o["p99_us"] / r["p99_us"] if r["p99_us"] else float("inf")
+            flag = "  <-- slower" if speed < 0.9 else ""
+            print(f"  {variant:<22} {name:<32} throughput x{speed:5.2f}   p99 x{p99:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scans", type=int, default=200, help="sweeps in the synthetic session (ignored with --log)")
+    parser.add_argument("--log", action="append", default=[], metavar="FILE", help="captured log or session recording (repeatable)")
+    parser.add_argument("--gui", nargs="*", default=list(GUI_SCRIPTS), metavar="SCRIPT", help="GUI scripts to run (none: headless only)")
+    parser.add_argument("--json", default="bench_pipeline.json", help="where to save the results (default: %(default)s)")
+    parser.add_argument("--compare", metavar="OLD.json", help="print the change against an earlier results file")
+    args = parser.parse_args()
+
+    if args.log:
+        lines = [line for path in args.log for line in load_log(path)]
+        source = {"logs": args.log}
+    else:
+        lines = [line.rstrip("\n") for line in session_lines(scans=args.scans)]
+        source = {"synthetic_scans": args.scans}
+    parts = StreamParts(lines)
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    results = {
+        "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "numpy": numpy_version, "input": dict(source, **parts.describe())},
+        "variants": {"headless": run_headless(parts)},
+    }
+    problem = display_problem() if args.gui else None
+    with open(os.devnull, "w") as devnull:
+        for script in args.gui:
+            if problem is not None:
+                results["variants"][script] = {"error": f"no Tk display ({problem})"}
+                continue
+            try:
+                with contextlib.redirect_stdout(devnull): # The scripts' debug prints
+                    results["variants"][script] = run_gui(script, parts)
+            except SyntaxError as e:
+                results["variants"][script] = {"error": f"does not compile: {e}"}
+            except Exception as e:
+                results["variants"][script] = {"error": f"{type(e).__name__}: {e}"}
+
+    print(f"Input: {results['meta']['input']}")
+    print_results(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    with open(args.json, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
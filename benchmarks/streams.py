@@ -0,0 +1,57 @@
+"""Synthetic CyBot output streams in the exact line formats main.c sends."""
+import random
+
+
+def status_line(rng, heading=0):
+    return ("STATUS:BUMP_L=%d,BUMP_R=%d,CLIFF_L_SIG=%u,CLIFF_FL_SIG=%u,CLIFF_FR_SIG=%u,CLIFF_R_SIG=%u,PING=%.2f, Heading=%d\n"
+            % (rng.random() < 0.02, rng.random() < 0.02,
+               rng.randint(800, 2800), rng.randint(800, 2800), rng.randint(800, 2800), rng.randint(800, 2800),
+               rng.uniform(5, 300), heading))
+
+
+def scan_lines(rng, objects=3):
+    """One full 0-182 degree sweep (92 points) followed by the END marker, like the 'm' command."""
+    # A few objects of random width at random angles, everything else is far-away wall
+    blobs = []
+    for _ in range(objects):
+        centre = rng.uniform(10, 170)
+        blobs.append((centre, rng.uniform(4, 14), rng.uniform(20, 120)))
+    lines = ["INFO:Starting scan\n"]
+    for angle in range(0, 183, 2):
+        dist = rng.uniform(180, 330)
+        ir = rng.randint(300, 600)
+        for centre, half_width, obj_dist in blobs:
+            if abs(angle - centre) <= half_width:
+                dist = obj_dist + rng.uniform(-2, 2)
+                ir = int(2600 - obj_dist * 12 + rng.randint(-40, 40))
+        lines.append("SCAN:ANGLE=%.2f,DIST_CM=%.2f,IR_RAW=%d\n" % (angle, dist, ir))
+    lines.append("SCAN: END Scan\n")
+    lines.append("INFO:Scan complete\n")
+    return lines
+
+
+def move_line(angle_deg, dist_cm):
+    return "MOVE: ANGLE_DEG=%.2f,DIST_CM=%.2f\n" % (angle_deg, dist_cm)
+
+
+def session_lines(scans=20, status_per_scan=30, moves_per_scan=5, seed=288):
+    """A mixed session: status telemetry, moves and full scans, as a list of lines (with '\\n')."""
+    rng = random.Random(seed)
+    lines = []
+    heading = 0
+    for _ in range(scans):
+        for _ in range(status_per_scan):
+            lines.append(status_line(rng, heading))
+        for _ in range(moves_per_scan):
+            if rng.random() < 0.5:
+                turn = rng.choice((-30.0, 30.0, -10.0, 10.0))
+                heading += int(turn)
+                lines.append(move_line(turn, 0.0))
+            else:
+                lines.append(move_line(0.0, rng.choice((10.0, -10.0))))
+        lines.extend(scan_lines(rng))
+    return lines
+
+
+def session_bytes(**kwargs):
+    return "".join(session_lines(**kwargs)).encode("utf-8")
@@ -8,10 +8,26 @@ import queue # For thread-safe communication between socket thread and GUI threa
 import math  # For map calculations
 import statistics # For median/average if needed
 
+from cybot.ingest import IngestEngine # selector loop that owns the socket while connected
+from cybot.tkwake import TkWakeup # wakes the Tk loop as soon as the ingest thread queues data
+from cybot.logview import LogView # bounded raw data log, one batched insert per frame
+from cybot.status import StatusCoalescer # one sensor panel redraw per drain pass
+from cybot.protocol import default_dispatcher, parse_status # prefix -> parser -> typed record -> handler
+from cybot.model import ScanPoint, ScanEnd, StatusSample, MoveEvent, BumpEvent # __slots__ records shared by parsing, detection, radar and trail
+from cybot.scanbuffer import ScanBuffer # angle-sorted typed columns, swapped (not copied) at END SCAN
+from cybot.render import RenderScheduler
+from cybot.trail import TrailPath, TrailView
+from cybot.radar import RadarView
+from cybot.detection import DetectionCache, DetectionParams, StreamingDetector # IR/PING object segmentation and measurement (state machine + NumPy batch path)
+from cybot.sensorpanel import SensorPanel
+
 # --- Constants ---
 # !!! IMPORTANT: Replace with your CyBot's actual IP address !!!
 CYBOT_IP = "192.168.1.1"  # <--- CHANGE THIS to your CyBot's IP
 CYBOT_PORT = 288
+GUI_DRAIN_BUDGET_S = 0.008 # Max time per message-processing pass before yielding back to Tk
+RENDER_MAX_FPS = 30 # Redraw cap; each dirty view is drawn at most once per frame
+RAW_LOG_MAX_LINES = 2000 # Raw Data Log keeps only this many lines
 # Define commands
 CMD_FORWARD = "w\n"
 CMD_BACKWARD = "s\n"
@@ -60,6 +76,7 @@ cybot_socket = None
 is_connected = False
 message_queue = queue.Queue()
 stop_thread_flag = threading.Event()
+ingest_engine = None # IngestEngine running while connected
 
 # Robot Pose (Position and Orientation) - Initialized when map is ready
 robot_x = 0.0 # This will be set by initialize_robot_position for the map icon
@@ -67,11 +84,12 @@ robot_y = 0.0 # This will be set by initialize_robot_position for the map icon
 robot_angle_deg = 90.0 # Global angle used for map icon orientation (now static)
 
 # Scan Data Storage
-current_scan_buffer = [] # Temp buffer while scan is in progress
-last_scan_data = [] # Stores the points (angle_deg, dist_cm, ir_raw) of the last completed scan
+current_scan_buffer = ScanBuffer() # Filled while a scan is in progress, kept sorted by angle
+last_scan_data = ScanBuffer() # The last completed scan; swapped with current_scan_buffer at END SCAN
 
 # ---vvv--- NEW Global Variables for Movement Trail ---vvv---
-movement_history = []  # Stores dicts of {'type': 'move'/'turn', 'distance': float, 'angle': float}
+movement_history = []  # cybot.model.MoveEvent per MOVE (turn first, then straight distance)
+trail_path = TrailPath()    # Cumulative trail poses (cm from the start), one point per straight move
 trail_canvas = None    # Will hold the new canvas widget for the trail
 TRAIL_SCALE = 1.5      # Pixels per cm for the trail display (adjust as needed)
 DEBUG_TRAIL_PANEL = False # Set to True by user if trail debugging needed
@@ -108,12 +126,10 @@ def connect_to_cybot():
         bind_keys()
         app.after(100, initialize_robot_position) # Set map icon to center
         app.after(150, initialize_trail_display)
-        app.after(200, redraw_trail_on_panel)
+        app.after(200, render_scheduler.mark_dirty, "trail")
 
         stop_thread_flag.clear()
-        listen_thread = threading.Thread(target=listen_for_messages, daemon=True)
-        listen_thread.start()
-        app.after(100, process_incoming_messages)
+        start_listening()
 
     except socket.timeout:
         status_label.config(text="Connection timed out.", foreground="red")
@@ -133,6 +149,7 @@ def disconnect_from_cybot():
         return
     status_label.config(text="Disconnecting...", foreground="black")
     stop_thread_flag.set()
+    stop_listening()
     if cybot_socket:
         try:
             cybot_socket.shutdown(socket.SHUT_RDWR)
@@ -163,9 +180,8 @@ def send_command(command_to_send):
     try:
         if not command_to_send.endswith('\n'):
             command_to_send += '\n'
-        cybot_socket.sendall(command_to_send.encode('utf-8'))
-        raw_data_text.insert(tk.END, f"--> Sent: {command_to_send}")
-        raw_data_text.see(tk.END)
+        ingest_engine.send(command_to_send.encode('utf-8'))
+        raw_log.append(f"--> Sent: {command_to_send.rstrip()}")
     except Exception as e:
         status_label.config(text=f"Send failed: {e}", foreground="red")
         messagebox.showerror("Send Error", f"Failed to send command.\nError: {e}")
@@ -210,101 +226,79 @@ def unbind_keys():
     app.unbind_all('<KeyPress-l>')
 
 # --- Listener Thread and Message Processing ---
-def listen_for_messages():
-    global cybot_socket, is_connected
-    print("Listening thread started.")
-    buffer = ""
-    while not stop_thread_flag.is_set():
-        try:
-            cybot_socket.settimeout(0.2)
-            data_bytes = cybot_socket.recv(1024)
-            cybot_socket.settimeout(None)
-            if data_bytes:
-                message_part = data_bytes.decode('utf-8', errors='replace')
-                buffer += message_part
-                while '\n' in buffer:
-                    message, buffer = buffer.split('\n', 1)
-                    message_queue.put(message + '\n')
-            else:
-                print("Connection closed by server (received empty data).")
-                if not stop_thread_flag.is_set():
-                    message_queue.put("CONNECTION_CLOSED\n")
-                break
-        except socket.timeout:
-            continue
-        except socket.error as e:
-            if not stop_thread_flag.is_set():
-                print(f"Socket error in listening thread: {e}")
-                message_queue.put("CONNECTION_ERROR\n")
-            break
-        except Exception as e:
-            if not stop_thread_flag.is_set():
-                 print(f"Unexpected error in listening thread: {e}")
-                 message_queue.put("CONNECTION_ERROR\n")
-            break
-    print("Listening thread finished.")
-    if not stop_thread_flag.is_set() and is_connected:
-        app.after(0, disconnect_from_cybot)
+def start_listening():
+    """Starts the selector-based ingest thread that feeds message_queue from the CyBot socket."""
+    global ingest_engine
+    ingest_engine = IngestEngine(cybot_socket,
+                                 on_lines=post_to_gui,
+                                 on_closed=lambda: post_to_gui("CONNECTION_CLOSED\n"),
+                                 on_error=lambda e: post_to_gui("CONNECTION_ERROR\n"),
+                                 stop_event=stop_thread_flag)
+    ingest_engine.start()
+
+def post_to_gui(item):
+    """Queues a batch of lines (or a connection signal) and wakes the GUI thread. Runs on the ingest thread."""
+    message_queue.put(item)
+    gui_wakeup.notify()
+
+def stop_listening():
+    global ingest_engine
+    if ingest_engine:
+        ingest_engine.stop()
+        ingest_engine = None
 
 def process_incoming_messages():
     global is_connected, stop_thread_flag
+    deadline = time.perf_counter() + GUI_DRAIN_BUDGET_S # Yield to Tk after this, the rest goes on the next pass
     try:
-        while not message_queue.empty():
-            message = message_queue.get_nowait()
-            if message == "CONNECTION_CLOSED\n":
+        while time.perf_counter() < deadline:
+            batch = message_queue.get_nowait()
+            if batch == "CONNECTION_CLOSED\n":
                  if is_connected:
                      messagebox.showinfo("Connection Info", "Connection closed by CyBot.")
                      disconnect_from_cybot()
                  break
-            elif message == "CONNECTION_ERROR\n":
+            elif batch == "CONNECTION_ERROR\n":
                  if is_connected:
                      messagebox.showerror("Connection Error", "Socket error occurred.")
                      disconnect_from_cybot()
                  break
-            else:
-                timestamp = time.strftime("%H:%M:%S", time.localtime())
-                message_content = message.strip()
-                log_this_message = not message_content.startswith("STATUS:")
-                if log_this_message:
-                    raw_data_text.insert(tk.END, f"[{timestamp}] {message}")
-                    raw_data_text.see(tk.END)
+            timestamp = time.strftime("%H:%M:%S", time.localtime())
+            for message in batch:
+                if not message.lstrip().startswith("STATUS:"):
+                    raw_log.append(f"[{timestamp}] {message}")
                 parse_cybot_message(message)
     except queue.Empty:
         pass
     except Exception as e:
         print(f"ERROR processing message in GUI: {e}")
-    if is_connected or not stop_thread_flag.is_set():
-         app.after(100, process_incoming_messages)
+    if status_coalescer.has_pending(): render_scheduler.mark_dirty("sensor") # Newest STATUS of the pass only, next frame
+    if (is_connected or not stop_thread_flag.is_set()) and not message_queue.empty():
+         app.after(1, process_incoming_messages) # Out of budget, continue after Tk handles pending events
 
 def parse_cybot_message(message):
-    global current_scan_buffer, last_scan_data
-    line = message.strip()
-    if not line: return
+    """Parses one line via message_dispatcher (prefix -> cybot.protocol parser -> typed record -> handler)."""
     try:
-        if "END SCAN" in line.upper() and line.startswith("SCAN:"):
-            if DEBUG_OBJECT_DETECTION: print(f"\nScan END marker received: '{line}'")
-            if DEBUG_OBJECT_DETECTION: print(f"Buffer size BEFORE processing END: {len(current_scan_buffer)}")
-            if current_scan_buffer:
-                last_scan_data = current_scan_buffer[:]
-                current_scan_buffer = []
-                if DEBUG_OBJECT_DETECTION: print(f"Copied data to last_scan_data (size: {len(last_scan_data)}). Cleared buffer.")
-                app.after(10, draw_radar_plot)
-                app.after(20, detect_and_plot_objects)
-            else:
-                if DEBUG_OBJECT_DETECTION: print("Scan END received, but current_scan_buffer is empty. No plotting.")
-            return
-        elif line.startswith("STATUS:"):
-            update_sensor_status(line[len("STATUS:"):]) # Simplified, only updates sensor display
-        elif line.startswith("SCAN:"):
-             append_scan_data(line[len("SCAN:"):], is_mock_data=False)
-        elif line.startswith("MOVE:"):
-             update_robot_position_and_trail(line[len("MOVE:"):]) # Only updates trail panel history/drawing
-        elif line.startswith("BUMP_EVENT:"):
-             update_map_with_bump(line[len("BUMP_EVENT:"):]) # Plots bumps relative to static map icon
-        elif line.startswith("INFO:") or line.startswith("DEBUG:") or line.startswith("ERROR:") or line.startswith("ACK:"):
-             pass
+        message_dispatcher.dispatch(message)
     except Exception as e:
-        print(f"Error parsing line '{line}': {e}")
+        print(f"Error parsing line '{message.strip()}': {e}")
+
+def handle_scan_end(record):
+    global current_scan_buffer, last_scan_data
+    if DEBUG_OBJECT_DETECTION: print(f"\nScan END marker received: '{record.text}'")
+    if DEBUG_OBJECT_DETECTION: print(f"Buffer size BEFORE processing END: {len(current_scan_buffer)}")
+    if current_scan_buffer:
+        last_scan_data, current_scan_buffer = current_scan_buffer, last_scan_data # Swap the buffers, nothing is copied
+        current_scan_buffer.clear()
+        if DEBUG_OBJECT_DETECTION: print(f"Handed off scan to last_scan_data (size: {len(last_scan_data)}). Cleared buffer.")
+        render_scheduler.mark_dirty("radar")
+        if streaming_detector.finish():
+            map_canvas.delete("previous_scan_object")
+            detection_cache.put(last_scan_data, streaming_detector.params, streaming_detector.segments, streaming_detector.objects)
+        else:
+            render_scheduler.mark_dirty("objects")
+    else:
+        if DEBUG_OBJECT_DETECTION: print("Scan END received, but current_scan_buffer is empty. No plotting.")
 
 # --- GUI Update Functions ---
 def initialize_robot_position():
@@ -320,123 +314,65 @@ def initialize_robot_position():
         global robot_angle_deg
         robot_angle_deg = 90.0 # Keep icon pointing North
         print(f"Robot icon initialized at map center: ({robot_x:.1f}, {robot_y:.1f})")
-        draw_robot_on_map()
+        render_scheduler.mark_dirty("map")
     else:
         print("Map canvas not ready for robot icon initialization, retrying...")
         app.after(100, initialize_robot_position)
 
-def update_sensor_status(status_string):
-    """Parses STATUS and updates sensor display ONLY."""
-    # No longer updates global cliff state variables
-
-    sensor_canvas.delete("status_indicator")
-    left_bumper_color, right_bumper_color = "grey", "grey"
-    cliff_l_sig_val_str, cliff_fl_sig_val_str, cliff_fr_sig_val_str, cliff_r_sig_val_str = "N/A", "N/A", "N/A", "N/A"
-    cliff_l_color, cliff_fl_color, cliff_fr_color, cliff_r_color = "grey", "grey", "grey", "grey"
-    ping_val = "N/A"
-    heading_val_str = "N/A"
-
-    try:
-        parts = status_string.split(',')
-        for part in parts:
-            key_value = part.split('=')
-            if len(key_value) == 2:
-                key, value_str = key_value[0].strip(), key_value[1].strip()
-                if key == "BUMP_L" and value_str == '1': left_bumper_color = "red"
-                elif key == "BUMP_R" and value_str == '1': right_bumper_color = "red"
-                elif key == "CLIFF_L_SIG":
-                    cliff_l_sig_val_str = value_str
-                    try:
-                        signal = int(value_str)
-                        if signal >= WHITE_THRESHOLD: cliff_l_color = "blue"
-                        elif signal <= BLACK_THRESHOLD: cliff_l_color = "red"
-                        else: cliff_l_color = "grey"
-                    except ValueError: cliff_l_color = "grey"
-                elif key == "CLIFF_FL_SIG":
-                    cliff_fl_sig_val_str = value_str
-                    try:
-                        signal = int(value_str)
-                        if signal >= WHITE_THRESHOLD: cliff_fl_color = "blue"
-                        elif signal <= BLACK_THRESHOLD: cliff_fl_color = "red"
-                        else: cliff_fl_color = "grey"
-                    except ValueError: cliff_fl_color = "grey"
-                elif key == "CLIFF_FR_SIG":
-                    cliff_fr_sig_val_str = value_str
-                    try:
-                        signal = int(value_str)
-                        if signal >= WHITE_THRESHOLD: cliff_fr_color = "blue"
-                        elif signal <= BLACK_THRESHOLD: cliff_fr_color = "red"
-                        else: cliff_fr_color = "grey"
-                    except ValueError: cliff_fr_color = "grey"
-                elif key == "CLIFF_R_SIG":
-                    cliff_r_sig_val_str = value_str
-                    try:
-                        signal = int(value_str)
-                        if signal >= WHITE_THRESHOLD: cliff_r_color = "blue"
-                        elif signal <= BLACK_THRESHOLD: cliff_r_color = "red"
-                        else: cliff_r_color = "grey"
-                    except ValueError: cliff_r_color = "grey"
-                elif key == "PING":
-                    try: ping_val = f"{float(value_str):.1f}"
-                    except ValueError: ping_val = "Invalid"
-                elif key == "Heading":
-                    heading_val_str = value_str
-    except Exception as e:
-        print(f"Error parsing status string '{status_string}': {e}")
-        cliff_l_sig_val_str, cliff_fl_sig_val_str, cliff_fr_sig_val_str, cliff_r_sig_val_str = "Err", "Err", "Err", "Err"
-        ping_val = "Err"; heading_val_str = "Err"
-        cliff_l_color, cliff_fl_color, cliff_fr_color, cliff_r_color = "grey", "grey", "grey", "grey"
+def update_sensor_status(sample):
+    """Updates the sensor display from a StatusSample ONLY."""
+    left_bumper_color = "red" if sample.bump_l == 1 else "grey"
+    right_bumper_color = "red" if sample.bump_r == 1 else "grey"
+    cliff_l_color, cliff_fl_color = cliff_signal_color(sample.cliff_l), cliff_signal_color(sample.cliff_fl)
+    cliff_fr_color, cliff_r_color = cliff_signal_color(sample.cliff_fr), cliff_signal_color(sample.cliff_r)
+    ping_val = "N/A" if sample.ping_cm is None else f"{sample.ping_cm:.1f}"
+    heading_val_str = "N/A" if sample.heading is None else sample.heading
 
     # Update GUI Elements
-    sensor_canvas.create_line(50, 80, 70, 60, fill=left_bumper_color, width=4, tags="status_indicator")
-    sensor_canvas.create_line(150, 80, 130, 60, fill=right_bumper_color, width=4, tags="status_indicator")
+    sensor_panel.set_fill(left_bumper_line, left_bumper_color)
+    sensor_panel.set_fill(right_bumper_line, right_bumper_color)
     try:
-        sensor_canvas.itemconfig("cliff_l_indicator", fill=cliff_l_color)
-        sensor_canvas.itemconfig("cliff_fl_indicator", fill=cliff_fl_color)
-        sensor_canvas.itemconfig("cliff_fr_indicator", fill=cliff_fr_color)
-        sensor_canvas.itemconfig("cliff_r_indicator", fill=cliff_r_color)
+        sensor_panel.set_fill("cliff_l_indicator", cliff_l_color)
+        sensor_panel.set_fill("cliff_fl_indicator", cliff_fl_color)
+        sensor_panel.set_fill("cliff_fr_indicator", cliff_fr_color)
+        sensor_panel.set_fill("cliff_r_indicator", cliff_r_color)
     except tk.TclError as e:
         print(f"Error updating cliff indicator colors: {e}")
-    cliff_l_sig_label.config(text=f"L: {cliff_l_sig_val_str}")
-    cliff_fl_sig_label.config(text=f"FL: {cliff_fl_sig_val_str}")
-    cliff_fr_sig_label.config(text=f"FR: {cliff_fr_sig_val_str}")
-    cliff_r_sig_label.config(text=f"R: {cliff_r_sig_val_str}")
-    ping_label.config(text=f"Ping: {ping_val} cm Heading: {heading_val_str} degrees")
+    sensor_panel.set_text(cliff_l_sig_label, f"L: {sensor_value_text(sample.cliff_l)}")
+    sensor_panel.set_text(cliff_fl_sig_label, f"FL: {sensor_value_text(sample.cliff_fl)}")
+    sensor_panel.set_text(cliff_fr_sig_label, f"FR: {sensor_value_text(sample.cliff_fr)}")
+    sensor_panel.set_text(cliff_r_sig_label, f"R: {sensor_value_text(sample.cliff_r)}")
+    sensor_panel.set_text(ping_label, f"Ping: {ping_val} cm Heading: {heading_val_str} degrees")
 
+def cliff_signal_color(signal):
+    if signal is None: return "grey"
+    if signal >= WHITE_THRESHOLD: return "blue"
+    if signal <= BLACK_THRESHOLD: return "red"
+    return "grey"
 
-def append_scan_data(scan_data_string, is_mock_data=False):
-    global current_scan_buffer
-    try:
-        angle_deg, dist_cm, ir_raw = None, None, None
-        if is_mock_data:
-             parts = scan_data_string.split()
-             if len(parts) >= 2:
-                 angle_deg = float(parts[0])
-                 dist_m = float(parts[1])
-                 dist_cm = dist_m * 100.0
-                 ir_raw = 0
-        else:
-            parts = scan_data_string.split(',')
-            for part in parts:
-                key_value = part.split('=')
-                if len(key_value) == 2:
-                    key, value = key_value[0].strip(), key_value[1].strip()
-                    if key == "ANGLE":
-                        angle_deg = float(value)
-                    elif key == "DIST_CM":
-                        dist_cm = float(value)
-                    elif key == "IR_RAW":
-                        ir_raw = int(value)
-        if angle_deg is not None and dist_cm is not None and ir_raw is not None:
-             current_scan_buffer.append((angle_deg, dist_cm, ir_raw))
-    except ValueError as ve:
-        print(f"ValueError converting scan data '{scan_data_string}': {ve}")
-    except Exception as e:
-        print(f"Error appending scan data '{scan_data_string}': {e}")
+def sensor_value_text(value):
+    return "N/A" if value is None else value
+
+
+def append_scan_data(point): # point: cybot.model.ScanPoint
+    if not current_scan_buffer: begin_live_detection() # First point of a new sweep
+    streaming_detector.feed(current_scan_buffer, current_scan_buffer.append(point))
+
+def begin_live_detection():
+    streaming_detector.reset(current_detection_params())
+    map_canvas.addtag_withtag("previous_scan_object", "detected_object")
+
+def plot_live_object(obj):
+    if DEBUG_OBJECT_DETECTION: print(f"  Live object: {obj}")
+    plot_detected_object(obj)
 
 def update_map_with_scan(scan_data_string):
     pass
 
+def current_detection_params():
+    return DetectionParams(IR_MIN_STRENGTH_FOR_CONSIDERATION, IR_EDGE_THRESHOLD_RISE, IR_EDGE_THRESHOLD_DROP,
+                           OBJECT_MAX_DIST_CM, OBJECT_MIN_POINTS, OBJECT_MIN_ANGLE_WIDTH_DEG)
+
 def detect_and_plot_objects(scan_data=None):
     global robot_x, robot_y, robot_angle_deg, last_scan_data, map_canvas
     global MAP_SCALE, SENSOR_FORWARD_OFFSET_CM, OBJECT_MAX_DIST_CM
@@ -448,134 +384,48 @@ def detect_and_plot_objects(scan_data=None):
     if not scan_data:
         if DEBUG_OBJECT_DETECTION: print("detect_and_plot_objects: No scan data to process.")
         return
-    scan_data_sorted = sorted(scan_data, key=lambda p: p[0])
-    objects_segments = []
-    current_segment_points = []
-    in_object_segment = False
-    dummy_ir_weak = min(IR_MIN_STRENGTH_FOR_CONSIDERATION / 2, 50)
-    if DEBUG_OBJECT_DETECTION: print(f"\n--- Starting Object Detection Cycle ({len(scan_data_sorted)} points) ---")
+    params = current_detection_params()
+    segments, found_objects = detection_cache.get(scan_data, params)
     if DEBUG_OBJECT_DETECTION:
-        print(f"Params: IR_MIN_CONSIDER={IR_MIN_STRENGTH_FOR_CONSIDERATION}, IR_RISE_THRESH={IR_EDGE_THRESHOLD_RISE}, IR_DROP_THRESH={IR_EDGE_THRESHOLD_DROP}")
-    prev_ir_raw_val = dummy_ir_weak
-    for i in range(len(scan_data_sorted)):
-        angle, dist_cm, ir_raw = scan_data_sorted[i]
-        if i > 0:
-            prev_ir_raw_val = scan_data_sorted[i-1][2]
-        ir_change = ir_raw - prev_ir_raw_val
-        ping_is_relevant = (dist_cm > 0 and dist_cm <= OBJECT_MAX_DIST_CM)
-        current_ir_is_strong = (ir_raw >= IR_MIN_STRENGTH_FOR_CONSIDERATION)
-        prev_ir_was_strong = (prev_ir_raw_val >= IR_MIN_STRENGTH_FOR_CONSIDERATION)
-        if DEBUG_OBJECT_DETECTION and i < 5:
-             print(f"  Point {i}: Angle={angle:.1f}, Dist={dist_cm:.1f}, IR={ir_raw} (PrevIR={prev_ir_raw_val}, Change={ir_change})")
-             print(f"     RelevantPING={ping_is_relevant}, CurrStrongIR={current_ir_is_strong}, PrevStrongIR={prev_ir_was_strong}")
-        if not in_object_segment:
-            if ping_is_relevant and current_ir_is_strong:
-                is_sharp_rise = (ir_change >= IR_EDGE_THRESHOLD_RISE)
-                is_transition_to_strong = (not prev_ir_was_strong)
-                if is_sharp_rise or is_transition_to_strong:
-                    in_object_segment = True
-                    current_segment_points = [(angle, dist_cm, ir_raw)]
-                    if DEBUG_OBJECT_DETECTION:
-                        print(f"  Segment START: Angle={angle:.1f}, IR={ir_raw}, Dist={dist_cm:.1f}. Rise={is_sharp_rise}, Trans={is_transition_to_strong}. Change={ir_change}")
-        else:
-            point_is_unsuitable = not (ping_is_relevant and current_ir_is_strong)
-            is_sharp_drop = (current_ir_is_strong and prev_ir_was_strong and (-ir_change >= IR_EDGE_THRESHOLD_DROP) )
-            if point_is_unsuitable or is_sharp_drop:
-                in_object_segment = False
-                if len(current_segment_points) >= OBJECT_MIN_POINTS:
-                    objects_segments.append(list(current_segment_points))
-                    if DEBUG_OBJECT_DETECTION:
-                        print(f"  Segment ENDED before Angle={angle:.1f}. Reason: Unsuitable={point_is_unsuitable}, SharpDrop={is_sharp_drop}. PrevIR={prev_ir_raw_val}, CurrIR={ir_raw}")
-                        print(f"    Stored segment with {len(current_segment_points)} points. Last point: {current_segment_points[-1][0]:.1f} deg.")
-                current_segment_points = []
-                if ping_is_relevant and current_ir_is_strong:
-                    is_sharp_rise = (ir_change >= IR_EDGE_THRESHOLD_RISE)
-                    is_transition_to_strong = (not prev_ir_was_strong) and current_ir_is_strong
-                    if is_sharp_rise or is_transition_to_strong:
-                        in_object_segment = True
-                        current_segment_points = [(angle, dist_cm, ir_raw)]
-                        if DEBUG_OBJECT_DETECTION:
-                            print(f"  Segment RE-START immediately at Angle={angle:.1f}, IR={ir_raw}. Rise={is_sharp_rise}, Trans={is_transition_to_strong}")
-            else:
-                current_segment_points.append((angle, dist_cm, ir_raw))
-    if in_object_segment and len(current_segment_points) >= OBJECT_MIN_POINTS:
-        objects_segments.append(list(current_segment_points))
-        if DEBUG_OBJECT_DETECTION: print(f"  Trailing segment stored with {len(current_segment_points)} points. Last point: {current_segment_points[-1][0]:.1f} deg.")
-    if DEBUG_OBJECT_DETECTION: print(f"--- Object Detection Cycle END. Found {len(objects_segments)} raw segments. ---")
-    plotted_objects_info = []
-    for idx, segment in enumerate(objects_segments):
-        if not segment: continue
-        angles = [p[0] for p in segment]
-        distances_cm = [p[1] for p in segment if (p[1] > 0 and p[1] <= OBJECT_MAX_DIST_CM)]
-        if not distances_cm:
-            if DEBUG_OBJECT_DETECTION: print(f"  Segment {idx} skipped: No valid PING distances.")
-            continue
-        start_angle_obj = angles[0]
-        end_angle_obj = angles[-1]
-        angular_width_deg = abs(end_angle_obj - start_angle_obj)
-        if angular_width_deg < OBJECT_MIN_ANGLE_WIDTH_DEG:
-            if DEBUG_OBJECT_DETECTION: print(f"  Segment {idx} skipped: Angular width {angular_width_deg:.1f} < {OBJECT_MIN_ANGLE_WIDTH_DEG:.1f} deg.")
-            continue
-        dist_at_start_angle = segment[0][1]
-        dist_at_end_angle = segment[-1][1]
-        if not (dist_at_start_angle > 0 and dist_at_start_angle <= OBJECT_MAX_DIST_CM and \
-                dist_at_end_angle > 0 and dist_at_end_angle <= OBJECT_MAX_DIST_CM):
-            if DEBUG_OBJECT_DETECTION: print(f"  Segment {idx} skipped: Invalid edge PING distances for width calc (Start: {dist_at_start_angle:.1f}, End: {dist_at_end_angle:.1f}).")
-            continue
-        linear_width_cm = 0
-        angle_diff_rad = math.radians(angular_width_deg)
-        term_for_sqrt = (dist_at_start_angle**2 + dist_at_end_angle**2 -
-                         2 * dist_at_start_angle * dist_at_end_angle * math.cos(angle_diff_rad))
-        if term_for_sqrt >= 0:
-            linear_width_cm = math.sqrt(term_for_sqrt)
-        else:
-            if DEBUG_OBJECT_DETECTION: print(f"  Segment {idx} Warning: Negative term for sqrt in width calc ({term_for_sqrt:.2f}). Using fallback.")
-            avg_dist_cm = sum(distances_cm) / len(distances_cm)
-            linear_width_cm = avg_dist_cm * angle_diff_rad
-        closest_dist_in_segment_cm = min(distances_cm)
-        plotted_objects_info.append({
-            'middle_angle_servo': (start_angle_obj + end_angle_obj) / 2.0,
-            'closest_distance_cm': closest_dist_in_segment_cm,
-            'linear_width_cm': linear_width_cm,
-            'start_angle': start_angle_obj,
-            'end_angle': end_angle_obj,
-            'num_points': len(segment)
-        })
-        if DEBUG_OBJECT_DETECTION:
-             print(f"  Plotted Object from Segment {idx}: StartAng={start_angle_obj:.1f}, EndAng={end_angle_obj:.1f}, Width={linear_width_cm:.2f}cm, ClosestDist={closest_dist_in_segment_cm:.1f}cm")
-    if DEBUG_OBJECT_DETECTION: print(f"--- Found {len(plotted_objects_info)} objects after filtering. ---")
+        print(f"\n--- Object Detection: {len(scan_data)} points, {params} ---")
+        for obj in found_objects: print(f"  {obj}")
+        print(f"--- Found {len(found_objects)} objects after filtering. ---")
+    for obj in found_objects:
+        plot_detected_object(obj)
+
+def plot_detected_object(obj):
+    global robot_x, robot_y, robot_angle_deg, map_canvas
     sensor_offset_pixels = SENSOR_FORWARD_OFFSET_CM * MAP_SCALE
     robot_current_angle_rad = math.radians(robot_angle_deg) # Use static angle
     sensor_origin_x = robot_x + sensor_offset_pixels * math.cos(robot_current_angle_rad)
     sensor_origin_y = robot_y - sensor_offset_pixels * math.sin(robot_current_angle_rad)
-    for obj_info in plotted_objects_info:
-        if obj_info['closest_distance_cm'] <= 0 or obj_info['linear_width_cm'] <= 0: continue
-        object_angle_relative_to_robot_forward_deg = obj_info['middle_angle_servo'] - 90.0
-        world_angle_of_object_center_deg = robot_angle_deg + object_angle_relative_to_robot_forward_deg # Use static angle
-        obj_center_angle_world_rad = math.radians(world_angle_of_object_center_deg)
-        obj_closest_edge_dist_cm = obj_info['closest_distance_cm']
-        obj_visual_radius_cm = obj_info['linear_width_cm'] / 2.0
-        oval_center_dist_from_sensor_cm = obj_closest_edge_dist_cm + obj_visual_radius_cm
-        oval_center_dist_pixels = oval_center_dist_from_sensor_cm * MAP_SCALE
-        obj_oval_center_x = sensor_origin_x + oval_center_dist_pixels * math.cos(obj_center_angle_world_rad)
-        obj_oval_center_y = sensor_origin_y - oval_center_dist_pixels * math.sin(obj_center_angle_world_rad)
-        obj_visual_radius_pixels = max(obj_visual_radius_cm * MAP_SCALE, 2.0)
-        map_canvas.create_oval(obj_oval_center_x - obj_visual_radius_pixels,
-                               obj_oval_center_y - obj_visual_radius_pixels,
-                               obj_oval_center_x + obj_visual_radius_pixels,
-                               obj_oval_center_y + obj_visual_radius_pixels,
-                               outline="darkmagenta", fill="orchid", width=2, tags="detected_object")
-        map_canvas.create_text(obj_oval_center_x, obj_oval_center_y,
-                               text=f"{obj_info['closest_distance_cm']:.0f}",
-                               fill="black", font=("Arial", 7), tags="detected_object")
-
-def update_map_with_bump(bump_info_string):
+    if obj.closest_dist_cm <= 0 or obj.width_cm <= 0: return
+    object_angle_relative_to_robot_forward_deg = obj.middle_angle_deg - 90.0
+    world_angle_of_object_center_deg = robot_angle_deg + object_angle_relative_to_robot_forward_deg # Use static angle
+    obj_center_angle_world_rad = math.radians(world_angle_of_object_center_deg)
+    obj_closest_edge_dist_cm = obj.closest_dist_cm
+    obj_visual_radius_cm = obj.width_cm / 2.0
+    oval_center_dist_from_sensor_cm = obj_closest_edge_dist_cm + obj_visual_radius_cm
+    oval_center_dist_pixels = oval_center_dist_from_sensor_cm * MAP_SCALE
+    obj_oval_center_x = sensor_origin_x + oval_center_dist_pixels * math.cos(obj_center_angle_world_rad)
+    obj_oval_center_y = sensor_origin_y - oval_center_dist_pixels * math.sin(obj_center_angle_world_rad)
+    obj_visual_radius_pixels = max(obj_visual_radius_cm * MAP_SCALE, 2.0)
+    map_canvas.create_oval(obj_oval_center_x - obj_visual_radius_pixels,
+                           obj_oval_center_y - obj_visual_radius_pixels,
+                           obj_oval_center_x + obj_visual_radius_pixels,
+                           obj_oval_center_y + obj_visual_radius_pixels,
+                           outline="darkmagenta", fill="orchid", width=2, tags="detected_object")
+    map_canvas.create_text(obj_oval_center_x, obj_oval_center_y,
+                           text=f"{obj.closest_dist_cm:.0f}",
+                           fill="black", font=("Arial", 7), tags="detected_object")
+
+def update_map_with_bump(bump):
     global robot_x, robot_y, robot_angle_deg, map_canvas
     if not map_canvas: return
-    if DEBUG_OBJECT_DETECTION: print(f"Updating map with bump: {bump_info_string}")
+    if DEBUG_OBJECT_DETECTION: print(f"Updating map with bump: {bump.text}")
     bump_angle_relative_deg = 0
-    if "LEFT" in bump_info_string.upper(): bump_angle_relative_deg = 45
-    elif "RIGHT" in bump_info_string.upper(): bump_angle_relative_deg = -45
+    if bump.side == "LEFT": bump_angle_relative_deg = 45
+    elif bump.side == "RIGHT": bump_angle_relative_deg = -45
     bump_angle_world_deg = robot_angle_deg + bump_angle_relative_deg # Use static angle
     bump_angle_world_rad = math.radians(bump_angle_world_deg)
     bump_indicator_offset_x = ROBOT_RADIUS_PIXELS * math.cos(bump_angle_world_rad)
@@ -587,7 +437,7 @@ def update_map_with_bump(bump_info_string):
                                 fill="red", outline="darkred", tags="bump_event")
 
 # ---vvv--- MODIFIED FUNCTION: Robot icon on map is static (x,y) AND orientation ---vvv---
-def update_robot_position_and_trail(move_data_string):
+def update_robot_position_and_trail(move):
     """
     Processes movement data from CyBot.
     Populates movement_history for the trail panel.
@@ -597,130 +447,39 @@ def update_robot_position_and_trail(move_data_string):
     global movement_history
 
     try:
-        dist_cm, angle_deg_delta = 0.0, 0.0
-        parts = move_data_string.split(',')
-        for part in parts:
-            key_value = part.split('=')
-            if len(key_value) == 2:
-                key, value = key_value[0].strip(), key_value[1].strip()
-                if key == "DIST_CM":
-                    dist_cm = float(value)
-                elif key == "ANGLE_DEG":
-                    angle_deg_delta = float(value)
+        dist_cm, angle_deg_delta = move.dist_cm, move.angle_deg # cybot.model.MoveEvent
 
         if DEBUG_TRAIL_PANEL:
             print(f"TRAIL_DEBUG: update_robot_pos_and_trail received: dist_cm={dist_cm}, angle_delta={angle_deg_delta}")
 
         # --- Add to movement history for the new trail panel ---
-        if abs(angle_deg_delta) > 0.01:
-            movement_history.append({'type': 'turn', 'angle': angle_deg_delta})
-            if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: Appending turn: {angle_deg_delta}")
-
-        if abs(dist_cm) > 0.01:
-            movement_history.append({'type': 'move', 'distance': dist_cm})
-            if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: Appending move: {dist_cm}")
+        # One MoveEvent per MOVE line: the turn is applied first, then the straight distance (0 = none)
+        turn_deg = angle_deg_delta if abs(angle_deg_delta) > 0.01 else 0.0
+        step_cm = dist_cm if abs(dist_cm) > 0.01 else 0.0
+        if turn_deg or step_cm:
+            movement_history.append(MoveEvent(turn_deg, step_cm))
+            trail_path.add(turn_deg, step_cm)
+            if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: Appending {movement_history[-1]}")
 
         # After any movement, redraw the trail panel
         if abs(dist_cm) > 0.01 or abs(angle_deg_delta) > 0.01:
-            if DEBUG_TRAIL_PANEL: print("TRAIL_DEBUG: Scheduling redraw_trail_on_panel")
-            app.after(10, redraw_trail_on_panel)
+            if DEBUG_TRAIL_PANEL: print("TRAIL_DEBUG: Marking trail view dirty")
+            render_scheduler.mark_dirty("trail")
 
     except ValueError as ve:
-        print(f"ValueError processing move data '{move_data_string}': {ve}")
+        print(f"ValueError processing move data {move}: {ve}")
     except Exception as e:
-        print(f"Error processing move data '{move_data_string}': {e}")
+        print(f"Error processing move data {move}: {e}")
 # ---^^^--- MODIFIED FUNCTION ---^^^---
 
 def draw_radar_plot():
     global last_scan_data, radar_canvas
     if not radar_canvas: return
-    radar_canvas.delete("all")
     if not last_scan_data: return
     try:
-        canvas_width = radar_canvas.winfo_width()
-        canvas_height = radar_canvas.winfo_height()
+        radar_view.draw(last_scan_data)
     except tk.TclError:
-        app.after(50, draw_radar_plot)
-        return
-    if canvas_width <= 1 or canvas_height <= 1: return
-    center_x = canvas_width / 2
-    center_y = canvas_height
-    max_radius_pixels = min(canvas_width / 2.0, canvas_height) * 0.9
-    max_dist_cm_for_plot = 330.0
-    grid_color = "#A0A0A0"; label_color = "#505050"
-    for r_cm in [50, 100, 150, 200, 250, 300]:
-        if r_cm > max_dist_cm_for_plot : continue
-        r_ratio = r_cm / max_dist_cm_for_plot
-        r_pixels = max_radius_pixels * r_ratio
-        if all(map(math.isfinite, [center_x - r_pixels, center_y - r_pixels, center_x + r_pixels, center_y + r_pixels])):
-            radar_canvas.create_arc(center_x - r_pixels, center_y - r_pixels, center_x + r_pixels, center_y + r_pixels,
-                                    start=0, extent=180, outline=grid_color, style=tk.ARC, tags="scan_plot_grid")
-            text_r_pixels = r_pixels + 2
-            if math.isfinite(center_x + 5) and math.isfinite(center_y - text_r_pixels + 8):
-                 radar_canvas.create_text(center_x + 5, center_y - text_r_pixels + 8, text=f"{r_cm:.0f}", fill=label_color, font=("Arial", 7), anchor="w", tags="scan_plot_grid")
-    for angle_deg_servo_frame in range(0, 181, 30):
-        plot_angle_rad = math.radians(angle_deg_servo_frame)
-        line_end_x = center_x + max_radius_pixels * math.cos(plot_angle_rad)
-        line_end_y = center_y - max_radius_pixels * math.sin(plot_angle_rad)
-        if all(map(math.isfinite, [center_x, center_y, line_end_x, line_end_y])):
-            radar_canvas.create_line(center_x, center_y, line_end_x, line_end_y, fill=grid_color, tags="scan_plot_grid")
-        label_rad_offset = max_radius_pixels * 1.05
-        label_x = center_x + label_rad_offset * math.cos(plot_angle_rad)
-        label_y = center_y - label_rad_offset * math.sin(plot_angle_rad)
-        anchor_pos = tk.CENTER; x_offset = 0; y_offset = 0
-        if angle_deg_servo_frame == 0: anchor_pos = tk.W; x_offset = 3
-        elif angle_deg_servo_frame == 180: anchor_pos = tk.E; x_offset = -3
-        elif angle_deg_servo_frame == 90: anchor_pos = tk.S; y_offset = -3
-        elif angle_deg_servo_frame > 90:
-            anchor_pos = tk.NE if angle_deg_servo_frame < 135 else tk.E ; y_offset = 1; x_offset = -1
-        elif angle_deg_servo_frame < 90:
-            anchor_pos = tk.NW if angle_deg_servo_frame > 45 else tk.W; y_offset = 1; x_offset = 1
-        if all(map(math.isfinite, [label_x + x_offset, label_y + y_offset])):
-             radar_canvas.create_text(label_x + x_offset, label_y + y_offset, text=f"{angle_deg_servo_frame}°", fill=label_color, font=("Arial", 8), anchor=anchor_pos, tags="scan_plot_grid")
-    robot_icon_size = 5
-    if all(map(math.isfinite, [center_x - robot_icon_size, center_y - robot_icon_size, center_x + robot_icon_size, center_y])):
-        radar_canvas.create_oval(center_x - robot_icon_size, center_y - robot_icon_size,
-                                 center_x + robot_icon_size, center_y,
-                                 fill="darkgreen", outline="black", tags="radar_robot")
-        radar_canvas.create_line(center_x, center_y, center_x, center_y - robot_icon_size * 1.5,
-                                 fill="white", width=1, arrow=tk.LAST, tags="radar_robot")
-    ping_points_pixels = []
-    ir_points_pixels = []
-    for angle_deg_servo_frame, dist_cm, ir_raw in last_scan_data:
-        plot_angle_rad = math.radians(angle_deg_servo_frame)
-        valid_ping_point_for_current_segment = False
-        valid_ir_point_for_current_segment = False
-        if dist_cm > 0 and dist_cm <= max_dist_cm_for_plot:
-            ping_plot_radius_pixels = (dist_cm / max_dist_cm_for_plot) * max_radius_pixels
-            ping_point_x = center_x + ping_plot_radius_pixels * math.cos(plot_angle_rad)
-            ping_point_y = center_y - ping_plot_radius_pixels * math.sin(plot_angle_rad)
-            if math.isfinite(ping_point_x) and math.isfinite(ping_point_y):
-                ping_points_pixels.extend([ping_point_x, ping_point_y])
-                valid_ping_point_for_current_segment = True
-        if not valid_ping_point_for_current_segment and len(ping_points_pixels) >= 4:
-            try: radar_canvas.create_line(ping_points_pixels, fill="red", width=2, tags="ping_scan_plot")
-            except Exception as e: print(f"Error drawing PING line segment (invalid point): {e}")
-            ping_points_pixels = []
-        if ir_raw >= IR_VALID_MIN:
-            clamped_ir = max(IR_MIN_RAW, min(ir_raw, IR_MAX_RAW))
-            norm_ir = (clamped_ir - IR_MIN_RAW) / (IR_MAX_RAW - IR_MIN_RAW)
-            ir_plot_radius_pixels = (1.0 - norm_ir) * max_radius_pixels
-            ir_plot_radius_pixels = max(0, ir_plot_radius_pixels)
-            ir_point_x = center_x + ir_plot_radius_pixels * math.cos(plot_angle_rad)
-            ir_point_y = center_y - ir_plot_radius_pixels * math.sin(plot_angle_rad)
-            if math.isfinite(ir_point_x) and math.isfinite(ir_point_y):
-                ir_points_pixels.extend([ir_point_x, ir_point_y])
-                valid_ir_point_for_current_segment = True
-        if not valid_ir_point_for_current_segment and len(ir_points_pixels) >= 4:
-            try: radar_canvas.create_line(ir_points_pixels, fill="blue", width=2, tags="ir_scan_plot")
-            except Exception as e: print(f"Error drawing IR line segment (invalid point): {e}")
-            ir_points_pixels = []
-    if len(ping_points_pixels) >= 4:
-        try: radar_canvas.create_line(ping_points_pixels, fill="red", width=2, tags="ping_scan_plot")
-        except Exception as e: print(f"Error drawing final PING line segment: {e}")
-    if len(ir_points_pixels) >= 4:
-        try: radar_canvas.create_line(ir_points_pixels, fill="blue", width=2, tags="ir_scan_plot")
-        except Exception as e: print(f"Error drawing final IR line segment: {e}")
+        render_scheduler.mark_dirty("radar")
 
 def clear_map_features(tag_to_clear):
     global map_canvas
@@ -760,6 +519,8 @@ def initialize_trail_display():
     # REMOVED: last_cliff_pattern, last_cliff_type reset
     if DEBUG_TRAIL_PANEL: print("TRAIL_DEBUG: initialize_trail_display called")
     movement_history = []
+    trail_path.clear()
+    trail_view.invalidate()
     if trail_canvas:
         trail_canvas.delete("all") # Clear everything including manual objects and start dot
         try:
@@ -786,65 +547,23 @@ def clear_all_trails():
     # Manual objects are cleared by initialize_trail_display via trail_canvas.delete("all")
 
 def redraw_trail_on_panel(event=None):
-    """Draws the accumulated movement history on the trail_canvas."""
+    """Brings the trail panel up to date (new moves only; full replay from cached poses after a resize)."""
     global trail_canvas, movement_history, TRAIL_SCALE
-    # REMOVED: last_cliff_pattern, last_cliff_type from globals
 
     if DEBUG_TRAIL_PANEL:
         print(f"TRAIL_DEBUG: redraw_trail_on_panel called. Event: {event}")
         if trail_canvas:
-            trail_canvas.update_idletasks()
             print(f"TRAIL_DEBUG: Canvas W={trail_canvas.winfo_width()}, H={trail_canvas.winfo_height()}")
-        print(f"TRAIL_DEBUG: Movement history length: {len(movement_history)}")
-        # REMOVED: print for cliff state
+        print(f"TRAIL_DEBUG: Movement history length: {len(movement_history)}, trail points: {len(trail_path)}")
 
     if not trail_canvas:
         if DEBUG_TRAIL_PANEL: print("TRAIL_DEBUG: Trail canvas not available, returning.")
         return
 
     try:
-        trail_canvas.update_idletasks()
-        canvas_width = trail_canvas.winfo_width()
-        canvas_height = trail_canvas.winfo_height()
-        # Keep manual objects, delete trail segments and start dot
-        trail_canvas.delete("trail_segment", "trail_start_dot")
-        # REMOVED: delete cliff_marker tag
-
-        if canvas_width <= 1 or canvas_height <= 1:
-            if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: Canvas not ready/sized (W:{canvas_width}, H:{canvas_height}), returning from redraw.")
-            return
-
-        current_pen_x = canvas_width / 2
-        current_pen_y = canvas_height / 2
-        current_pen_angle_deg = 90.0
-        trail_canvas.create_oval(current_pen_x - 3, current_pen_y - 3, current_pen_x + 3, current_pen_y + 3,
-                                 fill="blue", outline="blue", tags="trail_start_dot")
-
-        for i, movement in enumerate(movement_history):
-            prev_pen_x, prev_pen_y = current_pen_x, current_pen_y
-
-            if movement['type'] == 'turn':
-                current_pen_angle_deg -= movement['angle'] # Apply angle fix
-                current_pen_angle_deg %= 360
-                if current_pen_angle_deg < 0: current_pen_angle_deg += 360
-                # if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: Processed turn {i+1}. New angle: {current_pen_angle_deg:.1f}")
-
-            elif movement['type'] == 'move':
-                distance_pixels = movement['distance'] * TRAIL_SCALE
-                current_pen_angle_rad = math.radians(current_pen_angle_deg)
-                current_pen_x += distance_pixels * math.cos(current_pen_angle_rad)
-                current_pen_y -= distance_pixels * math.sin(current_pen_angle_rad)
-
-                # if DEBUG_TRAIL_PANEL:
-                #     print(f"TRAIL_DEBUG: Processing move {i+1}: dist_cm={movement['distance']:.2f}, dist_px={distance_pixels:.2f}, angle={current_pen_angle_deg:.1f}")
-                #     print(f"TRAIL_DEBUG: Line from ({prev_pen_x:.1f},{prev_pen_y:.1f}) to ({current_pen_x:.1f},{current_pen_y:.1f})")
-
-                trail_canvas.create_line(prev_pen_x, prev_pen_y, current_pen_x, current_pen_y,
-                                        fill="black", width=2, arrow=tk.LAST, tags="trail_segment")
-
-            # ---vvv--- REMOVED Cliff Marker drawing logic ---vvv---
-            # ---^^^--- REMOVED Cliff Marker drawing logic ---^^^---
-
+        trail_view.scale = TRAIL_SCALE
+        if not trail_view.draw():
+            if DEBUG_TRAIL_PANEL: print("TRAIL_DEBUG: Canvas not ready/sized, returning from redraw.")
     except tk.TclError as e:
         if DEBUG_TRAIL_PANEL: print(f"TRAIL_DEBUG: TclError during trail panel redraw: {e}")
         pass
@@ -880,7 +599,10 @@ ttk.Label(control_frame, text="Movement: Use WASD keys").pack(side=tk.LEFT, padx
 paned_window = ttk.PanedWindow(app, orient=tk.HORIZONTAL); paned_window.pack(pady=10, padx=10, expand=True, fill="both")
 left_pane_frame = ttk.Frame(paned_window, width=400); paned_window.add(left_pane_frame, weight=1)
 raw_data_frame = ttk.LabelFrame(left_pane_frame, text="Raw Data Log"); raw_data_frame.pack(pady=5, padx=5, expand=True, fill="both")
+raw_log_autoscroll_var = tk.BooleanVar(value=True)
+ttk.Checkbutton(raw_data_frame, text="Auto-scroll", variable=raw_log_autoscroll_var, command=lambda: raw_log.set_auto_scroll(raw_log_autoscroll_var.get())).pack(side=tk.BOTTOM, anchor="w")
 raw_data_text = scrolledtext.ScrolledText(raw_data_frame, wrap=tk.WORD, height=15, width=45, font=("Consolas", 9)); raw_data_text.pack(expand=True, fill="both")
+raw_log = LogView(raw_data_text, max_lines=RAW_LOG_MAX_LINES)
 bottom_left_frame = ttk.Frame(left_pane_frame); bottom_left_frame.pack(pady=5, padx=5, fill="x", side=tk.BOTTOM)
 sensor_frame = ttk.LabelFrame(bottom_left_frame, text="Sensor Status"); sensor_frame.pack(side=tk.LEFT, padx=(0, 5), fill="y", anchor='nw')
 sensor_canvas = tk.Canvas(sensor_frame, width=200, height=200, bg="white", highlightthickness=1, highlightbackground="grey")
@@ -891,6 +613,9 @@ sensor_canvas.create_oval(65, 55, 75, 65, fill="grey", outline="black", tags="cl
 sensor_canvas.create_oval(85, 45, 95, 55, fill="grey", outline="black", tags="cliff_fl_indicator")
 sensor_canvas.create_oval(105, 45, 115, 55, fill="grey", outline="black", tags="cliff_fr_indicator")
 sensor_canvas.create_oval(125, 55, 135, 65, fill="grey", outline="black", tags="cliff_r_indicator")
+sensor_panel = SensorPanel(sensor_canvas)
+left_bumper_line = sensor_panel.add_line((50, 80, 70, 60), "grey", width=4, tags="status_indicator")
+right_bumper_line = sensor_panel.add_line((150, 80, 130, 60), "grey", width=4, tags="status_indicator")
 cliff_signal_frame = ttk.Frame(sensor_frame)
 cliff_signal_frame.pack(pady=(0, 2), anchor='n')
 cliff_l_sig_label = ttk.Label(cliff_signal_frame, text="L: N/A", width=7, anchor="center"); cliff_l_sig_label.pack(side=tk.LEFT, padx=1)
@@ -901,8 +626,9 @@ ping_label = ttk.Label(sensor_frame, text="Ping: N/A", anchor="center")
 ping_label.pack(pady=(2, 5), anchor='n')
 radar_frame = ttk.LabelFrame(bottom_left_frame, text="Last Scan Radar"); radar_frame.pack(side=tk.LEFT, padx=(5, 0), expand=True, fill="both")
 radar_canvas = tk.Canvas(radar_frame, bg="#d0d0e0", highlightthickness=1, highlightbackground="grey"); radar_canvas.pack(expand=True, fill="both", pady=5, padx=5)
-radar_canvas.bind("<Configure>", lambda e: app.after(50, draw_radar_plot))
-clear_radar_button = ttk.Button(radar_frame, text="Clear Radar", command=lambda: radar_canvas.delete("ping_scan_plot", "ir_scan_plot")); clear_radar_button.pack(side=tk.BOTTOM, pady=2)
+radar_view = RadarView(radar_canvas, IR_VALID_MIN, IR_MIN_RAW, IR_MAX_RAW)
+radar_canvas.bind("<Configure>", lambda e: render_scheduler.mark_dirty("radar"))
+clear_radar_button = ttk.Button(radar_frame, text="Clear Radar", command=lambda: radar_view.clear()); clear_radar_button.pack(side=tk.BOTTOM, pady=2)
 
 # --- Right Pane (Map and Trail Panel) ---
 main_map_and_trail_frame = ttk.Frame(paned_window)
@@ -911,11 +637,13 @@ actual_map_frame = ttk.LabelFrame(main_map_and_trail_frame, text="Test Field Map
 actual_map_frame.pack(pady=(0,5), padx=5, expand=True, fill="both", side=tk.TOP)
 map_canvas = tk.Canvas(actual_map_frame, bg="lightgrey", highlightthickness=1, highlightbackground="grey")
 map_canvas.pack(expand=True, fill="both")
-map_canvas.bind("<Configure>", lambda e: app.after(50, draw_robot_on_map))
+map_canvas.bind("<Configure>", lambda e: render_scheduler.mark_dirty("map"))
 map_button_frame = ttk.Frame(actual_map_frame)
 map_button_frame.pack(side=tk.BOTTOM, fill="x", pady=2)
 clear_objects_button = ttk.Button(map_button_frame, text="Clear Objects", command=lambda: clear_map_features("detected_object"))
 clear_objects_button.pack(side=tk.LEFT, padx=5)
+redraw_objects_button = ttk.Button(map_button_frame, text="Redraw Objects", command=lambda: render_scheduler.mark_dirty("objects"))
+redraw_objects_button.pack(side=tk.LEFT, padx=5)
 clear_bump_button = ttk.Button(map_button_frame, text="Clear Bump Events", command=lambda: clear_map_features("bump_event"))
 clear_bump_button.pack(side=tk.LEFT, padx=5)
 clear_trail_button = ttk.Button(map_button_frame, text="Clear Trail", command=clear_all_trails) # Clears trail panel too
@@ -925,7 +653,8 @@ trail_panel_frame = ttk.LabelFrame(main_map_and_trail_frame, text="Movement Trai
 trail_panel_frame.pack(pady=(5,0), padx=5, expand=True, fill="both", side=tk.BOTTOM)
 trail_canvas = tk.Canvas(trail_panel_frame, bg="lightyellow", highlightthickness=1, highlightbackground="grey")
 trail_canvas.pack(expand=True, fill="both", pady=5, padx=5)
-trail_canvas.bind("<Configure>", redraw_trail_on_panel)
+trail_view = TrailView(trail_canvas, trail_path, TRAIL_SCALE)
+trail_canvas.bind("<Configure>", lambda e: render_scheduler.mark_dirty("trail"))
 # ---vvv--- Bind click event for manual object plotting ---vvv---
 trail_canvas.bind("<Button-1>", handle_trail_click)
 # ---^^^--- Bind click event for manual object plotting ---^^^---
@@ -947,17 +676,36 @@ def on_closing():
         stop_thread_flag.set()
         app.after(200, app.destroy)
 app.protocol("WM_DELETE_WINDOW", on_closing)
+gui_wakeup = TkWakeup(app, process_incoming_messages)
+status_coalescer = StatusCoalescer(update_sensor_status)
+render_scheduler = RenderScheduler(app, max_fps=RENDER_MAX_FPS)
+render_scheduler.add_view("sensor", status_coalescer.flush)
+render_scheduler.add_view("radar", draw_radar_plot)
+render_scheduler.add_view("map", draw_robot_on_map)
+render_scheduler.add_view("objects", detect_and_plot_objects)
+render_scheduler.add_view("trail", redraw_trail_on_panel)
+streaming_detector = StreamingDetector(current_detection_params(), plot_live_object)
+detection_cache = DetectionCache()
+# Message routing: line prefix -> precompiled parser (cybot.protocol) -> typed record -> handler below.
+# New message types only need a register_parser/on pair here, no parse_cybot_message edits.
+message_dispatcher = default_dispatcher()
+message_dispatcher.on(StatusSample, status_coalescer.push)
+message_dispatcher.on(ScanPoint, append_scan_data)
+message_dispatcher.on(ScanEnd, handle_scan_end)
+message_dispatcher.on(MoveEvent, update_robot_position_and_trail)
+message_dispatcher.on(BumpEvent, update_map_with_bump)
 unbind_keys()
 try:
-    update_sensor_status("BUMP_L=0,BUMP_R=0,CLIFF_L_SIG=0,CLIFF_FL_SIG=0,CLIFF_FR_SIG=0,CLIFF_R_SIG=0,PING=0.0,Heading=0")
-    app.after(100, draw_radar_plot)
+    update_sensor_status(parse_status("BUMP_L=0,BUMP_R=0,CLIFF_L_SIG=0,CLIFF_FL_SIG=0,CLIFF_FR_SIG=0,CLIFF_R_SIG=0,PING=0.0,Heading=0"))
+    app.after(100, render_scheduler.mark_dirty, "radar")
     app.after(100, initialize_robot_position)
     app.after(150, initialize_trail_display)
-    app.after(200, redraw_trail_on_panel)
+    app.after(200, render_scheduler.mark_dirty, "trail")
 except Exception as e:
     print(f"ERROR during initial GUI update: {e}")
     messagebox.showerror("Startup Error", f"An error occurred during initial GUI setup:\n{e}")
 app.mainloop()
 # --- Cleanup ---
 print("Application closing.")
+print(render_scheduler.report())
 stop_thread_flag.set()
\ No newline at end of file
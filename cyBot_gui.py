@@ -6,11 +6,19 @@ import time
 import queue # For thread-safe communication between socket thread and GUI thread
 import math  # For map calculations
 
+from cybot.ingest import IngestEngine # selector loop that owns the socket while connected
+from cybot.tkwake import TkWakeup # wakes the Tk loop as soon as the ingest thread queues data
+from cybot.logview import LogView # bounded raw data log, one batched insert per frame
+from cybot.status import StatusCoalescer # one sensor panel redraw per drain pass
+from cybot.protocol import parse_status # STATUS payload -> cybot.model.StatusSample
+
 # --- Constants ---
 # !!! IMPORTANT: Replace with your CyBot's actual IP address !!!
 # Find this using 'ipconfig' in PuTTY connected via USB-Serial to the CyBot
 CYBOT_IP = "192.168.1.1"  # <--- CHANGE THIS to your CyBot's IP
 CYBOT_PORT = 288         # The port number CyBot listens on (usually 288)
+GUI_DRAIN_BUDGET_S = 0.008 # Max seconds per queue-processing pass before yielding back to Tk
+RAW_LOG_MAX_LINES = 2000 # The raw data log drops its oldest lines beyond this
 
 # --- Global Variables ---
 cybot_socket = None
@@ -19,6 +27,8 @@ is_connected = False
 message_queue = queue.Queue()
 # Flag to signal the listening thread to stop
 stop_thread_flag = threading.Event()
+# Selector-based ingest thread (cybot.ingest), running while connected
+ingest_engine = None
 
 # --- Network Communication ---
 
@@ -45,12 +55,9 @@ def connect_to_cybot():
         disconnect_button.config(state=tk.NORMAL)
         send_button.config(state=tk.NORMAL)
 
-        # Start the listening thread
+        # Start the ingest thread
         stop_thread_flag.clear() # Ensure flag is reset
-        listen_thread = threading.Thread(target=listen_for_messages, daemon=True)
-        listen_thread.start()
-        # Start processing messages from the queue
-        app.after(100, process_incoming_messages)
+        start_listening() # Queued messages wake process_incoming_messages through gui_wakeup
 
     except socket.timeout:
         status_label.config(text="Connection timed out.", foreground="red")
@@ -72,6 +79,7 @@ def disconnect_from_cybot():
 
     status_label.config(text="Disconnecting...", foreground="black")
     stop_thread_flag.set() # Signal the listening thread to stop
+    stop_listening() # Wait for it before closing the socket underneath it
 
     if cybot_socket:
         # Attempt to close the socket gracefully
@@ -111,63 +119,50 @@ def send_command(event=None): # Added event=None to handle <Return> key binding
         # Ensure command ends with newline for CyBot C code using readline/getByte loop
         if not command.endswith('\n'):
             command += '\n'
-        cybot_socket.sendall(command.encode('utf-8'))
+        ingest_engine.send(command.encode('utf-8')) # Written by the ingest thread when the socket is writable
         # Display sent command in the raw data log
-        raw_data_text.insert(tk.END, f"--> Sent: {command}")
-        raw_data_text.see(tk.END) # Scroll to the bottom
+        raw_log.append(f"--> Sent: {command.rstrip()}")
         command_entry.delete(0, tk.END) # Clear entry box after sending
     except Exception as e:
         status_label.config(text=f"Send failed: {e}", foreground="red")
         messagebox.showerror("Send Error", f"Failed to send command.\nError: {e}")
         disconnect_from_cybot() # Assume connection is lost if send fails
 
-def listen_for_messages():
+def start_listening():
     """
-    Listens for incoming messages from the CyBot in a separate thread.
-    Uses a loop that checks a flag for termination.
-    Puts received messages into a thread-safe queue for the main GUI thread.
+    Starts the ingest thread for the connected socket.
+    A single selectors loop waits for incoming data, pending outgoing commands and
+    the stop signal at the same time, so it never has to poll with a recv timeout.
+    Received lines are put into the thread-safe queue for the main GUI thread in batches,
+    and the GUI thread is woken up right away instead of polling the queue on a timer.
     """
-    global cybot_socket, is_connected
-    print("Listening thread started.")
-    while not stop_thread_flag.is_set():
-        try:
-            # Use a timeout on recv to allow checking the stop flag periodically
-            # This makes the thread more responsive to the disconnect signal
-            cybot_socket.settimeout(0.2) # Check stop flag every 0.2 seconds
-            data_bytes = cybot_socket.recv(4096) # Receive up to 4096 bytes
-            cybot_socket.settimeout(None) # Reset timeout after successful receive
-
-            if data_bytes:
-                # Decode safely, replacing errors, and put message in queue
-                message = data_bytes.decode('utf-8', errors='replace')
-                message_queue.put(message)
-            else:
-                # Empty data usually means the connection was closed by the server
-                print("Connection closed by server (received empty data).")
-                if not stop_thread_flag.is_set(): # Avoid duplicate disconnect logic
-                    message_queue.put("CONNECTION_CLOSED")
-                break # Exit loop
-
-        except socket.timeout:
-            # This is expected when using timeout, just continue loop to check flag
-            continue
-        except Exception as e:
-            # Handle other socket errors (e.g., connection reset)
-            if not stop_thread_flag.is_set(): # Only report error if not initiated by us
-                 print(f"Socket error in listening thread: {e}")
-                 message_queue.put("CONNECTION_ERROR")
-            break # Exit loop on error
-
-    print("Listening thread finished.")
-    # Ensure disconnect state is reflected in GUI if thread exits unexpectedly
-    if not stop_thread_flag.is_set():
-        app.after(0, disconnect_from_cybot) # Schedule disconnect in main thread
+    global ingest_engine
+    ingest_engine = IngestEngine(cybot_socket,
+                                 on_lines=post_to_gui,
+                                 on_closed=lambda: post_to_gui("CONNECTION_CLOSED"),
+                                 on_error=lambda e: post_to_gui("CONNECTION_ERROR"),
+                                 stop_event=stop_thread_flag)
+    ingest_engine.start()
+
+def post_to_gui(item):
+    """Puts a batch of lines (or a connection signal) on the queue and wakes the GUI thread."""
+    message_queue.put(item)
+    gui_wakeup.notify() # Repeated notifies before the GUI runs collapse into one wake-up
+
+def stop_listening():
+    """Wakes the ingest thread and waits for it to finish."""
+    global ingest_engine
+    if ingest_engine:
+        ingest_engine.stop()
+        ingest_engine = None
 
 
 def process_incoming_messages():
     """Processes messages from the queue in the main GUI thread."""
+    # Stop after GUI_DRAIN_BUDGET_S so a burst of data can't block key presses and redraws
+    deadline = time.perf_counter() + GUI_DRAIN_BUDGET_S
     try:
-        while not message_queue.empty():
+        while time.perf_counter() < deadline:
             message = message_queue.get_nowait() # Get message without blocking
 
             if message == "CONNECTION_CLOSED":
@@ -182,23 +177,25 @@ def process_incoming_messages():
                  break # Stop processing further messages from this connection
             else:
                 # --- Update Raw Data Display ---
-                # Add timestamp for clarity
+                # Add timestamp for clarity (messages are batches of lines without the newline)
                 timestamp = time.strftime("%H:%M:%S", time.localtime())
-                raw_data_text.insert(tk.END, f"[{timestamp}] {message}")
-                # Ensure newline if message doesn't end with one visually
-                if not message.endswith('\n'):
-                    raw_data_text.insert(tk.END, "\n")
-                raw_data_text.see(tk.END) # Scroll to bottom
+                # (raw_log writes the whole batch with one insert on its next flush)
+                raw_log.extend(f"[{timestamp}] {line}" for line in message)
 
                 # --- Parse message and update Map & Sensor Status ---
-                parse_cybot_message(message)
+                for line in message:
+                    parse_cybot_message(line)
 
     except queue.Empty:
         pass # No messages to process right now
 
-    # Schedule this function to run again if still connected or thread running
-    if is_connected or not stop_thread_flag.is_set():
-         app.after(100, process_incoming_messages) # Check queue every 100ms
+    # Redraw the sensor canvas once, from the newest STATUS line of this pass
+    status_coalescer.flush()
+
+    # Ran out of time with messages left: continue once Tk has handled pending events.
+    # Nothing is scheduled when the queue is empty, the next post_to_gui wakes us up.
+    if (is_connected or not stop_thread_flag.is_set()) and not message_queue.empty():
+         app.after(1, process_incoming_messages)
 
 def parse_cybot_message(message):
     """Parses a message string from CyBot and calls update functions."""
@@ -213,7 +210,7 @@ def parse_cybot_message(message):
         try:
             if line.startswith("STATUS:"):
                 # Example: "STATUS:BUMP_L=1,BUMP_R=0,CLIFF_L=0,CLIFF_FL=0,CLIFF_FR=0,CLIFF_R=0"
-                update_sensor_status(line[len("STATUS:"):])
+                status_coalescer.push(parse_status(line[len("STATUS:"):])) # Rendered once at the end of the drain pass
             elif line.startswith("SCAN:"):
                 # Example: "SCAN:ANGLE=90,IR_ADC=1500,DIST_MM=500"
                 update_map_with_scan(line[len("SCAN:"):])
@@ -233,10 +230,9 @@ def parse_cybot_message(message):
 
 # --- GUI Update Functions (Implement these based on parsing) ---
 
-def update_sensor_status(status_string):
-    """Updates the sensor visualization canvas based on parsed status."""
-    # Example: status_string might be "BUMP_L=1,BUMP_R=0,CLIFF_L=0..."
-    print(f"Updating sensor status with: {status_string}")
+def update_sensor_status(sample):
+    """Updates the sensor visualization canvas from a parsed status (cybot.model.StatusSample)."""
+    print(f"Updating sensor status with: {sample}")
 
     # Clear previous dynamic drawings (use a specific tag)
     sensor_canvas.delete("status_indicator")
@@ -251,22 +247,13 @@ def update_sensor_status(status_string):
     cliff_fr_color = "grey"
     cliff_r_color = "grey"
 
-    # --- Parse the status string and update colors ---
-    # This parsing is basic, make it robust for your format
-    parts = status_string.split(',')
-    for part in parts:
-        key_value = part.split('=')
-        if len(key_value) == 2:
-            key = key_value[0].strip()
-            value = key_value[1].strip()
-            if value == '1': # Assuming '1' means active/triggered
-                if key == "BUMP_L": left_bumper_color = "red"
-                elif key == "BUMP_R": right_bumper_color = "red"
-                elif key == "CLIFF_L": cliff_l_color = "orange"
-                elif key == "CLIFF_FL": cliff_fl_color = "orange"
-                elif key == "CLIFF_FR": cliff_fr_color = "orange"
-                elif key == "CLIFF_R": cliff_r_color = "orange"
-                # Add more sensor keys if needed
+    # --- Update colors from the parsed sample ('1' means active/triggered) ---
+    if sample.bump_l == 1: left_bumper_color = "red"
+    if sample.bump_r == 1: right_bumper_color = "red"
+    if sample.cliff_l == 1: cliff_l_color = "orange"
+    if sample.cliff_fl == 1: cliff_fl_color = "orange"
+    if sample.cliff_fr == 1: cliff_fr_color = "orange"
+    if sample.cliff_r == 1: cliff_r_color = "orange"
 
     # --- Redraw indicators with updated colors ---
     # Coordinates are approximate relative to the base Roomba circle (50,50,150,150)
@@ -415,9 +402,16 @@ paned_window.add(left_pane_frame, weight=1) # Allow resizing, less weight than m
 raw_data_frame = ttk.LabelFrame(left_pane_frame, text="Raw Data Log")
 # Make raw data expand vertically
 raw_data_frame.pack(pady=5, padx=5, expand=True, fill="both")
+# Checkbox to pause following the newest line (packed first so the text area can't squeeze it out)
+raw_log_autoscroll_var = tk.BooleanVar(value=True)
+autoscroll_check = ttk.Checkbutton(raw_data_frame, text="Auto-scroll", variable=raw_log_autoscroll_var,
+                                   command=lambda: raw_log.set_auto_scroll(raw_log_autoscroll_var.get()))
+autoscroll_check.pack(side=tk.BOTTOM, anchor="w")
 # Use ScrolledText for automatic scrollbars
 raw_data_text = scrolledtext.ScrolledText(raw_data_frame, wrap=tk.WORD, height=15, width=40, font=("Consolas", 9))
 raw_data_text.pack(expand=True, fill="both")
+# Bounded ring buffer in front of the widget: batched inserts, oldest lines trimmed in bulk
+raw_log = LogView(raw_data_text, max_lines=RAW_LOG_MAX_LINES)
 
 # Sensor Status Area
 sensor_frame = ttk.LabelFrame(left_pane_frame, text="Sensor Status")
@@ -428,7 +422,7 @@ sensor_canvas.pack(pady=5)
 # Initial drawing of the Roomba base and default status
 sensor_canvas.create_oval(50, 50, 150, 150, outline="black", width=2, tags="base") # Main body
 sensor_canvas.create_rectangle(90, 35, 110, 50, outline="black", width=2, tags="base") # Top bump/lid part
-update_sensor_status("BUMP_L=0,BUMP_R=0,CLIFF_L=0,CLIFF_FL=0,CLIFF_FR=0,CLIFF_R=0") # Draw initial grey state
+update_sensor_status(parse_status("BUMP_L=0,BUMP_R=0,CLIFF_L=0,CLIFF_FL=0,CLIFF_FR=0,CLIFF_R=0")) # Draw initial grey state
 
 
 # --- Right Pane (Map) ---
@@ -472,6 +466,11 @@ def on_closing():
         app.after(200, app.destroy)
 
 app.protocol("WM_DELETE_WINDOW", on_closing)
+gui_wakeup = TkWakeup(app, process_incoming_messages) # Lets the ingest thread wake the Tk main loop
+# Collapses each drain pass's STATUS lines into one update_sensor_status call.
+# Every '1' flag is latched so a bump or cliff that comes and goes within one pass is still shown.
+status_coalescer = StatusCoalescer(update_sensor_status,
+                                   latch_fields=("bump_l", "bump_r", "cliff_l", "cliff_fl", "cliff_fr", "cliff_r"))
 
 # Start the Tkinter event loop
 app.mainloop()
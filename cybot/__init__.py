@@ -0,0 +1,5 @@
+"""Shared helpers for the CyBot GUI scripts (socket framing, parsing, drawing).
+
+The GUI scripts (SomewhatWorkingGUI.py, borderandholes.py, ...) import these
+modules so the hot paths only have to be written once.
+"""
@@ -0,0 +1,399 @@
+"""Object detection on one scan sweep.
+
+An object is a run of points that all have a relevant PING distance
+(0 < dist <= max_dist_cm) and a strong IR reading. A run is opened by a sharp
+IR rise or a weak -> strong IR transition and closed by an unsuitable point or
+a sharp IR drop; the closing point may open the next run right away. Runs with
+fewer than min_points points are dropped. Every run is then measured: angular
+width, linear width (distance between the PING points at its two edges, from
+the shared servo angle unit vectors in cybot.geometry) and closest PING reading.
+
+segment_scan() is the point-by-point state machine detect_and_plot_objects
+used to run inline. segment_scan_numpy() finds exactly the same runs with
+array operations, and measure_segments_numpy() measures all of them at once.
+
+NumPy's per-call overhead outweighs the loop for a single 92-point sweep, so
+detect_objects() only vectorizes long scans (NUMPY_MIN_POINTS). Bulk work, such
+as re-running an archive after a threshold change, goes through
+detect_objects_batch(), which segments all sweeps in one pass.
+
+StreamingDetector runs the same state machine on a sweep that is still in
+progress and reports each object as soon as the point that closes it arrives.
+
+DetectionCache remembers the runs and objects of recent (scan contents,
+thresholds) pairs, so redrawing a scan that was already processed only redoes
+the map projection.
+"""
+import math
+from collections import OrderedDict
+
+from cybot.geometry import SERVO_GRID
+from cybot.model import DetectedObject
+
+try:
+    import numpy as np
+except ImportError: # Falls back to the pure Python state machine
+    np = None
+
+NUMPY_MIN_POINTS = 256 # Measured break-even of the NumPy path vs. the state machine for one scan
+DETECTION_CACHE_SIZE = 64 # Scan/threshold combinations kept by DetectionCache
+
+
+class DetectionParams:
+    """Thresholds for one detection run (the scripts' IR_* / OBJECT_* constants)."""
+    __slots__ = ("ir_min_strength", "ir_edge_rise", "ir_edge_drop", "max_dist_cm", "min_points", "min_angle_width_deg")
+
+    def __init__(self, ir_min_strength, ir_edge_rise, ir_edge_drop, max_dist_cm, min_points, min_angle_width_deg):
+        self.ir_min_strength = ir_min_strength
+        self.ir_edge_rise = ir_edge_rise
+        self.ir_edge_drop = ir_edge_drop
+        self.max_dist_cm = max_dist_cm
+        self.min_points = min_points
+        self.min_angle_width_deg = min_angle_width_deg
+
+    def key(self):
+        """All thresholds as a hashable tuple."""
+        return (self.ir_min_strength, self.ir_edge_rise, self.ir_edge_drop,
+                self.max_dist_cm, self.min_points, self.min_angle_width_deg)
+
+    @property
+    def dummy_ir(self):
+        """IR value assumed before the first point; weaker than anything considered strong."""
+        return min(self.ir_min_strength / 2, 50)
+
+    def __repr__(self):
+        return "DetectionParams(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+
+def segment_scan(angles, dists, irs, params):
+    """Point-by-point segmentation. Returns [(first, last), ...] index pairs, both inclusive."""
+    ir_min, rise, drop, max_dist = params.ir_min_strength, params.ir_edge_rise, params.ir_edge_drop, params.max_dist_cm
+    segments = []
+    start = None # Index of the first point of the open run, None when outside a run
+    prev_ir = params.dummy_ir
+    for i in range(len(angles)):
+        dist_cm, ir_raw = dists[i], irs[i]
+        ir_change = ir_raw - prev_ir
+        suitable = (dist_cm > 0 and dist_cm <= max_dist) and ir_raw >= ir_min
+        prev_strong = prev_ir >= ir_min
+        prev_ir = ir_raw
+        if start is not None:
+            is_sharp_drop = ir_raw >= ir_min and prev_strong and -ir_change >= drop
+            if suitable and not is_sharp_drop:
+                continue # Run goes on
+            if i - start >= params.min_points:
+                segments.append((start, i - 1))
+            start = None
+        if suitable and (ir_change >= rise or not prev_strong):
+            start = i
+    if start is not None and len(angles) - start >= params.min_points:
+        segments.append((start, len(angles) - 1))
+    return segments
+
+
+def segment_scan_numpy(angles, dists, irs, params, scan_starts=None):
+    """segment_scan() with array operations. Returns (first, last) int arrays.
+
+    A point that ends a run ("break": unsuitable or sharp drop) is the only
+    place where a new run can begin while another one is open, and a run that
+    has begun only ends at the next break. So between two breaks the state
+    machine opens at most one run: at the first point of that block that
+    satisfies the start condition, and it lasts until the block ends.
+
+    scan_starts (sorted indices, 0 first) lets the columns hold several sweeps
+    back to back; each start resets the previous IR reading and closes open runs.
+    """
+    d = np.asarray(dists, dtype=np.float64)
+    ir = np.asarray(irs, dtype=np.float64) # float64: no uint16 wrap-around in the differences
+    n = len(ir)
+    if n == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    if scan_starts is None:
+        scan_starts = [0]
+    prev_ir = np.empty(n)
+    prev_ir[1:] = ir[:-1]
+    prev_ir[scan_starts] = params.dummy_ir
+    ir_change = ir - prev_ir
+    strong = ir >= params.ir_min_strength
+    prev_strong = prev_ir >= params.ir_min_strength
+    suitable = (d > 0) & (d <= params.max_dist_cm) & strong
+    starts = suitable & ((ir_change >= params.ir_edge_rise) | ~prev_strong)
+    breaks = ~suitable | (strong & prev_strong & (-ir_change >= params.ir_edge_drop))
+    breaks[scan_starts] = True # Each sweep starts a new block
+
+    block_first = np.flatnonzero(breaks)
+    block_last = np.append(block_first[1:], n) - 1
+    candidates = np.flatnonzero(starts)
+    if len(candidates) == 0:
+        return candidates, candidates
+    block_of = np.cumsum(breaks)[candidates] - 1
+    first_in_block = np.empty(len(candidates), dtype=bool)
+    first_in_block[0] = True
+    first_in_block[1:] = block_of[1:] != block_of[:-1]
+    first = candidates[first_in_block]
+    last = block_last[block_of[first_in_block]]
+    keep = last - first + 1 >= params.min_points
+    return first[keep], last[keep]
+
+
+def _measure(start_angle, end_angle, start_dist, end_dist, valid_dists, num_points, params):
+    """Measurement of one run, as detect_and_plot_objects did it. None if the run is filtered out."""
+    if not valid_dists:
+        return None
+    angular_width_deg = abs(end_angle - start_angle)
+    if angular_width_deg < params.min_angle_width_deg:
+        return None
+    max_dist = params.max_dist_cm
+    if not (0 < start_dist <= max_dist and 0 < end_dist <= max_dist):
+        return None
+    # Chord between the two edge points (law of cosines), from the shared servo angle unit vectors
+    start_cos, start_sin = SERVO_GRID.unit(start_angle)
+    end_cos, end_sin = SERVO_GRID.unit(end_angle)
+    dx, dy = end_dist * end_cos - start_dist * start_cos, end_dist * end_sin - start_dist * start_sin
+    width_cm = math.sqrt(dx * dx + dy * dy)
+    return DetectedObject(start_angle, end_angle, min(valid_dists), width_cm, num_points)
+
+
+def measure_segments(angles, dists, segments, params):
+    """DetectedObject for every (first, last) run that passes the width/distance filters."""
+    objects = []
+    max_dist = params.max_dist_cm
+    for first, last in segments:
+        valid_dists = [d for d in dists[first:last + 1] if 0 < d <= max_dist]
+        obj = _measure(angles[first], angles[last], dists[first], dists[last], valid_dists, last - first + 1, params)
+        if obj is not None:
+            objects.append(obj)
+    return objects
+
+
+def measure_segments_numpy(angles, dists, first, last, params):
+    """measure_segments() for all runs at once (first/last as returned by segment_scan_numpy)."""
+    return _objects(*_measure_numpy(angles, dists, first, last, params))
+
+
+def _measure_numpy(angles, dists, first, last, params):
+    """Measurement columns of the runs that pass the filters, plus the kept runs' first indices."""
+    a = np.asarray(angles, dtype=np.float64)
+    d = np.asarray(dists, dtype=np.float64)
+    valid = (d > 0) & (d <= params.max_dist_cm)
+    if len(first) == 0:
+        return first, a[first], a[first], d[first], d[first], first
+    # Per-run count and min of the valid distances in one reduceat each. The extra
+    # trailing element keeps last + 1 a legal index when a run ends on the last point.
+    bounds = np.empty(2 * len(first), dtype=np.intp)
+    bounds[0::2] = first
+    bounds[1::2] = last + 1
+    count = np.add.reduceat(np.append(valid, False).astype(np.intp), bounds)[0::2]
+    closest = np.minimum.reduceat(np.append(np.where(valid, d, np.inf), np.inf), bounds)[0::2]
+
+    start_angle, end_angle = a[first], a[last]
+    start_dist, end_dist = d[first], d[last]
+    angular_width_deg = np.abs(end_angle - start_angle)
+    keep = ((count > 0) & (angular_width_deg >= params.min_angle_width_deg)
+            & valid[first] & valid[last])
+    start_cos, start_sin = SERVO_GRID.units_numpy(start_angle)
+    end_cos, end_sin = SERVO_GRID.units_numpy(end_angle)
+    dx, dy = end_dist * end_cos - start_dist * start_cos, end_dist * end_sin - start_dist * start_sin
+    width_cm = np.sqrt(dx * dx + dy * dy)
+    return (first[keep], start_angle[keep], end_angle[keep], closest[keep], width_cm[keep],
+            (last - first + 1)[keep])
+
+
+def _objects(first, start_angle, end_angle, closest, width_cm, num_points):
+    rows = zip(start_angle.tolist(), end_angle.tolist(), closest.tolist(), width_cm.tolist(), num_points.tolist())
+    return [DetectedObject(*row) for row in rows]
+
+
+def detect_objects(scan, params, use_numpy=None):
+    """Objects in one sweep (a cybot.scanbuffer.ScanBuffer, sorted by angle).
+
+    use_numpy=None picks the vectorized path when NumPy is available and the
+    scan has at least NUMPY_MIN_POINTS points. Both paths give identical results.
+    """
+    return detect_segments(scan, params, use_numpy)[1]
+
+
+def detect_segments(scan, params, use_numpy=None):
+    """detect_objects() that also returns the runs: ([(first, last), ...], [DetectedObject, ...]).
+
+    Runs shorter than min_points are not listed; runs dropped by the
+    width/distance filters are, so there can be more runs than objects.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None and len(scan) >= NUMPY_MIN_POINTS
+    if use_numpy:
+        angles, dists, irs = scan.numpy_columns()
+        first, last = segment_scan_numpy(angles, dists, irs, params)
+        return list(zip(first.tolist(), last.tolist())), measure_segments_numpy(angles, dists, first, last, params)
+    angles, dists = scan.angles, scan.dists
+    segments = segment_scan(angles, dists, scan.irs, params)
+    return segments, measure_segments(angles, dists, segments, params)
+
+
+def detect_objects_batch(scans, params):
+    """detect_objects() for many sweeps at once: one list of objects per scan, in order.
+
+    All sweeps are concatenated and segmented/measured in a single pass, so the
+    NumPy call overhead is paid once per batch instead of once per scan. That
+    is the fast way to re-run detection over an archive after a threshold change.
+    Needs NumPy; without it the scans are processed one by one.
+    """
+    scans = list(scans)
+    if np is None:
+        return [detect_objects(scan, params, use_numpy=False) for scan in scans]
+    columns = [scan.numpy_columns() for scan in scans]
+    lengths = np.fromiter((len(c[0]) for c in columns), dtype=np.intp, count=len(columns))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    if offsets[-1] == 0:
+        return [[] for _ in scans]
+    angles = np.concatenate([c[0] for c in columns])
+    dists = np.concatenate([c[1] for c in columns])
+    irs = np.concatenate([c[2] for c in columns])
+    scan_starts = offsets[:-1][lengths > 0]
+    first, last = segment_scan_numpy(angles, dists, irs, params, scan_starts)
+    measured = _measure_numpy(angles, dists, first, last, params)
+    objects = _objects(*measured)
+    # Objects come out in index order; cut the flat list at the scan boundaries
+    cuts = np.searchsorted(measured[0], offsets).tolist()
+    return [objects[cuts[i]:cuts[i + 1]] for i in range(len(scans))]
+
+
+class StreamingDetector:
+    """segment_scan() plus measurement, fed one point at a time while the servo sweeps.
+
+    on_object(obj) runs as soon as a run's falling edge (the first point that
+    closes it) arrives; finish() closes a run still open at the end of the sweep.
+    For a sweep received in angle order the objects are exactly those
+    detect_objects() finds on the complete scan. If a point arrives out of
+    order the detector stops emitting and in_order turns False; the caller then
+    runs detect_objects() on the sorted scan instead. segments/objects collect
+    the sweep's detect_segments() result (e.g. for DetectionCache.put()).
+    """
+
+    def __init__(self, params, on_object):
+        self.on_object = on_object
+        self.params = params
+        self.reset()
+
+    def reset(self, params=None):
+        """Starts a new sweep, optionally with new thresholds."""
+        if params is not None:
+            self.params = params
+        self.in_order = True
+        self.count = 0 # Points consumed in this sweep
+        self.emitted = 0 # on_object calls in this sweep
+        self.segments = [] # (first, last) index pairs of the runs closed so far
+        self.objects = [] # Objects emitted so far
+        self._prev_ir = self.params.dummy_ir
+        self._prev_angle = None
+        self._run_dists = None # PING distances of the open run, None when outside a run
+        self._run_start = self._run_last = None # (angle, dist) of the open run's first/last point
+        self._run_first = None # Index of the open run's first point
+
+    def feed(self, scan, index):
+        """Consumes the point ScanBuffer.append() just stored at index (the sweep so far must be in order)."""
+        if not self.in_order:
+            return
+        if index != self.count:
+            self._abandon() # Inserted before points already consumed
+            return
+        self.push(scan.angles[index], scan.dists[index], scan.irs[index])
+
+    def push(self, angle_deg, dist_cm, ir_raw):
+        """Consumes the next point of the sweep."""
+        if not self.in_order:
+            return
+        if self._prev_angle is not None and angle_deg < self._prev_angle:
+            self._abandon()
+            return
+        params = self.params
+        ir_min = params.ir_min_strength
+        prev_ir = self._prev_ir
+        ir_change = ir_raw - prev_ir
+        suitable = (dist_cm > 0 and dist_cm <= params.max_dist_cm) and ir_raw >= ir_min
+        prev_strong = prev_ir >= ir_min
+        self._prev_ir = ir_raw
+        self._prev_angle = angle_deg
+        self.count += 1
+        if self._run_dists is not None:
+            is_sharp_drop = ir_raw >= ir_min and prev_strong and -ir_change >= params.ir_edge_drop
+            if suitable and not is_sharp_drop:
+                self._run_dists.append(dist_cm)
+                self._run_last = (angle_deg, dist_cm)
+                return
+            self._close_run() # Falling edge: the object is complete
+        if suitable and (ir_change >= params.ir_edge_rise or not prev_strong):
+            self._run_dists = [dist_cm]
+            self._run_start = self._run_last = (angle_deg, dist_cm)
+            self._run_first = self.count - 1
+
+    def finish(self):
+        """Ends the sweep: reports a run still open at its last point. Returns in_order."""
+        if self.in_order and self._run_dists is not None:
+            self._close_run()
+        return self.in_order
+
+    def _close_run(self):
+        dists = self._run_dists
+        self._run_dists = None
+        if len(dists) < self.params.min_points:
+            return
+        self.segments.append((self._run_first, self._run_first + len(dists) - 1))
+        max_dist = self.params.max_dist_cm
+        valid_dists = [d for d in dists if 0 < d <= max_dist]
+        obj = _measure(self._run_start[0], self._run_last[0], self._run_start[1], self._run_last[1],
+                       valid_dists, len(dists), self.params)
+        if obj is not None:
+            self.emitted += 1
+            self.objects.append(obj)
+            self.on_object(obj)
+
+    def _abandon(self):
+        self.in_order = False
+        self._run_dists = None
+
+
+class DetectionCache:
+    """LRU memo of detect_segments() keyed by scan contents and thresholds.
+
+    The key is ScanBuffer.fingerprint() plus DetectionParams.key(), so the same
+    sweep is found again after the buffers were swapped or refilled, and a
+    threshold change misses instead of returning stale objects. Cached lists
+    are shared between callers and must not be modified.
+    """
+
+    def __init__(self, maxsize=DETECTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict() # (fingerprint, params key) -> (segments, objects), oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, scan, params):
+        """(segments, objects) of scan, computed only if this scan/params pair is not cached."""
+        key = (scan.fingerprint(), params.key())
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+        self.misses += 1
+        entry = detect_segments(scan, params)
+        self._store(key, entry)
+        return entry
+
+    def put(self, scan, params, segments, objects):
+        """Stores a result computed elsewhere (e.g. by StreamingDetector during the sweep)."""
+        self._store((scan.fingerprint(), params.key()), (segments, objects))
+
+    def clear(self):
+        self._entries.clear()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
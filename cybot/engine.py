@@ -0,0 +1,374 @@
+"""Headless CyBot session: connection, parsing, scan assembly, detection and pose.
+
+Each GUI script used to own all of this in module globals next to its Tk
+widgets: the socket and ingest thread, the dispatcher, the two scan buffers,
+the streaming detector and detection cache, the occupancy grid and the robot
+pose. Nothing of it could run, be profiled or be fed a recorded session
+without building the whole window first.
+
+CyBotEngine holds that state and publishes what happens to observers:
+
+    engine = CyBotEngine()
+    engine.subscribe("scan", lambda scan, streamed: ...)
+    engine.connect("192.168.1.1", 288)
+
+Events and their arguments (see EVENTS):
+  lines(lines)               -- every received batch, before it is parsed
+  status(sample)             -- each STATUS line (cybot.model.StatusSample)
+  scan_started()             -- the first point of a new sweep arrived
+  object(obj)                -- the streaming detector closed an object (cybot.model.DetectedObject)
+  scan(scan, streamed)       -- a sweep ended; scan is last_scan, streamed is False if its
+                                points came out of order (use detect() for its objects)
+  move(move, prev_x, prev_y) -- the pose was advanced by a MOVE line
+  bump(bump)                 -- a BUMP_EVENT line
+  pose_reset()               -- reset_pose() put the robot back at the origin
+  connection_lost(reason)    -- the CyBot closed the connection or a socket error ended it;
+                                "disconnected" follows
+  disconnected()             -- the connection is gone (local or remote)
+
+Received batches can be recorded to a file (start_recording) and a recording
+fed back through the same path at any speed (replay), see cybot.recording.
+
+Threading: by default, received lines are processed on the ingest thread, which
+is what a headless run wants. A GUI passes post=...: the ingest thread then only
+hands each batch (or connection signal) to post(item, recv_t), and the GUI thread
+calls process() with it, so every event fires on the GUI thread. recv_t is the
+perf_counter() stamp of the recv that completed the batch (cybot.latency).
+
+Run headless against a CyBot (or cybot.sim):  python -m cybot.engine HOST [--record FILE]
+Replay a recording headless:  python -m cybot.engine --replay FILE [--speed N|max]
+"""
+import argparse
+import math
+import socket
+import threading
+import time
+
+from cybot.ingest import IngestEngine
+from cybot.protocol import default_dispatcher
+from cybot.model import ScanPoint, ScanEnd, StatusSample, MoveEvent, BumpEvent
+from cybot.scanbuffer import ScanBuffer
+from cybot.detection import DetectionCache, DetectionParams, StreamingDetector
+from cybot.occupancy import OccupancyGrid
+from cybot.recording import SessionRecorder, SessionReplayer
+
+CYBOT_PORT = 288
+CONNECT_TIMEOUT_S = 5.0
+SENSOR_FORWARD_OFFSET_CM = 5.0 # PING/IR sensor ahead of the robot center
+START_HEADING_DEG = 90.0 # Facing up (North) in the world frame
+
+# The IR_* / OBJECT_* defaults of SomewhatWorkingGUI.py
+DEFAULT_DETECTION_PARAMS = DetectionParams(ir_min_strength=750, ir_edge_rise=300, ir_edge_drop=250,
+                                           max_dist_cm=250.0, min_points=3, min_angle_width_deg=6.0)
+
+# Connection signals handed to post() instead of a list of lines
+CONNECTION_CLOSED = "CONNECTION_CLOSED"
+CONNECTION_ERROR = "CONNECTION_ERROR"
+
+EVENTS = ("lines", "status", "scan_started", "object", "scan", "move", "bump",
+          "pose_reset", "connection_lost", "disconnected")
+
+
+class CyBotEngine:
+    """Connection, parsing, scan assembly, detection, occupancy grid and pose of one CyBot session.
+
+    State observers may read (between events, on the thread events fire on):
+      x_cm, y_cm, heading_deg -- robot pose, world cm with y up, degrees counterclockwise from +x
+      status                  -- newest StatusSample (None before the first)
+      current_scan, last_scan -- the sweep being received and the last completed one (ScanBuffer)
+      grid                    -- OccupancyGrid fed with every completed sweep (None without NumPy)
+      lines_processed, scans_completed -- counters
+    """
+
+    def __init__(self, params=DEFAULT_DETECTION_PARAMS, sensor_offset_cm=SENSOR_FORWARD_OFFSET_CM,
+                 post=None, occupancy=True):
+        self.params = params # Thresholds used from the next sweep on
+        self.sensor_offset_cm = sensor_offset_cm
+        self.post = post # post(item, recv_t) on the ingest thread, see the module docstring
+        self._observers = {event: [] for event in EVENTS}
+
+        self.x_cm = self.y_cm = 0.0
+        self.heading_deg = START_HEADING_DEG
+        self.status = None
+        self.current_scan = ScanBuffer() # Filled while a scan is in progress, kept sorted by angle
+        self.last_scan = ScanBuffer() # Swapped with current_scan at END SCAN, nothing is copied
+        self.detector = StreamingDetector(params, self._object_found)
+        self.detection_cache = DetectionCache()
+        self.grid = None
+        if occupancy:
+            try:
+                self.grid = OccupancyGrid()
+            except ImportError:
+                pass # NumPy not installed: no world model
+        self.lines_processed = 0
+        self.scans_completed = 0
+
+        self.dispatcher = default_dispatcher()
+        self.dispatcher.on(StatusSample, self._status)
+        self.dispatcher.on(ScanPoint, self.append_scan_point)
+        self.dispatcher.on(ScanEnd, self.end_scan)
+        self.dispatcher.on(MoveEvent, self.apply_move)
+        self.dispatcher.on(BumpEvent, self._bump)
+
+        self.sock = None
+        self.ingest = None
+        self.recorder = None # SessionRecorder while recording
+        self.stop_event = threading.Event()
+        self._disconnect_lock = threading.Lock() # A lost connection (ingest thread) can race a local disconnect
+
+    # --- Observers ---
+    def subscribe(self, event, callback):
+        """Calls callback(*args) for every event of that name (see EVENTS). Returns callback."""
+        if event not in self._observers:
+            raise ValueError(f"unknown engine event {event!r}")
+        self._observers[event].append(callback)
+        return callback
+
+    def unsubscribe(self, event, callback):
+        self._observers[event].remove(callback)
+
+    def _publish(self, event, *args):
+        for callback in self._observers[event]:
+            callback(*args)
+
+    # --- Connection ---
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    def connect(self, host, port=CYBOT_PORT, timeout=CONNECT_TIMEOUT_S):
+        """Opens the connection and starts the ingest thread. Socket errors (incl. socket.timeout) propagate."""
+        if self.connected:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect((host, port))
+            sock.settimeout(None)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.stop_event.clear()
+        self.ingest = IngestEngine(sock, on_lines=self._ingest_lines,
+                                   on_closed=lambda: self.feed(CONNECTION_CLOSED),
+                                   on_error=lambda e: self.feed(CONNECTION_ERROR),
+                                   stop_event=self.stop_event)
+        self.ingest.start()
+
+    def disconnect(self):
+        """Stops the ingest thread and closes the socket. Does nothing when not connected."""
+        with self._disconnect_lock:
+            if not self.connected:
+                return
+            self.stop_event.set()
+            self.ingest.stop() # Wait for the ingest thread before closing the socket
+            self.ingest = None
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR) # Signal the other end
+            except OSError:
+                pass # Already closed
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        self._publish("disconnected")
+
+    def send(self, command):
+        """Queues a command line (newline added if missing) for the CyBot. Raises ConnectionError when not connected."""
+        if not self.connected:
+            raise ConnectionError("not connected")
+        if not command.endswith('\n'):
+            command += '\n'
+        self.ingest.send(command.encode('utf-8'))
+
+    def _ingest_lines(self, lines):
+        ingest = self.ingest
+        recv_t = ingest.recv_time if ingest is not None else time.perf_counter()
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(lines) # Stamped here, at receive time
+        self.feed(lines, recv_t)
+
+    def feed(self, item, recv_t=None):
+        """Entry point for a received batch of lines or a connection signal (the ingest thread, or a replay).
+        recv_t: perf_counter() when it was received; None = now."""
+        if self.post is not None:
+            self.post(item, time.perf_counter() if recv_t is None else recv_t)
+        else:
+            self.process(item)
+
+    # --- Recording and replay (cybot.recording) ---
+    def start_recording(self, path):
+        """Tees every batch received from now on into a session recording at path (appended if it exists)."""
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        return recorder
+
+    def replay(self, path, speed=1.0, on_done=None):
+        """Feeds a session recording through feed() on a replay thread: speed 1.0 = recorded timing, None = flat out.
+        Returns the running SessionReplayer (stop() ends it early)."""
+        return SessionReplayer(path, self.feed, speed, on_done).start()
+
+    # --- Processing (on the ingest thread, or wherever post() hands batches to) ---
+    def process(self, item):
+        """Handles what the ingest thread received: a list of lines, or CONNECTION_CLOSED/CONNECTION_ERROR."""
+        if item == CONNECTION_CLOSED or item == CONNECTION_ERROR:
+            if self.connected:
+                self._publish("connection_lost", item)
+                self.disconnect()
+            return
+        self._publish("lines", item)
+        for line in item:
+            self.process_line(line)
+
+    def process_line(self, line):
+        """Parses one line and applies it. A bad line is reported and skipped, like the GUIs always did."""
+        self.lines_processed += 1
+        try:
+            self.dispatcher.dispatch(line)
+        except Exception as e:
+            print(f"Error parsing line '{line.strip()}': {e}")
+
+    def _status(self, sample):
+        self.status = sample
+        self._publish("status", sample)
+
+    def append_scan_point(self, point):
+        """Inserts a ScanPoint at its angle-sorted position and feeds it to the streaming detector."""
+        if not self.current_scan: # First point of a new sweep
+            self.detector.reset(self.params)
+            self._publish("scan_started")
+        self.detector.feed(self.current_scan, self.current_scan.append(point))
+
+    def _object_found(self, obj):
+        self._publish("object", obj)
+
+    def end_scan(self, record=None):
+        """END SCAN: swaps the buffers, finishes detection and adds the sweep to the occupancy grid."""
+        if not self.current_scan:
+            return # END without points
+        self.last_scan, self.current_scan = self.current_scan, self.last_scan
+        self.current_scan.clear()
+        scan = self.last_scan
+        # The streaming detector reports the run still open at the last point; if the points came
+        # out of order it gave up, and detect() segments the sorted scan when someone asks for it.
+        streamed = self.detector.finish()
+        if streamed:
+            self.detection_cache.put(scan, self.detector.params, self.detector.segments, self.detector.objects)
+        if self.grid is not None:
+            sensor_x, sensor_y = self.sensor_origin()
+            self.grid.integrate_scan(scan, sensor_x, sensor_y, self.heading_deg)
+        self.scans_completed += 1
+        self._publish("scan", scan, streamed)
+
+    def detect(self, scan=None):
+        """(segments, objects) of a scan (last_scan by default), from the cache when already computed."""
+        return self.detection_cache.get(self.last_scan if scan is None else scan, self.params)
+
+    def apply_move(self, move):
+        """Turns first, then drives dist_cm along the new heading (how the firmware reports a MOVE)."""
+        prev_x, prev_y = self.x_cm, self.y_cm
+        self.heading_deg = (self.heading_deg + move.angle_deg) % 360
+        heading_rad = math.radians(self.heading_deg)
+        self.x_cm += move.dist_cm * math.cos(heading_rad)
+        self.y_cm += move.dist_cm * math.sin(heading_rad)
+        self._publish("move", move, prev_x, prev_y)
+
+    def _bump(self, bump):
+        self._publish("bump", bump)
+
+    # --- Pose ---
+    def sensor_origin(self):
+        """The PING/IR sensor's position (world cm): sensor_offset_cm ahead of the robot center."""
+        heading_rad = math.radians(self.heading_deg)
+        return (self.x_cm + self.sensor_offset_cm * math.cos(heading_rad),
+                self.y_cm + self.sensor_offset_cm * math.sin(heading_rad))
+
+    def reset_pose(self):
+        """Puts the robot back at the origin, facing up, and clears the occupancy grid built from the old pose.
+        For a new session (connect, replay), not for clearing a drawing: the heading starts over too."""
+        self.x_cm = self.y_cm = 0.0
+        self.heading_deg = START_HEADING_DEG
+        self.clear_grid()
+        self._publish("pose_reset")
+
+    def clear_grid(self):
+        """Forgets everything the occupancy grid accumulated; the pose is kept."""
+        if self.grid is not None:
+            self.grid.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a CyBot session (live or recorded) without a GUI and prints its throughput.")
+    parser.add_argument("host", nargs="?", help="CyBot (or cybot.sim) address; omit with --replay")
+    parser.add_argument("--port", type=int, default=CYBOT_PORT)
+    parser.add_argument("--seconds", type=float, default=0, help="stop after this long (default: until the CyBot disconnects)")
+    parser.add_argument("--send", action="append", default=[], metavar="CMD", help="command to send after connecting, e.g. m (repeatable)")
+    parser.add_argument("--record", metavar="FILE", help="record the received lines to FILE")
+    parser.add_argument("--replay", metavar="FILE", help="feed a recording instead of connecting")
+    parser.add_argument("--speed", default="max", help="replay speed: a factor (1 = as recorded) or max (default)")
+    parser.add_argument("--no-grid", action="store_true", help="skip the occupancy grid")
+    args = parser.parse_args()
+    if (args.host is None) == (args.replay is None):
+        parser.error("give a host or --replay FILE")
+
+    engine = CyBotEngine(occupancy=not args.no_grid)
+    counts = {"objects": 0}
+    done = threading.Event()
+
+    def on_scan(scan, streamed):
+        objects = engine.detector.objects if streamed else engine.detect(scan)[1]
+        counts["objects"] += len(objects)
+
+    engine.subscribe("scan", on_scan)
+    engine.subscribe("connection_lost", lambda reason: print(f"Connection lost: {reason}"))
+    engine.subscribe("disconnected", done.set)
+    if args.replay:
+        replayer = engine.replay(args.replay, None if args.speed == "max" else float(args.speed), on_done=done.set)
+        print(f"Replaying {args.replay} at {args.speed} speed")
+    else:
+        if args.record:
+            engine.start_recording(args.record)
+        try:
+            engine.connect(args.host, args.port)
+        except OSError as e: # Refused, unreachable, timed out
+            engine.stop_recording()
+            parser.exit(1, f"Cannot connect to {args.host}:{args.port}: {e}\n")
+        print(f"Connected to {args.host}:{args.port}")
+        for command in args.send:
+            engine.send(command)
+
+    start = last = time.perf_counter()
+    last_lines = 0
+    try:
+        while not done.wait(1.0):
+            now = time.perf_counter()
+            lines = engine.lines_processed
+            print(f"{(lines - last_lines) / (now - last):>10,.0f} lines/s  {engine.scans_completed} scans  "
+                  f"{counts['objects']} objects  pose ({engine.x_cm:.1f}, {engine.y_cm:.1f}) {engine.heading_deg:.0f} deg")
+            last, last_lines = now, lines
+            if args.seconds and now - start >= args.seconds:
+                break
+    except KeyboardInterrupt:
+        pass
+    if args.replay:
+        replayer.stop()
+    engine.disconnect()
+    recorder = engine.stop_recording()
+    elapsed = time.perf_counter() - start
+    print(f"{engine.lines_processed:,} lines in {elapsed:.1f} s ({engine.lines_processed / elapsed:,.0f} lines/s), "
+          f"{engine.scans_completed} scans, {counts['objects']} objects")
+    if recorder is not None:
+        print(f"Recorded {recorder.lines_recorded:,} lines in {recorder.chunks_written} chunks to {recorder.path}")
+
+
+if __name__ == "__main__":
+    main()
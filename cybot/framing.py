@@ -0,0 +1,98 @@
+"""Newline framing for the CyBot text protocol.
+
+The old listener did ``buffer += chunk.decode()`` followed by repeated
+``buffer.split('\\n', 1)``, which copies the whole remaining buffer for every
+line. LineFramer instead receives straight into a preallocated bytearray with
+``recv_into``, finds newlines in place and only decodes complete lines.
+"""
+
+DEFAULT_BUFFER_SIZE = 4096
+
+
+class LineFramer:
+    """Splits a byte stream into text lines without re-copying the buffer per line.
+
+    Lines are returned without the trailing newline (a trailing '\\r' is kept,
+    callers strip() anyway). Bytes after the last newline stay in the buffer
+    until the rest of the line arrives.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, encoding="utf-8", errors="replace"):
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._start = 0 # First byte of the (incomplete) line not yet returned
+        self._end = 0   # One past the last valid byte in the buffer
+        self.encoding = encoding
+        self.errors = errors
+
+    def pending_bytes(self):
+        """Number of buffered bytes that do not form a complete line yet."""
+        return self._end - self._start
+
+    def reset(self):
+        """Drops any partially received line."""
+        self._start = 0
+        self._end = 0
+
+    def recv_lines(self, sock):
+        """Receives once from sock and returns the list of complete lines.
+
+        Returns None when the peer closed the connection (recv returned 0 bytes).
+        Socket exceptions (timeout, reset, ...) propagate to the caller.
+        """
+        self._make_room()
+        n = sock.recv_into(self._view[self._end:])
+        if n == 0:
+            return None
+        self._end += n
+        return self._extract_lines()
+
+    def feed(self, data):
+        """Appends already-received bytes and returns the complete lines (used for replay/benchmarks)."""
+        data_len = len(data)
+        if data_len == 0:
+            return []
+        if len(self._buf) - self._end < data_len:
+            self._make_room(data_len)
+        self._view[self._end:self._end + data_len] = data
+        self._end += data_len
+        return self._extract_lines()
+
+    def _extract_lines(self):
+        start = self._start
+        end = self._end
+        last_newline = self._buf.rfind(b"\n", start, end)
+        if last_newline < 0:
+            return []
+        # Decode every complete line in one go straight from the memoryview slice
+        # (no intermediate bytes copy), then split once: O(bytes) per recv, not per line.
+        lines = str(self._view[start:last_newline], self.encoding, self.errors).split("\n")
+        start = last_newline + 1
+        if start == end:
+            # Everything consumed: rewind so the next recv starts at the front
+            self._start = self._end = 0
+        else:
+            self._start = start
+        return lines
+
+    def _make_room(self, needed=1):
+        """Ensures at least `needed` free bytes after _end, compacting or growing the buffer."""
+        free = len(self._buf) - self._end
+        if free >= needed and free >= 64:
+            return
+        pending = self._end - self._start
+        if self._start > 0:
+            # Move the partial line to the front (one memmove, only when the tail is full)
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start = 0
+            self._end = pending
+            free = len(self._buf) - self._end
+            if free >= needed and free >= 64:
+                return
+        # A single line longer than the buffer: grow it
+        new_size = len(self._buf) * 2
+        while new_size - pending < needed:
+            new_size *= 2
+        self._view.release()
+        self._buf.extend(bytes(new_size - len(self._buf)))
+        self._view = memoryview(self._buf)
@@ -0,0 +1,94 @@
+"""Shared scan geometry: servo angle unit vectors and the Cartesian projection of a scan.
+
+The radar plot, the occupancy grid and the object measurement each turned the
+same servo angles into radians and took their cosine and sine, point by point.
+The firmware (main.c) always sweeps 0-182 degrees in 2 degree steps, so
+SERVO_GRID holds the unit vectors of those 92 angles, computed once at import.
+Angles off the grid (another firmware, a manual SCAN line) fall back to
+math.cos/math.sin.
+
+project_scan() turns a completed sweep into sensor-frame arrays in one pass
+(vectorized when NumPy is installed): unit vectors ux/uy and PING points
+xs/ys in cm, with x to the right of the robot (servo 0) and y straight ahead
+(servo 90). ScanBuffer.projection() caches the result until the buffer
+changes, so every consumer of a scan shares one projection.
+"""
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError: # project_scan() uses the table lookup loop instead
+    np = None
+
+SERVO_MIN_DEG = 0
+SERVO_MAX_DEG = 182
+SERVO_STEP_DEG = 2
+
+
+class AngleGrid:
+    """Unit vectors (cos, sin) of min_deg, min_deg + step, ..., max_deg, computed once."""
+
+    def __init__(self, min_deg=SERVO_MIN_DEG, max_deg=SERVO_MAX_DEG, step_deg=SERVO_STEP_DEG):
+        self.min_deg = min_deg
+        self.step_deg = step_deg
+        self.size = int((max_deg - min_deg) // step_deg) + 1
+        angles = [min_deg + i * step_deg for i in range(self.size)]
+        self.cos = array('d', (math.cos(math.radians(a)) for a in angles))
+        self.sin = array('d', (math.sin(math.radians(a)) for a in angles))
+        self._index = {float(a): i for i, a in enumerate(angles)}
+        if np is not None:
+            self.cos_np = np.frombuffer(self.cos, dtype=np.float64)
+            self.sin_np = np.frombuffer(self.sin, dtype=np.float64)
+
+    def unit(self, angle_deg):
+        """(cos, sin) of angle_deg: a table lookup on the grid, math.cos/sin elsewhere."""
+        i = self._index.get(angle_deg)
+        if i is not None:
+            return self.cos[i], self.sin[i]
+        rad = math.radians(angle_deg)
+        return math.cos(rad), math.sin(rad)
+
+    def units_numpy(self, angles_deg):
+        """unit() for a float64 NumPy array: two arrays (cos, sin)."""
+        position = (angles_deg - self.min_deg) / self.step_deg
+        index = np.rint(position).astype(np.intp)
+        on_grid = (index == position) & (index >= 0) & (index < self.size)
+        index[~on_grid] = 0
+        ux, uy = self.cos_np[index], self.sin_np[index]
+        if not on_grid.all():
+            for i in np.flatnonzero(~on_grid).tolist(): # Same math as unit(), so both give identical values
+                ux[i], uy[i] = self.unit(float(angles_deg[i]))
+        return ux, uy
+
+
+SERVO_GRID = AngleGrid()
+
+
+class ScanProjection:
+    """One sweep in the sensor frame (lists of floats, in angle order)."""
+    __slots__ = ("ux", "uy", "xs", "ys")
+
+    def __init__(self, ux, uy, xs, ys):
+        self.ux = ux # Unit vector of each servo angle (x right, y ahead)
+        self.uy = uy
+        self.xs = xs # PING point of each reading, cm (dist * unit vector; readings <= 0 give the sensor origin side)
+        self.ys = ys
+
+    def __len__(self):
+        return len(self.ux)
+
+
+def project_scan(scan, grid=SERVO_GRID):
+    """ScanProjection of a cybot.scanbuffer.ScanBuffer (or anything with angles/dists columns)."""
+    if np is not None:
+        dists = np.asarray(scan.dists, dtype=np.float64)
+        ux, uy = grid.units_numpy(np.asarray(scan.angles, dtype=np.float64))
+        return ScanProjection(ux.tolist(), uy.tolist(), (dists * ux).tolist(), (dists * uy).tolist())
+    ux, uy = [], []
+    for angle_deg in scan.angles:
+        c, s = grid.unit(angle_deg)
+        ux.append(c)
+        uy.append(s)
+    dists = scan.dists
+    return ScanProjection(ux, uy, [d * c for d, c in zip(dists, ux)], [d * s for d, s in zip(dists, uy)])
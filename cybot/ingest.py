@@ -0,0 +1,145 @@
+"""Event-driven socket ingest for the CyBot connection.
+
+One background thread runs a ``selectors`` loop that waits on three things at
+once: the CyBot socket becoming readable, the socket becoming writable while
+commands are queued, and a wake-up socketpair used for shutdown and new sends.
+It replaces the old listener that flipped ``settimeout(0.2)``/``settimeout(None)``
+around every recv and woke up five times a second just to poll the stop flag.
+"""
+import collections
+import selectors
+import socket
+import threading
+import time
+
+from cybot.framing import LineFramer
+
+
+class IngestEngine:
+    """Owns the read/write side of a connected CyBot socket on a selector thread.
+
+    on_lines(lines)  -- called on the ingest thread with each batch of complete lines;
+                        recv_time is then the perf_counter() stamp of the recv that completed them
+    on_closed()      -- the CyBot closed the connection
+    on_error(exc)    -- a socket error ended the loop
+    The close/error callbacks are skipped when the stop was requested locally.
+    """
+
+    def __init__(self, sock, on_lines, on_closed=None, on_error=None, stop_event=None, framer=None):
+        self.sock = sock
+        self.on_lines = on_lines
+        self.on_closed = on_closed
+        self.on_error = on_error
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.framer = framer if framer is not None else LineFramer()
+        self._outgoing = collections.deque() # bytes objects queued by send()
+        self._out_view = None                # memoryview of the chunk currently being written
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._thread = None
+        self.recv_time = 0.0
+
+    # --- Called from the GUI thread ---
+    def start(self):
+        """Switches the socket to non-blocking mode and starts the selector thread."""
+        self.sock.setblocking(False)
+        self._selector.register(self.sock, selectors.EVENT_READ, "sock")
+        self._selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+        self._thread = threading.Thread(target=self._run, name="cybot-ingest", daemon=True)
+        self._thread.start()
+
+    def send(self, data):
+        """Queues bytes for the CyBot; the selector thread writes them when the socket is writable."""
+        if self.stop_event.is_set():
+            raise ConnectionError("ingest engine is stopped")
+        self._outgoing.append(data)
+        self._wake()
+
+    def stop(self, timeout=1.0):
+        """Signals the loop to exit and waits for it (the socket itself is left to the caller)."""
+        self.stop_event.set()
+        self._wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass # A wake-up byte is already pending, or the loop has shut down
+
+    # --- Selector thread ---
+    def _run(self):
+        print("Ingest thread started.")
+        try:
+            while not self.stop_event.is_set():
+                for key, events in self._selector.select():
+                    if key.data == "wake":
+                        self._drain_wake()
+                        self._flush_outgoing()
+                        continue
+                    if events & selectors.EVENT_READ and not self._read_ready():
+                        return
+                    if events & selectors.EVENT_WRITE:
+                        self._flush_outgoing()
+        except OSError as e:
+            if not self.stop_event.is_set():
+                print(f"Socket error in ingest thread: {e}")
+                if self.on_error: self.on_error(e)
+        except Exception as e:
+            if not self.stop_event.is_set():
+                print(f"Unexpected error in ingest thread: {e}")
+                if self.on_error: self.on_error(e)
+        finally:
+            self._selector.close()
+            self._wake_r.close()
+            self._wake_w.close()
+            print("Ingest thread finished.")
+
+    def _read_ready(self):
+        """Drains everything the kernel has buffered. Returns False once the peer has closed."""
+        while True:
+            self.recv_time = time.perf_counter()
+            try:
+                lines = self.framer.recv_lines(self.sock)
+            except (BlockingIOError, InterruptedError):
+                return True
+            if lines is None:
+                if not self.stop_event.is_set():
+                    print("Connection closed by server (received empty data).")
+                    if self.on_closed: self.on_closed()
+                return False
+            if lines:
+                self.on_lines(lines)
+
+    def _drain_wake(self):
+        try:
+            while self._wake_r.recv(256):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _flush_outgoing(self):
+        """Writes as much queued data as the socket accepts, then (un)registers write interest."""
+        while True:
+            if self._out_view is None:
+                if not self._outgoing:
+                    break
+                self._out_view = memoryview(self._outgoing.popleft())
+            try:
+                sent = self.sock.send(self._out_view)
+            except (BlockingIOError, InterruptedError):
+                break
+            self._out_view = self._out_view[sent:]
+            if not self._out_view:
+                self._out_view = None
+        want = selectors.EVENT_READ
+        if self._out_view is not None or self._outgoing:
+            want |= selectors.EVENT_WRITE
+        if self._selector.get_key(self.sock).events != want:
+            self._selector.modify(self.sock, want, "sock")
@@ -0,0 +1,159 @@
+"""Bounded ingest queue with a backpressure policy per message type.
+
+message_queue used to be an unbounded queue.Queue. Whenever the GUI thread
+stalled (a modal messagebox, a slow redraw) the ingest thread kept queuing, so
+memory grew and, once the GUI ran again, it worked through minutes of stale
+lines before showing the present. IngestQueue bounds what waits for the GUI by
+the kind of line (the prefix before ':'), see DEFAULT_POLICIES:
+
+  KEEP    -- carries state (SCAN points, MOVE, BUMP_EVENT, ...): never dropped.
+             If the queue is full they are queued anyway and counted as overflow.
+  LATEST  -- STATUS: queued like KEEP while there is room. Once max_lines lines
+             are waiting only the newest one waits: it is queued at the tail and
+             the older one still waiting is taken out (counted as superseded).
+             Latched fields that were 1 in the superseded line are carried over
+             (DEFAULT_LATCH_FIELDS: the bumpers, which main.c only reports
+             through STATUS), so a one-sample bump still reaches the
+             StatusCoalescer latch.
+  DROP    -- INFO/DEBUG chatter: queued while there is room, dropped (and
+             counted per type) once max_lines lines are waiting.
+
+So a stalled GUI comes back to every scan and move, the current STATUS and a
+gap in the log instead of a backlog. Whatever is delivered comes out in the
+order it was put in. Connection signals and other non-list items are queued as
+they are.
+
+put() (any thread) and get_nowait() (GUI thread) mirror queue.Queue, with the
+receive and queue stamps of cybot.latency carried along: get_nowait() returns
+(item, recv_t, put_t) and raises queue.Empty.
+"""
+import collections
+import queue
+import re
+import threading
+import time
+
+KEEP = "keep"
+LATEST = "latest"
+DROP = "drop"
+DEFAULT_POLICIES = {"SCAN": KEEP, "MOVE": KEEP, "BUMP_EVENT": KEEP, "STATUS": LATEST, "INFO": DROP, "DEBUG": DROP}
+DEFAULT_LATCH_FIELDS = {"STATUS": ("BUMP_L", "BUMP_R")} # 0/1 fields whose 1 survives superseding
+DEFAULT_MAX_LINES = 2000 # Lines waiting for the GUI before DROP lines are refused (about a second of a flooded link)
+
+
+class IngestQueue:
+    """Thread-safe FIFO of received batches, bounded per DEFAULT_POLICIES (or policies: prefix -> KEEP/LATEST/DROP).
+
+    Prefixes not in policies are KEEP. Stats, read from any thread:
+      dropped     -- DROP lines refused, per prefix
+      superseded  -- LATEST lines replaced by a newer one before the GUI got them
+      overflow    -- KEEP lines queued while max_lines were already waiting
+      max_lines_queued -- high-water mark of waiting lines
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, policies=None, latch_fields=None):
+        self.max_lines = max_lines
+        self.policies = dict(DEFAULT_POLICIES if policies is None else policies)
+        # Prefix -> [(pattern of FIELD=1, pattern of FIELD=0)] for the LATEST lines' latched fields
+        self._latches = {prefix: [(re.compile(rf"\b{name}=\s*1\b"), re.compile(rf"\b({name}=\s*)0\b")) for name in names]
+                         for prefix, names in (DEFAULT_LATCH_FIELDS if latch_fields is None else latch_fields).items()}
+        self._entries = collections.deque() # [item, recv_t, put_t, LATEST prefix or None]; item [] = superseded
+        self._latest = {} # Prefix -> the waiting entry holding its newest over-capacity LATEST line
+        self._lines = 0 # Lines waiting
+        self._superseded_entries = 0 # Entries in _entries that get_nowait() skips
+        self._lock = threading.Lock()
+        self.dropped = collections.Counter()
+        self.superseded = 0
+        self.overflow = 0
+        self.max_lines_queued = 0
+
+    def put(self, item, recv_t=None, put_t=None):
+        """Queues a batch of lines (a list) under the policies, or any other item unchanged. Never blocks."""
+        if put_t is None:
+            put_t = time.perf_counter()
+        if recv_t is None:
+            recv_t = put_t
+        with self._lock:
+            if not isinstance(item, list):
+                self._entries.append([item, recv_t, put_t, None])
+                return
+            policies = self.policies
+            lines = []
+            room = self.max_lines - self._lines
+            for line in item:
+                prefix = line.partition(":")[0].strip()
+                policy = policies.get(prefix, KEEP)
+                if room > 0:
+                    lines.append(line)
+                    room -= 1
+                elif policy == DROP:
+                    self.dropped[prefix] += 1
+                elif policy == LATEST:
+                    if lines: # Everything before it stays ahead of it
+                        self._append(lines, recv_t, put_t)
+                        lines = []
+                    self._supersede(prefix, line, recv_t, put_t)
+                else: # KEEP
+                    self.overflow += 1
+                    lines.append(line)
+            if lines:
+                self._append(lines, recv_t, put_t)
+            if self._lines > self.max_lines_queued:
+                self.max_lines_queued = self._lines
+
+    def _append(self, lines, recv_t, put_t, slot=None):
+        self._entries.append([lines, recv_t, put_t, slot])
+        self._lines += len(lines)
+
+    def _supersede(self, prefix, line, recv_t, put_t):
+        """Queues line at the tail as the only waiting over-capacity line of prefix."""
+        old = self._latest.get(prefix)
+        if old is not None:
+            old_line = old[0][0]
+            for is_set, cleared in self._latches.get(prefix, ()):
+                if is_set.search(old_line):
+                    line = cleared.sub(r"\g<1>1", line, count=1)
+            old[0] = [] # Skipped by get_nowait(); its place in the FIFO is not kept
+            self._lines -= 1
+            self._superseded_entries += 1
+            self.superseded += 1
+        entry = [[line], recv_t, put_t, prefix]
+        self._latest[prefix] = entry
+        self._entries.append(entry)
+        self._lines += 1
+
+    def get_nowait(self):
+        """The oldest entry as (item, recv_t, put_t). Raises queue.Empty."""
+        with self._lock:
+            while self._entries:
+                item, recv_t, put_t, slot = entry = self._entries.popleft()
+                if slot is not None:
+                    if not item:
+                        self._superseded_entries -= 1
+                        continue
+                    del self._latest[slot] # The next over-capacity line of this prefix needs a new entry
+                if isinstance(item, list):
+                    self._lines -= len(item)
+                return item, recv_t, put_t
+            raise queue.Empty
+
+    def qsize(self):
+        """Entries (batches and signals) waiting."""
+        return len(self._entries) - self._superseded_entries
+
+    def empty(self):
+        return self.qsize() == 0
+
+    @property
+    def lines_queued(self):
+        return self._lines
+
+    def stats(self):
+        """Drop and overflow counters as a dict (for the overlay, logs or a benchmark's JSON)."""
+        return {"lines_queued": self._lines, "max_lines_queued": self.max_lines_queued, "max_lines": self.max_lines,
+                "dropped": dict(self.dropped), "superseded": self.superseded, "overflow": self.overflow}
+
+    def report(self):
+        dropped = ", ".join(f"{prefix} {n}" for prefix, n in sorted(self.dropped.items())) or "none"
+        return (f"Ingest queue: max {self.max_lines_queued}/{self.max_lines} lines waiting, dropped {dropped}, "
+                f"{self.superseded} superseded, {self.overflow} overflow")
@@ -0,0 +1,166 @@
+"""Per-stage latency of the receive -> screen pipeline, in fixed-size histograms.
+
+When the GUI lagged there was no way to tell where the time went: waiting in
+message_queue, parsing, or drawing. Every batch of lines now carries two
+perf_counter() stamps through the queue, taken when it was received (ingest
+thread, right after recv) and when it was put on the queue. The GUI thread adds
+the dispatch stamps and the render scheduler reports when a frame finished, so
+PipelineMonitor can split the time of each batch into stages (STAGES):
+
+  recv->put        framing and recording on the ingest thread
+  put->dispatch    waiting in the queue for the GUI thread
+  dispatch         parsing the batch and running the engine's events
+  dispatch->render until the next frame had drawn what the batch changed
+  recv->render     end to end: how old the data was when it reached the screen
+
+A LatencyHistogram has a fixed set of log-spaced buckets (BUCKET_BOUNDS_S), so
+recording is a bisect and an increment and memory does not grow with the
+session. Percentiles are read from the bucket bounds (about 19% resolution).
+
+Nothing is recorded while enabled is False (the overlay is hidden): each hook
+returns after one attribute check, and only the cheap stamps remain.
+"""
+import time
+from bisect import bisect_left
+
+# Upper bounds of the buckets: 10 us * 2 ** (k / 4), up to ~21 s. One more bucket holds everything slower.
+BUCKET_BOUNDS_S = tuple(10e-6 * 2 ** (k / 4) for k in range(85))
+STAGES = ("recv->put", "put->dispatch", "dispatch", "dispatch->render", "recv->render")
+RATE_WINDOW_S = 1.0 # Message rate is averaged over at least this long
+
+
+class LatencyHistogram:
+    """Counts durations (seconds) in the fixed buckets of BUCKET_BOUNDS_S."""
+    __slots__ = ("counts", "count", "total_s", "max_s")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_S) + 1)
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(BUCKET_BOUNDS_S, seconds)] += 1
+        self.count += 1
+        self.total_s += seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    def clear(self):
+        self.__init__()
+
+    @property
+    def mean_s(self):
+        return self.total_s / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100), at most max_s; 0.0 if empty."""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(BUCKET_BOUNDS_S[i], self.max_s) if i < len(BUCKET_BOUNDS_S) else self.max_s
+        return self.max_s
+
+    def __repr__(self):
+        return (f"LatencyHistogram(count={self.count}, p50={self.percentile(50) * 1000:.2f} ms, "
+                f"p99={self.percentile(99) * 1000:.2f} ms, max={self.max_s * 1000:.2f} ms)")
+
+
+class PipelineMonitor:
+    """Stage histograms, message rate, queue depth and staleness of the GUI pipeline.
+
+    posted()     -- ingest thread, when a batch is put on the queue
+    dispatched() -- GUI thread, after the engine processed a batch
+    rendered()   -- GUI thread, when a frame finished (RenderScheduler on_frame)
+    All three return at once while enabled is False.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {name: LatencyHistogram() for name in STAGES}
+        self.lines = 0 # Lines dispatched while enabled
+        self.batches = 0
+        self.queue_depth = 0 # Batches still queued at the last dispatch
+        self.max_queue_depth = 0
+        self._first_dispatch_t = None # Oldest dispatch (end) not on screen yet
+        self._oldest_recv_t = None # Receive stamps of the batches dispatched since the last frame
+        self._newest_recv_t = None
+        self._shown_recv_t = None # Receive stamp of the newest batch a frame has drawn
+        self._rate_t = time.perf_counter()
+        self._rate_lines = 0
+        self._rate = 0.0
+
+    def set_enabled(self, enabled):
+        """Starts (from empty histograms) or stops recording."""
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        for histogram in self.stages.values():
+            histogram.clear()
+        self.lines = self.batches = self.max_queue_depth = 0
+        self._first_dispatch_t = self._oldest_recv_t = self._newest_recv_t = self._shown_recv_t = None
+        self._rate_t = time.perf_counter()
+        self._rate_lines = 0
+        self._rate = 0.0
+
+    def posted(self, recv_t, put_t):
+        if not self.enabled:
+            return
+        self.stages["recv->put"].add(put_t - recv_t)
+
+    def dispatched(self, recv_t, put_t, start_t, end_t, lines, queue_depth):
+        """A batch of lines (count) received at recv_t, queued at put_t, was processed from start_t to end_t."""
+        if not self.enabled:
+            return
+        stages = self.stages
+        stages["put->dispatch"].add(start_t - put_t)
+        stages["dispatch"].add(end_t - start_t)
+        self.lines += lines
+        self.batches += 1
+        self.queue_depth = queue_depth
+        if queue_depth > self.max_queue_depth:
+            self.max_queue_depth = queue_depth
+        if self._first_dispatch_t is None:
+            self._first_dispatch_t = end_t
+            self._oldest_recv_t = recv_t
+        self._newest_recv_t = recv_t
+
+    def rendered(self, t=None):
+        """A frame finished at t (default now): everything dispatched before it is on screen."""
+        if not self.enabled or self._first_dispatch_t is None:
+            return
+        if t is None:
+            t = time.perf_counter()
+        self.stages["dispatch->render"].add(t - self._first_dispatch_t)
+        self.stages["recv->render"].add(t - self._oldest_recv_t) # The oldest batch of the frame waited longest
+        self._shown_recv_t = self._newest_recv_t
+        self._first_dispatch_t = self._oldest_recv_t = self._newest_recv_t = None
+
+    def staleness(self, now=None):
+        """Age (seconds) of the newest data on screen, None before the first frame. Grows while the stream stalls."""
+        if self._shown_recv_t is None:
+            return None
+        return (time.perf_counter() if now is None else now) - self._shown_recv_t
+
+    def message_rate(self, now=None):
+        """Lines per second, averaged since the previous call at least RATE_WINDOW_S ago."""
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self._rate_t
+        if elapsed >= RATE_WINDOW_S:
+            self._rate = (self.lines - self._rate_lines) / elapsed
+            self._rate_t, self._rate_lines = now, self.lines
+        return self._rate
+
+    def report(self):
+        """One line per stage: count, p50, p99 and max in milliseconds."""
+        lines = [f"Pipeline latency: {self.lines} lines in {self.batches} batches, max queue depth {self.max_queue_depth}"]
+        for name, histogram in self.stages.items():
+            lines.append(f"  {name:<16} {histogram.count:>7}  p50 {histogram.percentile(50) * 1000:8.2f} ms"
+                         f"  p99 {histogram.percentile(99) * 1000:8.2f} ms  max {histogram.max_s * 1000:8.2f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,68 @@
+"""Bounded, batched front end for the raw data log (a Text/ScrolledText widget).
+
+The scripts used to do ``insert`` + ``see(END)`` for every received line and
+never removed anything, so after a long run each insert had to work against a
+widget holding tens of thousands of lines. LogView collects lines in a
+fixed-size ring buffer, writes them with a single ``insert`` per GUI frame and
+drops the oldest widget lines in one ``delete`` once the widget holds more than
+max_lines. Cost per message and memory stay constant for the whole session.
+"""
+import collections
+import tkinter as tk
+
+DEFAULT_MAX_LINES = 2000
+DEFAULT_FLUSH_MS = 33 # ~30 flushes per second is plenty for a text log
+
+
+class LogView:
+    """Appends lines to a Text widget in batches and keeps it at most max_lines long."""
+
+    def __init__(self, text_widget, max_lines=DEFAULT_MAX_LINES, flush_ms=DEFAULT_FLUSH_MS):
+        self.text = text_widget
+        self.max_lines = max_lines
+        self.flush_ms = flush_ms
+        self.auto_scroll = True
+        # Lines waiting for the next flush. Bounded like the widget itself: if more than
+        # max_lines arrive within one frame the oldest would be trimmed right away anyway.
+        self._pending = collections.deque(maxlen=max_lines)
+        self._flush_job = None
+
+    def append(self, line):
+        """Queues one line (without trailing newline) for the next flush."""
+        self._pending.append(line)
+        self._schedule()
+
+    def extend(self, lines):
+        """Queues several lines at once."""
+        self._pending.extend(lines)
+        self._schedule()
+
+    def set_auto_scroll(self, enabled):
+        """Turns following the end of the log on or off (off = the view stays where the user scrolled)."""
+        self.auto_scroll = bool(enabled)
+        if self.auto_scroll:
+            self.text.see(tk.END)
+
+    def clear(self):
+        self._pending.clear()
+        self.text.delete("1.0", tk.END)
+
+    def flush(self):
+        """Writes all pending lines with one insert, then trims the oldest lines in one delete."""
+        self._flush_job = None
+        if not self._pending:
+            return
+        block = "\n".join(self._pending) + "\n"
+        self._pending.clear()
+        self.text.insert(tk.END, block)
+        # 'end-1c' is on the empty line after the last newline, so its line number - 1 is the line count
+        line_count = int(self.text.index("end-1c").split(".")[0]) - 1
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        if self.auto_scroll:
+            self.text.see(tk.END)
+
+    def _schedule(self):
+        if self._flush_job is None:
+            self._flush_job = self.text.after(self.flush_ms, self.flush)
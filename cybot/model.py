@@ -0,0 +1,154 @@
+"""Record types shared by the parsers, detection, radar and trail code.
+
+All of them use ``__slots__``. There is no per-instance ``__dict__``, so a scan point
+costs about as much as a 3-tuple. That is far less than the ``{'type': 'move',
+'distance': ...}`` dicts the trail history used to hold, and attribute reads in the
+detection/radar loops are plain slot lookups.
+"""
+
+
+class ScanPoint:
+    """One sample of a sweep: servo angle (0-180, 90 = straight ahead), PING distance, raw IR reading."""
+    __slots__ = ("angle_deg", "dist_cm", "ir_raw")
+
+    def __init__(self, angle_deg, dist_cm, ir_raw):
+        self.angle_deg = angle_deg
+        self.dist_cm = dist_cm
+        self.ir_raw = ir_raw
+
+    def __repr__(self):
+        return f"ScanPoint(angle_deg={self.angle_deg!r}, dist_cm={self.dist_cm!r}, ir_raw={self.ir_raw!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ScanPoint):
+            return NotImplemented
+        return (self.angle_deg, self.dist_cm, self.ir_raw) == (other.angle_deg, other.dist_cm, other.ir_raw)
+
+
+class ScanEnd:
+    """The 'SCAN: END Scan' marker that closes a sweep."""
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"ScanEnd({self.text!r})"
+
+
+class StatusSample:
+    """One STATUS line. Fields that were missing or not a number are None.
+
+    cliff_* hold the raw cliff signals (CLIFF_x_SIG). Older firmware, which
+    cyBot_gui.py talks to, sends 0/1 flags as CLIFF_x instead; those land in the
+    same attributes.
+    """
+    __slots__ = ("bump_l", "bump_r", "cliff_l", "cliff_fl", "cliff_fr", "cliff_r", "ping_cm", "heading")
+
+    def __init__(self, bump_l=None, bump_r=None, cliff_l=None, cliff_fl=None, cliff_fr=None, cliff_r=None,
+                 ping_cm=None, heading=None):
+        self.bump_l = bump_l
+        self.bump_r = bump_r
+        self.cliff_l = cliff_l
+        self.cliff_fl = cliff_fl
+        self.cliff_fr = cliff_fr
+        self.cliff_r = cliff_r
+        self.ping_cm = ping_cm
+        self.heading = heading
+
+    @classmethod
+    def from_fields(cls, fields):
+        """Builds a sample from a {'BUMP_L': '0', 'PING': '12.50', ...} dict of strings."""
+        return cls(_int(fields, "BUMP_L"), _int(fields, "BUMP_R"),
+                   _int(fields, "CLIFF_L_SIG", "CLIFF_L"), _int(fields, "CLIFF_FL_SIG", "CLIFF_FL"),
+                   _int(fields, "CLIFF_FR_SIG", "CLIFF_FR"), _int(fields, "CLIFF_R_SIG", "CLIFF_R"),
+                   _float(fields, "PING"), _int(fields, "Heading"))
+
+    def copy(self):
+        return StatusSample(self.bump_l, self.bump_r, self.cliff_l, self.cliff_fl, self.cliff_fr, self.cliff_r,
+                            self.ping_cm, self.heading)
+
+    def __repr__(self):
+        return "StatusSample(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+
+class MoveEvent:
+    """A heading change and a straight distance, applied in that order (one MOVE line)."""
+    __slots__ = ("angle_deg", "dist_cm")
+
+    def __init__(self, angle_deg, dist_cm):
+        self.angle_deg = angle_deg
+        self.dist_cm = dist_cm
+
+    def __repr__(self):
+        return f"MoveEvent(angle_deg={self.angle_deg!r}, dist_cm={self.dist_cm!r})"
+
+
+class BumpEvent:
+    """A BUMP_EVENT line. side is "LEFT", "RIGHT" or "" when the text names neither."""
+    __slots__ = ("side", "text")
+
+    def __init__(self, side, text):
+        self.side = side
+        self.text = text
+
+    def __repr__(self):
+        return f"BumpEvent(side={self.side!r}, text={self.text!r})"
+
+
+class DetectedObject:
+    """An object found in one sweep: servo-frame angles of its edges, closest PING reading, linear width."""
+    __slots__ = ("start_angle_deg", "end_angle_deg", "closest_dist_cm", "width_cm", "num_points")
+
+    def __init__(self, start_angle_deg, end_angle_deg, closest_dist_cm, width_cm, num_points):
+        self.start_angle_deg = start_angle_deg
+        self.end_angle_deg = end_angle_deg
+        self.closest_dist_cm = closest_dist_cm
+        self.width_cm = width_cm
+        self.num_points = num_points
+
+    @property
+    def middle_angle_deg(self):
+        return (self.start_angle_deg + self.end_angle_deg) / 2.0
+
+    def __eq__(self, other):
+        if not isinstance(other, DetectedObject):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "DetectedObject(" + ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__) + ")"
+
+
+class TextMessage:
+    """Free-text lines (INFO / DEBUG / ERROR / ACK) that are only logged."""
+    __slots__ = ("kind", "text")
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+
+    def __repr__(self):
+        return f"TextMessage(kind={self.kind!r}, text={self.text!r})"
+
+
+def _int(fields, key, fallback_key=None):
+    value = fields.get(key)
+    if value is None and fallback_key is not None:
+        value = fields.get(fallback_key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _float(fields, key):
+    value = fields.get(key)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
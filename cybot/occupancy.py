@@ -0,0 +1,170 @@
+"""Log-odds occupancy grid of the test field, built from PING scans.
+
+The map panel used to show only the objects of the last scan; they are deleted
+when the next one arrives, so nothing builds up a picture of the field.
+OccupancyGrid accumulates every completed scan: each PING reading is a ray from
+the sensor pose, the cells it crosses are evidence of free space and the cell
+at the measured distance is evidence of an obstacle. The evidence is kept as
+log-odds in float32 NumPy arrays, so an update is a few additions and a clip.
+
+The grid has no fixed size. Cells are stored in square tiles of TILE_CELLS x
+TILE_CELLS, created the first time a ray reaches them, so the robot can drive
+as far as it likes and memory grows with the area actually seen. The tiles are
+also the unit the map view renders and caches (cybot.worldmap.TileLayer):
+tile_keys_in() lists the tiles in a rectangle, tile_version() tells whether a
+tile changed, and render_tile() shades one tile into an RGB array.
+
+integrate_scan() casts all rays of a scan in one vectorized pass: the sample
+points of every ray (half a cell apart) form one readings x steps array, and a
+cell is updated at most once per scan however many rays cross it. A 92-point
+sweep takes about a millisecond.
+
+Coordinates are world cm with y up; headings are degrees counterclockwise from
++x, 90 = up, like robot_angle_deg in the scripts. Requires NumPy.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError: # OccupancyGrid raises on creation instead
+    np = None
+
+GRID_CELL_CM = 5.0
+TILE_CELLS = 32 # 32 x 5 cm = 1.6 m tiles
+GRID_MAX_RANGE_CM = 300.0 # Longer readings only clear free space up to here (no obstacle cell)
+LOG_ODDS_FREE = -0.4 # Per scan, for a cell a ray passed through
+LOG_ODDS_OCCUPIED = 0.85 # Per scan, for the cell a ray ended in
+LOG_ODDS_LIMIT = 4.0 # Cells saturate at +-this, so the map can still change its mind
+
+FREE_COLOR = (255, 255, 255)
+UNKNOWN_COLOR = (211, 211, 211) # "lightgrey", the map canvas background
+OCCUPIED_COLOR = (40, 40, 40)
+
+
+class OccupancyGrid:
+    """Unbounded log-odds grid in tiles; tile (tx, ty) holds cells tx*TILE_CELLS.. / ty*TILE_CELLS.. (row = y index)."""
+
+    def __init__(self, cell_cm=GRID_CELL_CM, tile_cells=TILE_CELLS, max_range_cm=GRID_MAX_RANGE_CM):
+        if np is None:
+            raise ImportError("OccupancyGrid requires NumPy")
+        self.cell_cm = float(cell_cm)
+        self.tile_cells = int(tile_cells)
+        self.tile_cm = self.cell_cm * self.tile_cells
+        self.max_range_cm = float(max_range_cm)
+        self.tiles = {} # (tx, ty) -> float32 log-odds [y, x]
+        self.scans = 0 # Scans integrated since the last clear
+        self._versions = {} # (tx, ty) -> counter, changed by every update of the tile
+        self._steps = np.arange(0.0, self.max_range_cm, self.cell_cm / 2) # Ray sample distances
+        self._lut = _color_table()
+
+    def clear(self):
+        """Forgets everything (tile versions keep counting, so cached renderings go stale)."""
+        for key in self.tiles:
+            self._versions[key] += 1
+        self.tiles = {}
+        self.scans = 0
+
+    def integrate_scan(self, scan, sensor_x_cm, sensor_y_cm, heading_deg):
+        """Adds one sweep (cybot.scanbuffer.ScanBuffer) seen from the sensor pose. Returns the number of rays cast.
+
+        Servo angle 90 is straight ahead (heading_deg); readings of 0 or less are skipped.
+        The ray directions come from the scan's cached projection() (cybot.geometry).
+        """
+        projection = scan.projection() # Sensor-frame unit vectors (x right, y ahead), shared with the radar
+        dists = np.asarray(scan.dists, dtype=np.float64)
+        valid = dists > 0
+        dists = dists[valid]
+        if not len(dists):
+            return 0
+        # Sensor frame -> world: a rotation by heading - 90 degrees (one cos/sin per scan)
+        rot = math.radians(heading_deg - 90.0)
+        cos_r, sin_r = math.cos(rot), math.sin(rot)
+        sx, sy = np.asarray(projection.ux)[valid], np.asarray(projection.uy)[valid]
+        ux, uy = cos_r * sx - sin_r * sy, sin_r * sx + cos_r * sy
+        hit = dists <= self.max_range_cm
+        # Free space ends half a cell before the obstacle, so the hit cell is not cleared by its own ray
+        free_until = np.where(hit, dists - self.cell_cm / 2, self.max_range_cm)
+        steps = self._steps
+        on_ray = steps[np.newaxis, :] < free_until[:, np.newaxis]
+        free_x = (sensor_x_cm + ux[:, np.newaxis] * steps)[on_ray]
+        free_y = (sensor_y_cm + uy[:, np.newaxis] * steps)[on_ray]
+        occ_x, occ_y = sensor_x_cm + ux[hit] * dists[hit], sensor_y_cm + uy[hit] * dists[hit]
+
+        # Global cell indices -> one integer key per cell (relative to the scan's bounding box) for unique/setdiff
+        cell = self.cell_cm
+        all_cx = np.floor(np.concatenate((free_x, occ_x)) / cell).astype(np.int64)
+        all_cy = np.floor(np.concatenate((free_y, occ_y)) / cell).astype(np.int64)
+        min_cx, min_cy = all_cx.min(), all_cy.min()
+        span = all_cy.max() - min_cy + 1
+        keys = (all_cx - min_cx) * span + (all_cy - min_cy)
+        occupied = np.unique(keys[len(free_x):])
+        free = np.setdiff1d(keys[:len(free_x)], occupied) # Sorted and unique
+        for cell_keys, delta in ((free, LOG_ODDS_FREE), (occupied, LOG_ODDS_OCCUPIED)):
+            self._add(cell_keys // span + min_cx, cell_keys % span + min_cy, delta)
+        self.scans += 1
+        return len(dists)
+
+    def _add(self, cxs, cys, delta):
+        """Adds delta to cells (global indices), tile by tile, creating tiles as needed."""
+        if not len(cxs):
+            return
+        n = self.tile_cells
+        txs, lxs = np.divmod(cxs, n)
+        tys, lys = np.divmod(cys, n)
+        tile_ids, which = np.unique(np.stack((txs, tys), axis=1), axis=0, return_inverse=True)
+        which = which.reshape(-1)
+        for i, (tx, ty) in enumerate(tile_ids.tolist()):
+            mine = which == i
+            key = (tx, ty)
+            tile = self.tiles.get(key)
+            if tile is None:
+                tile = self.tiles[key] = np.zeros((n, n), dtype=np.float32)
+            ly, lx = lys[mine], lxs[mine]
+            tile[ly, lx] = np.clip(tile[ly, lx] + delta, -LOG_ODDS_LIMIT, LOG_ODDS_LIMIT)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def log_odds_at(self, x_cm, y_cm):
+        """Log-odds of the cell containing (x_cm, y_cm); 0.0 (unknown) where nothing was seen."""
+        cx, cy = int(math.floor(x_cm / self.cell_cm)), int(math.floor(y_cm / self.cell_cm))
+        (tx, lx), (ty, ly) = divmod(cx, self.tile_cells), divmod(cy, self.tile_cells)
+        tile = self.tiles.get((tx, ty))
+        return 0.0 if tile is None else float(tile[ly, lx])
+
+    def tile_keys_in(self, x0_cm, y0_cm, x1_cm, y1_cm):
+        """Existing tiles intersecting the rectangle (world cm, x0 <= x1, y0 <= y1)."""
+        size = self.tile_cm
+        tx0, tx1 = math.floor(x0_cm / size), math.floor(x1_cm / size)
+        ty0, ty1 = math.floor(y0_cm / size), math.floor(y1_cm / size)
+        if (tx1 - tx0 + 1) * (ty1 - ty0 + 1) > len(self.tiles):
+            return [key for key in self.tiles if tx0 <= key[0] <= tx1 and ty0 <= key[1] <= ty1]
+        tiles = self.tiles
+        return [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1) if (tx, ty) in tiles]
+
+    def tile_bounds(self, key):
+        """(x0, y0, x1, y1) of a tile in world cm."""
+        size = self.tile_cm
+        return key[0] * size, key[1] * size, (key[0] + 1) * size, (key[1] + 1) * size
+
+    def tile_version(self, key):
+        return self._versions.get(key, 0)
+
+    def render_tile(self, key, size_px):
+        """size_px x size_px x 3 uint8 RGB image of a tile, top row = highest y (nearest-neighbour scaling)."""
+        tile = self.tiles.get(key)
+        if tile is None:
+            return np.broadcast_to(np.array(UNKNOWN_COLOR, dtype=np.uint8), (size_px, size_px, 3))
+        shade = ((tile[::-1] + LOG_ODDS_LIMIT) * (255 / (2 * LOG_ODDS_LIMIT))).astype(np.uint8)
+        if size_px != self.tile_cells:
+            pick = np.arange(size_px) * self.tile_cells // size_px
+            shade = shade[pick[:, np.newaxis], pick]
+        return self._lut[shade]
+
+
+def _color_table():
+    """256 x RGB: shade 0 (log-odds -limit, free) .. 127/128 (unknown) .. 255 (+limit, occupied)."""
+    p = 1.0 / (1.0 + np.exp(-np.linspace(-LOG_ODDS_LIMIT, LOG_ODDS_LIMIT, 256)))
+    free, unknown, occupied = (np.array(c, dtype=np.float64) for c in (FREE_COLOR, UNKNOWN_COLOR, OCCUPIED_COLOR))
+    below = p[:, np.newaxis] < 0.5
+    t = np.abs(p - 0.5)[:, np.newaxis] * 2 # 0 at unknown, 1 at certain
+    colors = np.where(below, unknown + (free - unknown) * t, unknown + (occupied - unknown) * t)
+    return np.round(colors).astype(np.uint8)
@@ -0,0 +1,84 @@
+"""Toggleable performance overlay: message rate, queue depth, staleness, stage and render times.
+
+A small text panel placed over a widget (the map canvas) that shows what
+PipelineMonitor and RenderScheduler measured, plus the drop counters of a
+cybot.ingestqueue.IngestQueue. It refreshes itself every
+refresh_ms while it is shown; hidden, it is unmapped, its timer is cancelled
+and the monitor stops recording, so the pipeline only keeps its stamps.
+"""
+import tkinter as tk
+
+DEFAULT_REFRESH_MS = 500
+
+
+class PerfOverlay:
+    """Label placed in the top right corner of parent. toggle() shows/hides it.
+
+    ingest_queue -- optional queue the monitored batches wait in: its current qsize()
+                    is shown (else the depth the monitor saw at the last dispatch), and
+                    its stats() drop counters if it has them (IngestQueue)
+    """
+
+    def __init__(self, parent, monitor, render_scheduler, ingest_queue=None, refresh_ms=DEFAULT_REFRESH_MS):
+        self.parent = parent
+        self.monitor = monitor
+        self.render_scheduler = render_scheduler
+        self.ingest_queue = ingest_queue
+        self.refresh_ms = refresh_ms
+        self.visible = False
+        self.label = tk.Label(parent, justify=tk.LEFT, anchor="nw", font=("Courier", 9),
+                              bg="#202020", fg="#e0e0e0", padx=6, pady=4)
+        self._job = None
+
+    def show(self):
+        if self.visible:
+            return
+        self.visible = True
+        self.monitor.set_enabled(True)
+        self.label.place(in_=self.parent, relx=1.0, x=-6, y=6, anchor="ne")
+        self.label.lift()
+        self._refresh()
+
+    def hide(self):
+        if not self.visible:
+            return
+        self.visible = False
+        self.monitor.set_enabled(False)
+        if self._job is not None:
+            self.parent.after_cancel(self._job)
+            self._job = None
+        self.label.place_forget()
+
+    def toggle(self, event=None):
+        self.hide() if self.visible else self.show()
+
+    def _refresh(self):
+        self._job = None
+        if not self.visible:
+            return
+        try:
+            self.label.config(text=self.text())
+        except tk.TclError:
+            return # Widget destroyed (window closing)
+        self._job = self.parent.after(self.refresh_ms, self._refresh)
+
+    def text(self):
+        """The panel contents (also handy for printing)."""
+        monitor = self.monitor
+        ingest_queue = self.ingest_queue
+        depth = ingest_queue.qsize() if ingest_queue is not None else monitor.queue_depth
+        staleness = monitor.staleness()
+        rows = [f"rate   {monitor.message_rate():8.0f} lines/s",
+                f"queue  {depth:8d} (max {monitor.max_queue_depth})"]
+        if hasattr(ingest_queue, "stats"):
+            stats = ingest_queue.stats()
+            rows.append(f"drop   {sum(stats['dropped'].values()):8d} (superseded {stats['superseded']},"
+                        f" overflow {stats['overflow']})")
+        rows.append("stale  " + ("       -" if staleness is None else f"{staleness * 1000:8.1f} ms"))
+        rows.append("stage (ms)          p50      p99")
+        for name, histogram in monitor.stages.items():
+            rows.append(f" {name:<16} {histogram.percentile(50) * 1000:8.2f} {histogram.percentile(99) * 1000:8.2f}")
+        rows.append("view (ms)          last      max")
+        for name, stats in self.render_scheduler.stats.items():
+            rows.append(f" {name:<16} {stats.last_s * 1000:8.2f} {stats.max_s * 1000:8.2f}")
+        return "\n".join(rows)
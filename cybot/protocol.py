@@ -0,0 +1,131 @@
+"""Table-driven parsing of the CyBot text protocol.
+
+Every line looks like ``PREFIX:payload``. MessageDispatcher splits off the
+prefix once, looks its parser up in a dict and passes the typed record it
+returns (see cybot.model) to the handler registered for that record type. This
+replaces the ``startswith`` if-chain (plus ``"END SCAN" in line.upper()`` on
+every line) and the ``split(',')``/``split('=')``/``strip()`` loops each
+handler used to run.
+
+Adding a message type is one ``register_parser`` call plus an ``on`` call for
+its handler; nothing else needs editing.
+"""
+import re
+
+from cybot.model import ScanPoint, ScanEnd, StatusSample, MoveEvent, BumpEvent, TextMessage
+
+# Firmware format (main.c): "SCAN:ANGLE=%.2f,DIST_CM=%.2f,IR_RAW=%d", "MOVE: ANGLE_DEG=%.2f,DIST_CM=%.2f" and
+# "STATUS:BUMP_L=%d,BUMP_R=%d,CLIFF_L_SIG=%u,CLIFF_FL_SIG=%u,CLIFF_FR_SIG=%u,CLIFF_R_SIG=%u,PING=%.2f, Heading=%d".
+# The regexes handle that exact field order in one match; anything else falls back to key=value parsing.
+_SCAN_RE = re.compile(r"\s*ANGLE=([^,]*),\s*DIST_CM=([^,]*),\s*IR_RAW=([^,]*)$")
+_MOVE_RE = re.compile(r"\s*ANGLE_DEG=([^,]*),\s*DIST_CM=([^,]*)$")
+_STATUS_RE = re.compile(r"\s*BUMP_L=([^,]*),\s*BUMP_R=([^,]*),\s*CLIFF_L_SIG=([^,]*),\s*CLIFF_FL_SIG=([^,]*),"
+                        r"\s*CLIFF_FR_SIG=([^,]*),\s*CLIFF_R_SIG=([^,]*),\s*PING=([^,]*)(?:,\s*Heading=([^,]*))?$")
+
+
+def parse_fields(payload):
+    """Splits 'KEY=value,KEY=value,...' into a dict of stripped strings (malformed parts are skipped)."""
+    fields = {}
+    for part in payload.split(','):
+        key, sep, value = part.partition('=')
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def parse_status(payload):
+    m = _STATUS_RE.match(payload)
+    if m is not None:
+        bump_l, bump_r, cliff_l, cliff_fl, cliff_fr, cliff_r, ping, heading = m.groups()
+        try:
+            return StatusSample(int(bump_l), int(bump_r), int(cliff_l), int(cliff_fl), int(cliff_fr), int(cliff_r),
+                                float(ping), None if heading is None else int(heading))
+        except ValueError:
+            pass # A garbled field: from_fields() sets just that one to None
+    return StatusSample.from_fields(parse_fields(payload))
+
+
+def parse_scan(payload):
+    """SCAN point, or the END marker. Returns None for an incomplete point (like the old parser, it is skipped)."""
+    m = _SCAN_RE.match(payload)
+    if m is not None:
+        angle, dist, ir = m.groups()
+        return ScanPoint(float(angle), float(dist), int(ir))
+    if "END SCAN" in payload.upper():
+        return ScanEnd(payload.strip())
+    fields = parse_fields(payload)
+    if "ANGLE" in fields and "DIST_CM" in fields and "IR_RAW" in fields:
+        return ScanPoint(float(fields["ANGLE"]), float(fields["DIST_CM"]), int(fields["IR_RAW"]))
+    return None
+
+
+def parse_move(payload):
+    """MOVE event; missing fields count as 0 like before."""
+    m = _MOVE_RE.match(payload)
+    if m is not None:
+        angle, dist = m.groups()
+        return MoveEvent(float(angle), float(dist))
+    fields = parse_fields(payload)
+    return MoveEvent(float(fields.get("ANGLE_DEG", 0.0)), float(fields.get("DIST_CM", 0.0)))
+
+
+def parse_bump_event(payload):
+    upper = payload.upper()
+    side = "LEFT" if "LEFT" in upper else "RIGHT" if "RIGHT" in upper else ""
+    return BumpEvent(side, payload.strip())
+
+
+def text_parser(kind):
+    """Parser for free-text message types (INFO:, DEBUG:, ...)."""
+    def parse_text(payload):
+        return TextMessage(kind, payload.strip())
+    return parse_text
+
+
+class MessageDispatcher:
+    """Maps line prefixes to parsers and record types to handlers."""
+
+    def __init__(self):
+        self._parsers = {} # "SCAN" -> parse function
+        self._handlers = {} # ScanPoint -> handler
+
+    def register_parser(self, prefix, parser):
+        """Routes lines starting with 'prefix:' to parser(payload), which returns a record or None."""
+        self._parsers[prefix] = parser
+
+    def on(self, record_type, handler):
+        """Calls handler(record) for every parsed record of record_type (replaces any previous handler)."""
+        self._handlers[record_type] = handler
+
+    def dispatch(self, line):
+        """Parses one line and runs its handler. Returns the record (None for unknown or empty lines).
+
+        Parser errors (ValueError on a garbled number) propagate to the caller. The payload is
+        passed unstripped (a trailing '\\r' included); the parsers strip what they keep.
+        """
+        colon = line.find(":")
+        if colon < 0:
+            return None
+        parser = self._parsers.get(line[:colon])
+        if parser is None:
+            parser = self._parsers.get(line[:colon].lstrip()) # Leading blanks, the rare case
+            if parser is None:
+                return None
+        record = parser(line[colon + 1:])
+        if record is not None:
+            handler = self._handlers.get(record.__class__)
+            if handler is not None:
+                handler(record)
+        return record
+
+
+def default_dispatcher():
+    """A dispatcher with parsers for every message type the firmware sends."""
+    dispatcher = MessageDispatcher()
+    dispatcher.register_parser("STATUS", parse_status)
+    dispatcher.register_parser("SCAN", parse_scan)
+    dispatcher.register_parser("MOVE", parse_move)
+    dispatcher.register_parser("BUMP_EVENT", parse_bump_event)
+    for kind in ("INFO", "DEBUG", "ERROR", "ACK"):
+        dispatcher.register_parser(kind, text_parser(kind))
+    return dispatcher
@@ -0,0 +1,159 @@
+"""Retained-mode radar plot (servo sweep, PING in red, IR in blue).
+
+draw_radar_plot used to run ``delete("all")`` on every scan and every
+``<Configure>``, then recreate six range arcs, seven radial lines, all labels
+and the robot icon before drawing the scan polylines. RadarView keeps two
+layers on the canvas instead:
+
+  * the grid layer (arcs, radials, labels, robot icon) is built on the first
+    draw and rebuilt only when the canvas size changes;
+  * the data layer is a small pool of line items per sensor. A new scan moves
+    them with ``coords()``; items are only created when a scan has more line
+    segments than any scan before, and hidden/shown when the count changes.
+    The items belong to the view, so clearing goes through clear() instead of
+    deleting the ping_scan_plot/ir_scan_plot tags.
+
+A redraw of an unchanged-size radar is the two winfo size queries plus one
+``coords()`` per line segment (usually one PING and one IR segment).
+"""
+import math
+import tkinter as tk
+
+MAX_DIST_CM = 330.0 # Range of the PING plot and the grid (3.3 m)
+GRID_RANGES_CM = (50, 100, 150, 200, 250, 300)
+GRID_COLOR = "#A0A0A0"
+LABEL_COLOR = "#505050"
+ROBOT_ICON_SIZE = 5
+
+
+class RadarView:
+    """Draws scans (cybot.scanbuffer.ScanBuffer) on a Tk canvas, reusing its items between scans.
+
+    Point positions come from the scan's cached projection() (cybot.geometry).
+    """
+
+    def __init__(self, canvas, ir_valid_min, ir_min_raw, ir_max_raw, max_dist_cm=MAX_DIST_CM):
+        self.canvas = canvas
+        self.ir_valid_min = ir_valid_min # Weaker IR readings are not plotted (noise)
+        self.ir_min_raw = ir_min_raw # IR reading plotted at the outer edge ("far")
+        self.ir_max_raw = ir_max_raw # IR reading plotted at the center ("close")
+        self.max_dist_cm = max_dist_cm
+        self._size = None # (width, height) the grid layer was built for
+        self._center_x = self._center_y = self._max_radius = 0.0
+        self._lines = {"ping_scan_plot": [], "ir_scan_plot": []} # Tag -> line items, in pool order
+        self._visible = {"ping_scan_plot": 0, "ir_scan_plot": 0} # Tag -> items currently shown
+
+    def draw(self, scan):
+        """Plots scan. Returns False (nothing drawn) while the canvas has no usable size.
+
+        Raises tk.TclError if the canvas is not fully initialized yet.
+        """
+        size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        if size[0] <= 1 or size[1] <= 1:
+            return False
+        if size != self._size:
+            self._build_grid(*size)
+        ping_segments, ir_segments = self._polylines(scan)
+        self._update_layer("ping_scan_plot", ping_segments, "red")
+        self._update_layer("ir_scan_plot", ir_segments, "blue")
+        return True
+
+    def clear(self):
+        """Hides the scan lines (the "Clear Radar" button); they are reused by the next draw()."""
+        for tag, items in self._lines.items():
+            for item in items[:self._visible[tag]]:
+                self.canvas.itemconfigure(item, state="hidden")
+            self._visible[tag] = 0
+
+    def _build_grid(self, canvas_width, canvas_height):
+        canvas = self.canvas
+        canvas.delete("scan_plot_grid", "radar_robot")
+        self._size = (canvas_width, canvas_height)
+        center_x = self._center_x = canvas_width / 2
+        center_y = self._center_y = canvas_height # Base Y at the bottom for a 180-degree forward sweep
+        max_radius_pixels = self._max_radius = min(canvas_width / 2.0, canvas_height) * 0.9
+
+        for r_cm in GRID_RANGES_CM:
+            if r_cm > self.max_dist_cm: continue
+            r_pixels = max_radius_pixels * r_cm / self.max_dist_cm
+            canvas.create_arc(center_x - r_pixels, center_y - r_pixels, center_x + r_pixels, center_y + r_pixels,
+                              start=0, extent=180, outline=GRID_COLOR, style=tk.ARC, tags="scan_plot_grid")
+            canvas.create_text(center_x + 5, center_y - r_pixels + 6, text=f"{r_cm:.0f}", fill=LABEL_COLOR,
+                               font=("Arial", 7), anchor="w", tags="scan_plot_grid")
+
+        for angle_deg in range(0, 181, 30): # 0 right, 90 forward, 180 left
+            plot_angle_rad = math.radians(angle_deg)
+            canvas.create_line(center_x, center_y,
+                               center_x + max_radius_pixels * math.cos(plot_angle_rad),
+                               center_y - max_radius_pixels * math.sin(plot_angle_rad),
+                               fill=GRID_COLOR, tags="scan_plot_grid")
+            label_rad_offset = max_radius_pixels * 1.05 # Labels slightly beyond the max radius
+            label_x = center_x + label_rad_offset * math.cos(plot_angle_rad)
+            label_y = center_y - label_rad_offset * math.sin(plot_angle_rad)
+            anchor_pos = tk.CENTER; x_offset = 0; y_offset = 0
+            if angle_deg == 0: anchor_pos = tk.W; x_offset = 3
+            elif angle_deg == 180: anchor_pos = tk.E; x_offset = -3
+            elif angle_deg == 90: anchor_pos = tk.S; y_offset = -3
+            elif angle_deg > 90:
+                anchor_pos = tk.NE if angle_deg < 135 else tk.E; y_offset = 1; x_offset = -1
+            else:
+                anchor_pos = tk.NW if angle_deg > 45 else tk.W; y_offset = 1; x_offset = 1
+            canvas.create_text(label_x + x_offset, label_y + y_offset, text=f"{angle_deg}°", fill=LABEL_COLOR,
+                               font=("Arial", 8), anchor=anchor_pos, tags="scan_plot_grid")
+
+        canvas.create_oval(center_x - ROBOT_ICON_SIZE, center_y - ROBOT_ICON_SIZE, center_x + ROBOT_ICON_SIZE, center_y,
+                           fill="darkgreen", outline="black", tags="radar_robot")
+        canvas.create_line(center_x, center_y, center_x, center_y - ROBOT_ICON_SIZE * 1.5,
+                           fill="white", width=1, arrow=tk.LAST, tags="radar_robot")
+        # The new grid must stay below data lines created before the resize
+        canvas.tag_lower("radar_robot")
+        canvas.tag_lower("scan_plot_grid")
+
+    def _polylines(self, scan):
+        """Flat [x0, y0, x1, y1, ...] coordinate lists of the PING and IR line segments.
+
+        A segment is cut at a point that cannot be plotted, like before; a lone
+        point (fewer than 2) is carried over into the next segment.
+        """
+        center_x, center_y, max_radius_pixels = self._center_x, self._center_y, self._max_radius
+        max_dist = self.max_dist_cm
+        ping_scale = max_radius_pixels / max_dist # PING points: sensor-frame cm -> pixels
+        ir_valid_min, ir_min_raw, ir_max_raw = self.ir_valid_min, self.ir_min_raw, self.ir_max_raw
+        ping_segments, ir_segments = [], []
+        ping_points, ir_points = [], []
+        projection = scan.projection() # Shared with the other consumers of this scan, no trigonometry here
+        for dist_cm, ir_raw, x_cm, y_cm, cos_a, sin_a in zip(scan.dists, scan.irs, projection.xs, projection.ys,
+                                                            projection.ux, projection.uy):
+            if 0 < dist_cm <= max_dist:
+                ping_points += (center_x + x_cm * ping_scale, center_y - y_cm * ping_scale)
+            elif len(ping_points) >= 4:
+                ping_segments.append(ping_points)
+                ping_points = []
+            if ir_raw >= ir_valid_min:
+                clamped_ir = max(ir_min_raw, min(ir_raw, ir_max_raw))
+                # Higher IR (closer object) -> smaller radius
+                r_pixels = max(0, (1.0 - (clamped_ir - ir_min_raw) / (ir_max_raw - ir_min_raw)) * max_radius_pixels)
+                ir_points += (center_x + r_pixels * cos_a, center_y - r_pixels * sin_a)
+            elif len(ir_points) >= 4:
+                ir_segments.append(ir_points)
+                ir_points = []
+        if len(ping_points) >= 4:
+            ping_segments.append(ping_points)
+        if len(ir_points) >= 4:
+            ir_segments.append(ir_points)
+        return ping_segments, ir_segments
+
+    def _update_layer(self, tag, segments, color):
+        canvas = self.canvas
+        items = self._lines[tag]
+        visible = self._visible[tag]
+        for i, coords in enumerate(segments):
+            if i == len(items):
+                items.append(canvas.create_line(coords, fill=color, width=2, tags=tag))
+                continue
+            canvas.coords(items[i], coords)
+            if i >= visible:
+                canvas.itemconfigure(items[i], state="normal")
+        for item in items[len(segments):visible]:
+            canvas.itemconfigure(item, state="hidden")
+        self._visible[tag] = len(segments)
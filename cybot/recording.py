@@ -0,0 +1,180 @@
+"""Session recording and time-accurate replay.
+
+Once a run was over its data was gone: the scripts keep only the last scan
+and the Raw Data Log is text in a widget. SessionRecorder tees every received
+batch of lines, stamped with time.monotonic() at receive time, into a file;
+SessionReplayer feeds a recording back through the same path the ingest thread
+uses (CyBotEngine.feed), at 1x, Nx or maximum speed, for reproducible
+performance runs and post-mortems without the robot.
+
+File format: append-only gzip members, one per chunk. A chunk holds about
+CHUNK_BYTES of text or CHUNK_SECONDS of time, whichever comes first, as lines
+of ``<seconds since start> <line>``; lines starting with '#' are comments. A
+crash loses at most the chunk being collected, an unfinished last member is
+skipped on replay, and ``zcat`` shows the file as plain text.
+
+The receiving thread only appends to a queue; compressing and writing happen
+on the recorder's own writer thread.
+"""
+import gzip
+import queue
+import threading
+import time
+import zlib
+
+FORMAT_HEADER = "# cybot session recording v1"
+CHUNK_BYTES = 64 * 1024
+CHUNK_SECONDS = 1.0
+COMPRESS_LEVEL = 6
+
+
+class SessionRecorder:
+    """Writes received batches to path from a background thread. record() is safe to call from any thread.
+
+    lines_recorded and chunks_written count what reached the file.
+    """
+
+    def __init__(self, path, chunk_bytes=CHUNK_BYTES, chunk_seconds=CHUNK_SECONDS):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.chunk_seconds = chunk_seconds
+        self.lines_recorded = 0
+        self.chunks_written = 0
+        self._file = open(path, "ab")
+        self._queue = queue.SimpleQueue() # (monotonic time, lines, comment text), or None to stop
+        self._start = time.monotonic()
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        self._queue.put((self._start, None, f"{FORMAT_HEADER}, started {started}\n"))
+        self._thread = threading.Thread(target=self._run, name="cybot-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, lines, timestamp=None):
+        """Queues a batch of lines received at timestamp (time.monotonic(), default now)."""
+        self._queue.put((time.monotonic() if timestamp is None else timestamp, lines, None))
+
+    def close(self, timeout=5.0):
+        """Writes everything queued so far and closes the file."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        parts, size = [], 0
+        deadline = time.monotonic() + self.chunk_seconds
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    timestamp, lines, comment = item
+                    if comment is not None:
+                        parts.append(comment)
+                        size += len(comment)
+                    else:
+                        prefix = "%.6f " % (timestamp - self._start)
+                        for line in lines:
+                            parts.append(prefix + line + "\n")
+                            size += len(prefix) + len(line) + 1
+                        self.lines_recorded += len(lines)
+                if size >= self.chunk_bytes or time.monotonic() >= deadline:
+                    self._write_chunk(parts)
+                    parts, size = [], 0
+                    deadline = time.monotonic() + self.chunk_seconds
+            self._write_chunk(parts)
+        except OSError as e:
+            print(f"Session recording stopped: {e}")
+        finally:
+            self._file.close()
+
+    def _write_chunk(self, parts):
+        if not parts:
+            return
+        self._file.write(gzip.compress("".join(parts).encode("utf-8"), compresslevel=COMPRESS_LEVEL))
+        self._file.flush()
+        self.chunks_written += 1
+
+
+def read_recording(path):
+    """Yields (seconds since start, line) from a recording, stopping quietly at an unfinished last chunk."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", newline="\n") as f:
+            for record in f:
+                if not record.endswith("\n"):
+                    break # Cut off mid-line
+                if record.startswith("#"):
+                    continue
+                stamp, _, line = record[:-1].partition(" ")
+                yield float(stamp), line
+    except (EOFError, zlib.error, gzip.BadGzipFile):
+        return # The recording was still being written (or its writer died) when this chunk started
+
+
+def recorded_batches(path):
+    """Yields (seconds since start, lines): the batches as they were received (records sharing a timestamp)."""
+    batch, batch_time = [], None
+    for stamp, line in read_recording(path):
+        if stamp != batch_time and batch:
+            yield batch_time, batch
+            batch = []
+        batch_time = stamp
+        batch.append(line)
+    if batch:
+        yield batch_time, batch
+
+
+class SessionReplayer:
+    """Feeds a recording to feed(lines) on a background thread, keeping the recorded timing.
+
+    speed: 1.0 = as recorded, 10.0 = ten times faster, None (or 0) = as fast as feed() takes it.
+    on_done() is called on the replay thread when the recording ran out or stop() was called.
+    """
+
+    def __init__(self, path, feed, speed=1.0, on_done=None):
+        self.path = path
+        self.feed = feed
+        self.speed = speed or None
+        self.on_done = on_done
+        self.lines_replayed = 0
+        self.elapsed_s = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="cybot-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def run(self):
+        """Replays on the calling thread."""
+        start = time.perf_counter()
+        first = None # Timing is kept relative to the first batch
+        try:
+            for stamp, lines in recorded_batches(self.path):
+                if first is None:
+                    first = stamp
+                if self.speed is not None:
+                    wait = start + (stamp - first) / self.speed - time.perf_counter()
+                    if wait > 0 and self._stop.wait(wait):
+                        break
+                if self._stop.is_set():
+                    break
+                self.feed(lines)
+                self.lines_replayed += len(lines)
+        finally:
+            self.elapsed_s = time.perf_counter() - start
+            if self.on_done is not None:
+                self.on_done()
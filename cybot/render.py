@@ -0,0 +1,106 @@
+"""Frame-based redraw scheduling for the GUI views.
+
+Redraws used to be fired from all over the scripts: ``after(10, ...)`` at END
+SCAN, ``after(50, ...)`` from ``<Configure>`` lambdas, ``after(10, ...)`` per
+MOVE and direct draw_robot_on_map() calls. A burst of MOVE lines or resize
+events queued one redraw each, although only the last one was ever seen.
+
+RenderScheduler replaces those calls with mark_dirty(view). Each frame renders
+every view marked since the last frame once, in registration order. Frames are
+at least 1/max_fps apart; a view marked while a frame is pending simply rides
+along with it. Render times are accumulated per view (report()), and on_frame,
+if set, is called with the perf_counter() time each frame finished.
+"""
+import time
+
+DEFAULT_MAX_FPS = 30
+
+
+class ViewStats:
+    """Render count and timing of one view."""
+    __slots__ = ("renders", "total_s", "max_s", "last_s")
+
+    def __init__(self):
+        self.renders = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.last_s = 0.0
+
+    def add(self, seconds):
+        self.renders += 1
+        self.total_s += seconds
+        self.last_s = seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    @property
+    def mean_s(self):
+        return self.total_s / self.renders if self.renders else 0.0
+
+    def __repr__(self):
+        return (f"ViewStats(renders={self.renders}, mean={self.mean_s * 1000:.2f} ms, "
+                f"max={self.max_s * 1000:.2f} ms)")
+
+
+class RenderScheduler:
+    """Renders dirty views at most once per frame, at most max_fps frames per second.
+
+    widget     -- any Tk widget, used for after()
+    add_view() -- registers render() under a name; views render in that order
+    """
+
+    def __init__(self, widget, max_fps=DEFAULT_MAX_FPS):
+        self.widget = widget
+        self.max_fps = max_fps
+        self._views = {} # Name -> render function, in registration (= render) order
+        self._dirty = set()
+        self._frame_job = None
+        self._last_frame = float("-inf") # perf_counter() at the start of the last frame
+        self.frames = 0
+        self.stats = {} # Name -> ViewStats
+        self.on_frame = None # Called with perf_counter() after each frame (e.g. PipelineMonitor.rendered)
+
+    def add_view(self, name, render):
+        self._views[name] = render
+        self.stats[name] = ViewStats()
+
+    def mark_dirty(self, name):
+        """Requests a render of view name in the next frame (cheap when already requested)."""
+        if name not in self._views:
+            raise KeyError(f"Unknown view: {name}")
+        self._dirty.add(name)
+        if self._frame_job is None:
+            wait_s = self._last_frame + 1.0 / self.max_fps - time.perf_counter()
+            self._frame_job = self.widget.after(int(max(0.0, wait_s) * 1000), self._frame)
+
+    def is_dirty(self, name):
+        return name in self._dirty
+
+    def frame_pending(self):
+        """True while a frame is scheduled (some view is waiting to be rendered)."""
+        return self._frame_job is not None
+
+    def _frame(self):
+        self._frame_job = None
+        self._last_frame = time.perf_counter()
+        self.frames += 1
+        for name, render in self._views.items():
+            if name not in self._dirty:
+                continue
+            self._dirty.discard(name) # Before rendering: a render may mark its own view dirty again (retry)
+            t0 = time.perf_counter()
+            try:
+                render()
+            except Exception as e:
+                print(f"Error rendering {name} view: {e}")
+            self.stats[name].add(time.perf_counter() - t0)
+        if self.on_frame is not None:
+            self.on_frame(time.perf_counter())
+
+    def report(self):
+        """One line per view: render count, mean and max render time."""
+        lines = [f"Render stats: {self.frames} frames (cap {self.max_fps} fps)"]
+        for name, stats in self.stats.items():
+            lines.append(f"  {name:<8} {stats.renders:>6} renders  mean {stats.mean_s * 1000:7.2f} ms"
+                         f"  max {stats.max_s * 1000:7.2f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,136 @@
+"""Column-oriented storage for one scan sweep.
+
+The scripts used to collect SCAN points as a list of tuples, copy the list at
+END SCAN (``current_scan_buffer[:]``), sort it again in detect_and_plot_objects
+and build a second, unused list from it. ScanBuffer keeps angle, distance and IR
+in three preallocated typed arrays (``array('f')``, ``array('f')``,
+``array('H')``) kept sorted by angle as points arrive, so:
+
+  * a sweep allocates nothing after the first one (the columns are reused);
+  * END SCAN is a swap of two buffers, not a copy;
+  * the radar and the detector read ``angles``/``dists``/``irs``, which are
+    memoryview slices of the columns (no copy, values come out as plain
+    Python floats/ints);
+  * numpy_columns() wraps the same memory as NumPy arrays when NumPy is
+    installed, for vectorized code;
+  * fingerprint() hashes the columns, so results computed from a scan can be
+    cached by content (cybot.detection.DetectionCache);
+  * projection() is the scan in sensor-frame Cartesian coordinates
+    (cybot.geometry), computed on first use and kept until the buffer changes.
+
+Distances are stored as 32-bit floats (about 7 significant digits, far more
+than the PING sensor resolves); IR readings are clamped to 0..65535.
+"""
+from array import array
+from bisect import bisect_right
+from hashlib import blake2b
+
+from cybot.geometry import project_scan
+from cybot.model import ScanPoint
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, only numpy_columns() needs it
+    np = None
+
+DEFAULT_CAPACITY = 128 # A 0-182 degree sweep in 2 degree steps is 92 points
+IR_MAX = 0xFFFF
+
+
+class ScanBuffer:
+    """Angle-sorted scan points in parallel typed columns."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._n = 0
+        self._projection = None # Cached projection(), dropped by add() and clear()
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        angle = memoryview(array('f', bytes(4 * capacity)))
+        dist = memoryview(array('f', bytes(4 * capacity)))
+        ir = memoryview(array('H', bytes(2 * capacity)))
+        n = self._n
+        if n:
+            angle[:n], dist[:n], ir[:n] = self.angles, self.dists, self.irs
+        # Views handed out earlier keep pointing at the old arrays; those are never resized, only replaced
+        self._angle, self._dist, self._ir = angle, dist, ir
+        self._capacity = capacity
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield ScanPoint(self._angle[i], self._dist[i], self._ir[i])
+
+    def __repr__(self):
+        return f"ScanBuffer({self._n} points)"
+
+    def append(self, point):
+        """Inserts one cybot.model.ScanPoint at its angle-sorted position. Returns that index."""
+        return self.add(point.angle_deg, point.dist_cm, point.ir_raw)
+
+    def add(self, angle_deg, dist_cm, ir_raw):
+        """Inserts one point at its angle-sorted position (after points with the same angle). Returns that index."""
+        n = self._n
+        if n == self._capacity:
+            self._allocate(2 * self._capacity)
+        angle, dist, ir = self._angle, self._dist, self._ir
+        if n == 0 or angle_deg >= angle[n - 1]:
+            i = n # Normal case: the servo sweeps in one direction, so points arrive in order
+        else:
+            i = bisect_right(angle, angle_deg, 0, n)
+            angle[i + 1:n + 1], dist[i + 1:n + 1], ir[i + 1:n + 1] = angle[i:n], dist[i:n], ir[i:n]
+        angle[i] = angle_deg
+        dist[i] = dist_cm
+        ir[i] = min(max(int(ir_raw), 0), IR_MAX)
+        self._n = n + 1
+        self._projection = None
+        return i
+
+    def clear(self):
+        """Empties the buffer, keeping the allocated columns for the next sweep."""
+        self._n = 0
+        self._projection = None
+
+    @property
+    def angles(self):
+        """Servo angles in degrees, ascending (zero-copy view)."""
+        return self._angle[:self._n]
+
+    @property
+    def dists(self):
+        """PING distances in cm, in angle order (zero-copy view)."""
+        return self._dist[:self._n]
+
+    @property
+    def irs(self):
+        """Raw IR readings, in angle order (zero-copy view)."""
+        return self._ir[:self._n]
+
+    def projection(self):
+        """cybot.geometry.ScanProjection of the points (unit vectors and PING points in cm), cached until the next change."""
+        if self._projection is None:
+            self._projection = project_scan(self)
+        return self._projection
+
+    def fingerprint(self):
+        """16-byte digest of the points' contents; equal scans (even in different buffers) give equal fingerprints."""
+        digest = blake2b(digest_size=16)
+        digest.update(self._n.to_bytes(4, "little"))
+        for column in (self.angles, self.dists, self.irs):
+            digest.update(column)
+        return digest.digest()
+
+    def numpy_columns(self):
+        """(angles float32, dists float32, irs uint16) NumPy arrays sharing the buffer's memory.
+
+        Raises ImportError when NumPy is not installed. The arrays are only valid
+        until the buffer is cleared or refilled.
+        """
+        if np is None:
+            raise ImportError("numpy_columns() requires NumPy")
+        n = self._n
+        return (np.frombuffer(self._angle, dtype=np.float32, count=n),
+                np.frombuffer(self._dist, dtype=np.float32, count=n),
+                np.frombuffer(self._ir, dtype=np.uint16, count=n))
@@ -0,0 +1,59 @@
+"""Diff-based updates for the sensor panel (bumpers, cliff indicators, labels).
+
+update_sensor_status used to delete and recreate both bumper lines, call
+``itemconfig`` on all four cliff indicators and ``config`` on five labels for
+every STATUS sample, although most samples change nothing on screen. The
+scripts now draw through a SensorPanel, which remembers the last value it gave
+each canvas item and label and skips the Tk call when the new value is the
+same. The bumper lines are created once (add_line()) and only recolored.
+"""
+
+
+class SensorPanel:
+    """Remembers what each indicator shows; set_fill()/set_text() only call Tk on a change.
+
+    Canvas targets are item ids or tags, as accepted by ``itemconfigure``.
+    updates/skipped count the Tk calls made and avoided.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self._fills = {} # Canvas item or tag -> fill color last set
+        self._texts = {} # Label widget -> text last set
+        self.updates = 0
+        self.skipped = 0
+
+    def add_line(self, coords, fill, **options):
+        """Creates a line item that keeps its place on the canvas and is recolored with set_fill(). Returns its id."""
+        item = self.canvas.create_line(coords, fill=fill, **options)
+        self._fills[item] = fill
+        return item
+
+    def set_fill(self, target, color):
+        """Sets the fill of a canvas item or tag. Returns True if Tk was called.
+
+        A tk.TclError from the canvas propagates and nothing is remembered, so
+        the next call retries.
+        """
+        if self._fills.get(target) == color:
+            self.skipped += 1
+            return False
+        self.canvas.itemconfigure(target, fill=color)
+        self._fills[target] = color
+        self.updates += 1
+        return True
+
+    def set_text(self, label, text):
+        """Sets the text of a label widget. Returns True if Tk was called."""
+        if self._texts.get(label) == text:
+            self.skipped += 1
+            return False
+        label.config(text=text)
+        self._texts[label] = text
+        self.updates += 1
+        return True
+
+    def invalidate(self):
+        """Forgets the remembered values, so the next calls all reach Tk (e.g. after the widgets were rebuilt)."""
+        self._fills = {}
+        self._texts = {}
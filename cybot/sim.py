@@ -0,0 +1,405 @@
+"""Local CyBot simulator speaking the port-288 text protocol.
+
+Without the robot on CYBOT_IP:288 nothing past the socket could be run, load-
+tested or soaked. This module plays the firmware side of main.c against a
+virtual arena: it accepts the same single-character commands (w, s, a, d, z,
+c, m, j, l) and sends the same STATUS, SCAN, "SCAN: END Scan", MOVE and INFO
+lines, plus a BUMP_EVENT line when a bumper is pressed. Point a GUI at it by
+setting CYBOT_IP = "127.0.0.1"; nothing else changes.
+
+    python -m cybot.sim                      # firmware timing on 127.0.0.1:288
+    python -m cybot.sim --port 2888 --rate 10 --auto mwwdwwm
+    python -m cybot.sim --flood --auto m     # back-to-back scans, as fast as the socket takes them
+
+The arena (world cm, y up, the robot starting at the origin facing up) has a
+border of white tape, round objects (the posts PING and IR see) and holes
+(black floor the cliff sensors see). Load one from JSON with --arena:
+
+    {"border": [-200, -60, 200, 300], "objects": [[0, 100, 8], ...],
+     "holes": [[-120, 150, 20]], "start": [0, 0, 90]}
+
+Differences from the real robot, on purpose:
+  * turns are applied the way the GUIs apply MOVE lines (heading += ANGLE_DEG,
+    counterclockwise), so the map they draw matches the arena;
+  * 'w' reports the distance actually driven before a bump or cliff stopped
+    it; the firmware always reports 10 cm.
+
+Port 288 is privileged on Linux; run with the rights to bind it, or use --port
+and change CYBOT_PORT to match.
+"""
+import argparse
+import json
+import math
+import random
+import select
+import socket
+import time
+
+CYBOT_PORT = 288
+
+# main.c timing
+LOOP_PERIOD_S = 0.1 # Main loop: one STATUS line per pass
+SCAN_PAN_S = 0.5 # Servo pans to 0 before the sweep
+SCAN_POINT_S = 0.1 # Servo settle time per point
+SCAN_MAX_ANGLE = 182 # Sweep 0, 2, ..., 180; the 182 step sends the END marker
+SCAN_STEP_DEG = 2
+
+# main.c / movement.c motions and thresholds
+DRIVE_CM = 10.0
+TURN_DEG = {'a': -30.0, 'd': 30.0, 'z': -10.0, 'c': 10.0} # As reported in MOVE: ANGLE_DEG
+HOLE_THRESHOLD = 400
+BORDER_THRESHOLD = 2600
+
+# Robot and sensor model
+ROBOT_RADIUS_CM = 15.0
+SENSOR_FORWARD_OFFSET_CM = 5.0
+DRIVE_STEP_CM = 0.5 # Bumpers and cliff sensors are checked this often while driving
+CLIFF_SENSORS = ((70.0, 14.0), (15.0, 15.0), (-15.0, 15.0), (-70.0, 14.0)) # (bearing deg, radius cm): L, FL, FR, R
+BORDER_TAPE_CM = 5.0
+WALL_MARGIN_CM = 60.0 # Room walls (what PING sees without an object) this far outside the border
+PING_MAX_CM = 400.0
+IR_RANGE_CM = 150.0
+
+DEFAULT_ARENA = {
+    "border": [-200.0, -60.0, 200.0, 300.0],
+    "objects": [[0.0, 100.0, 8.0], [-80.0, 150.0, 10.0], [90.0, 80.0, 6.0], [60.0, 220.0, 12.0]],
+    "holes": [[-130.0, 60.0, 20.0], [140.0, 220.0, 25.0]],
+    "start": [0.0, 0.0, 90.0],
+}
+
+
+class Arena:
+    """Border rectangle (x0, y0, x1, y1), objects and holes as (x, y, radius) circles, start pose (x, y, heading)."""
+
+    def __init__(self, border, objects=(), holes=(), start=(0.0, 0.0, 90.0)):
+        self.border = tuple(float(v) for v in border)
+        self.objects = [tuple(float(v) for v in circle) for circle in objects]
+        self.holes = [tuple(float(v) for v in circle) for circle in holes]
+        self.start = tuple(float(v) for v in start)
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(config["border"], config.get("objects", ()), config.get("holes", ()), config.get("start", (0.0, 0.0, 90.0)))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def ping(self, x, y, dx, dy):
+        """Distance along the unit ray to the nearest object, else to the room walls (capped at PING_MAX_CM).
+        Also returns True if the reading is an object."""
+        best = PING_MAX_CM
+        for cx, cy, r in self.objects:
+            t = _ray_circle(x, y, dx, dy, cx, cy, r)
+            if t is not None and t < best:
+                best = t
+        if best < PING_MAX_CM:
+            return best, True
+        x0, y0, x1, y1 = self.border
+        m = WALL_MARGIN_CM
+        return min(_ray_box_exit(x, y, dx, dy, x0 - m, y0 - m, x1 + m, y1 + m), PING_MAX_CM), False
+
+    def floor(self, x, y):
+        """What a cliff sensor over (x, y) sees: "hole", "border" or "floor"."""
+        for cx, cy, r in self.holes:
+            if (x - cx) ** 2 + (y - cy) ** 2 <= r * r:
+                return "hole"
+        x0, y0, x1, y1 = self.border
+        half = BORDER_TAPE_CM / 2
+        near_x = x0 - half <= x <= x1 + half
+        near_y = y0 - half <= y <= y1 + half
+        if (near_y and (abs(x - x0) <= half or abs(x - x1) <= half)) or (near_x and (abs(y - y0) <= half or abs(y - y1) <= half)):
+            return "border"
+        return "floor"
+
+
+class SimulatedCyBot:
+    """Firmware state machine of main.c against an Arena. No sockets and no sleeping:
+
+    tick()          -- one main loop pass: sensor checks (INFO lines) and the STATUS line
+    execute(cmd)    -- one command character; returns [(delay_s, line), ...], the delay being the
+                       firmware time spent before the line is sent (the scan's servo waits)
+    """
+
+    def __init__(self, arena, seed=288):
+        self.arena = arena
+        self.rng = random.Random(seed)
+        self.x, self.y, self.heading = arena.start # World cm, degrees counterclockwise from +x
+        self.current_heading = 0 # main.c's currentHeading counter, sent in STATUS
+        self.ping_cm = 0.0 # Last PING reading ("distance" in main.c)
+        self.ignore_sensors = False
+        self.bump_left = self.bump_right = False
+
+    # --- Sensors ---
+    def _cliff_signals(self):
+        signals = []
+        for bearing, radius in CLIFF_SENSORS:
+            a = math.radians(self.heading + bearing)
+            seen = self.arena.floor(self.x + radius * math.cos(a), self.y + radius * math.sin(a))
+            if seen == "hole":
+                signals.append(self.rng.randint(50, 250))
+            elif seen == "border":
+                signals.append(self.rng.randint(2700, 2900))
+            else:
+                signals.append(self.rng.randint(1300, 1800))
+        return signals
+
+    def _contacts(self):
+        """(left, right) bumpers pressed by objects touching the robot's front half."""
+        left = right = False
+        for cx, cy, r in self.arena.objects:
+            dx, dy = cx - self.x, cy - self.y
+            if math.hypot(dx, dy) > ROBOT_RADIUS_CM + r + 0.25:
+                continue
+            bearing = (math.degrees(math.atan2(dy, dx)) - self.heading + 180.0) % 360.0 - 180.0
+            if abs(bearing) > 90.0:
+                continue # Behind the bumper
+            if bearing >= -10.0: left = True
+            if bearing <= 10.0: right = True
+        return left, right
+
+    def _stop_reason(self, signals):
+        """checkBotSensors()/move_forward(): the INFO text for the first stop condition, or None."""
+        if self.bump_left or self.bump_right:
+            return "Bump sensor triggered! Stopped."
+        if min(signals) < HOLE_THRESHOLD:
+            return "Cliff Hole Detected! Stopped."
+        if max(signals) > BORDER_THRESHOLD:
+            return "Cliff Border Detected! Stopped."
+        return None
+
+    def status_line(self, signals=None):
+        if signals is None: signals = self._cliff_signals()
+        return ("STATUS:BUMP_L=%d,BUMP_R=%d,CLIFF_L_SIG=%u,CLIFF_FL_SIG=%u,CLIFF_FR_SIG=%u,CLIFF_R_SIG=%u,PING=%.2f, Heading=%d\n"
+                % (self.bump_left, self.bump_right, signals[0], signals[1], signals[2], signals[3], self.ping_cm, self.current_heading))
+
+    # --- Firmware ---
+    def tick(self):
+        """One pass of main.c's loop before it looks at commands: INFO for a stop condition, then STATUS."""
+        signals = self._cliff_signals()
+        reason = self._stop_reason(signals)
+        lines = [f"INFO:{reason}\n"] if reason else []
+        lines.append(self.status_line(signals))
+        return lines
+
+    def stopped(self):
+        return self._stop_reason(self._cliff_signals()) is not None
+
+    def execute(self, cmd):
+        if cmd == 'w':
+            if self.stopped() and not self.ignore_sensors:
+                return [(0.0, "INFO:Stop Flag set, check sensors. Cannot move forward\n")]
+            return self._drive_forward()
+        if cmd == 's':
+            self._move(-DRIVE_CM)
+            return [(0.0, "MOVE: ANGLE_DEG=%.2f,DIST_CM=%.2f\n" % (0.0, -DRIVE_CM))]
+        if cmd in TURN_DEG:
+            turn = TURN_DEG[cmd]
+            self.heading = (self.heading + turn) % 360.0
+            self.current_heading += int(turn)
+            self.bump_left, self.bump_right = self._contacts()
+            return [(0.0, "MOVE: ANGLE_DEG=%.2f,DIST_CM=%.2f\n" % (turn, 0.0))]
+        if cmd == 'm':
+            return self._scan()
+        if cmd == 'j':
+            return [(0.0, "INFO:Playing ice cream song\n")]
+        if cmd == 'l':
+            self.ignore_sensors = not self.ignore_sensors
+            return [(0.0, "INFO:stop flag cleared, ignoring sensors, be sure of this action\n")]
+        return [(0.0, "INFO:Unknown command\n")]
+
+    def _move(self, dist_cm):
+        rad = math.radians(self.heading)
+        self.x += dist_cm * math.cos(rad)
+        self.y += dist_cm * math.sin(rad)
+        self.bump_left, self.bump_right = self._contacts()
+
+    def _drive_forward(self):
+        """move_forward(): small steps until DRIVE_CM, a bumper or a cliff signal. Reports what was driven."""
+        was_bumped = self.bump_left or self.bump_right
+        driven = 0.0
+        while driven < DRIVE_CM:
+            self._move(DRIVE_STEP_CM)
+            driven += DRIVE_STEP_CM
+            if self.bump_left or self.bump_right or self._stop_reason(self._cliff_signals()):
+                break
+        lines = [(0.0, "MOVE: ANGLE_DEG=%.2f,DIST_CM=%.2f\n" % (0.0, driven))]
+        if (self.bump_left or self.bump_right) and not was_bumped:
+            side = "LEFT" if self.bump_left and not self.bump_right else "RIGHT" if self.bump_right and not self.bump_left else "FRONT"
+            lines.append((0.0, f"BUMP_EVENT:{side}\n"))
+        return lines
+
+    def _scan(self):
+        lines = [(0.0, "INFO:Starting scan\n")]
+        rad = math.radians(self.heading)
+        sx, sy = self.x + SENSOR_FORWARD_OFFSET_CM * math.cos(rad), self.y + SENSOR_FORWARD_OFFSET_CM * math.sin(rad)
+        delay = SCAN_PAN_S
+        for angle in range(0, SCAN_MAX_ANGLE + 1, SCAN_STEP_DEG):
+            delay += SCAN_POINT_S
+            if angle > 180:
+                lines.append((delay, "SCAN: END Scan\n"))
+                break
+            a = math.radians(self.heading + angle - 90.0) # Servo 90 is straight ahead, 0 is to the right
+            dist, on_object = self.arena.ping(sx, sy, math.cos(a), math.sin(a))
+            dist = max(dist + self.rng.uniform(-1.0, 1.0), 2.0)
+            if on_object and dist <= IR_RANGE_CM:
+                ir = int(2600 - dist * 12 + self.rng.randint(-40, 40))
+            else:
+                ir = self.rng.randint(300, 600)
+            self.ping_cm = dist
+            lines.append((delay, "SCAN:ANGLE=%.2f,DIST_CM=%.2f,IR_RAW=%d\n" % (angle, dist, ir)))
+            delay = 0.0
+        lines.append((0.0, "INFO:Scan complete\n"))
+        return lines
+
+
+def _ray_circle(x, y, dx, dy, cx, cy, r):
+    """Distance along the unit ray (x, y) + t (dx, dy), t >= 0, to the circle's edge, or None."""
+    fx, fy = x - cx, y - cy
+    b = fx * dx + fy * dy
+    disc = b * b - (fx * fx + fy * fy - r * r)
+    if disc < 0:
+        return None
+    root = math.sqrt(disc)
+    t = -b - root
+    if t < 0:
+        t = -b + root # Starting inside the circle
+    return t if t >= 0 else None
+
+
+def _ray_box_exit(x, y, dx, dy, x0, y0, x1, y1):
+    """Distance along the unit ray from a point inside the box to its edge (PING_MAX_CM if outside)."""
+    if not (x0 <= x <= x1 and y0 <= y <= y1):
+        return PING_MAX_CM
+    tx = (x1 - x) / dx if dx > 0 else (x0 - x) / dx if dx < 0 else math.inf
+    ty = (y1 - y) / dy if dy > 0 else (y0 - y) / dy if dy < 0 else math.inf
+    return min(tx, ty)
+
+
+class SimulatorSession:
+    """Runs a SimulatedCyBot for one connected client.
+
+    rate scales the firmware timing (2 = twice as fast); flood drops every delay,
+    so lines go out as fast as the socket accepts them. auto is a command string
+    replayed forever whenever no command from the client is waiting.
+    """
+
+    def __init__(self, sock, robot, rate=1.0, flood=False, auto=""):
+        self.sock = sock
+        self.robot = robot
+        self.rate = rate
+        self.flood = flood
+        self.auto = [c for c in auto if not c.isspace()]
+        self._auto_index = 0
+        self.commands = [] # Received, not executed yet (main.c takes one per loop pass)
+        self._out = [] # Lines waiting for the next send
+        self.lines_sent = 0
+
+    def run(self):
+        """Until the client disconnects."""
+        next_tick = time.perf_counter()
+        while True:
+            self._queue(self.robot.tick())
+            command = self._next_command()
+            if command is not None:
+                for delay, line in self.robot.execute(command):
+                    if delay and not self.flood:
+                        self._flush()
+                        time.sleep(delay / self.rate)
+                    self._out.append(line)
+            self._flush()
+            if self.flood:
+                if not self._receive(0.0):
+                    return
+                continue
+            next_tick += LOOP_PERIOD_S / self.rate
+            while True: # Sleep until the next pass, taking commands as they arrive
+                if not self._receive(max(0.0, next_tick - time.perf_counter())):
+                    return
+                if time.perf_counter() >= next_tick:
+                    break
+            next_tick = max(next_tick, time.perf_counter() - LOOP_PERIOD_S / self.rate) # Don't burst to catch up
+
+    def _queue(self, lines):
+        self._out.extend(lines)
+
+    def _flush(self):
+        if self._out:
+            self.sock.sendall("".join(self._out).encode("utf-8"))
+            self.lines_sent += len(self._out)
+            self._out = []
+
+    def _receive(self, timeout):
+        """Waits up to timeout for command bytes. Returns False once the client has closed."""
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return True
+        data = self.sock.recv(4096)
+        if not data:
+            return False
+        self.commands.extend(c for c in data.decode("utf-8", errors="replace") if not c.isspace())
+        return True
+
+    def _next_command(self):
+        if self.commands:
+            return self.commands.pop(0)
+        if self.auto:
+            command = self.auto[self._auto_index]
+            self._auto_index = (self._auto_index + 1) % len(self.auto)
+            return command
+        return None
+
+
+def serve(host, port, arena, rate=1.0, flood=False, auto="", seed=288):
+    """Accepts one client at a time (like the CyBot's WiFi bridge); every connection starts a fresh robot."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    print(f"CyBot simulator listening on {host}:{port}")
+    try:
+        while True:
+            client, address = server.accept()
+            print(f"Client connected from {address[0]}:{address[1]}")
+            session = SimulatorSession(client, SimulatedCyBot(arena, seed), rate, flood, auto)
+            start = time.perf_counter()
+            try:
+                session.run()
+            except (BrokenPipeError, ConnectionResetError):
+                pass # The client went away mid-send
+            except OSError as e:
+                print(f"Client connection error: {e}")
+            finally:
+                client.close()
+            elapsed = time.perf_counter() - start
+            print(f"Client disconnected: {session.lines_sent:,} lines in {elapsed:.1f} s "
+                  f"({session.lines_sent / max(elapsed, 1e-9):,.0f} lines/s)")
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates a CyBot (main.c text protocol) on a TCP port.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=CYBOT_PORT)
+    parser.add_argument("--arena", help="arena JSON file (default: a built-in test field)")
+    parser.add_argument("--rate", type=float, default=1.0, help="firmware time multiplier, e.g. 10 = ten times faster")
+    parser.add_argument("--flood", action="store_true", help="no delays at all: send as fast as the client reads")
+    parser.add_argument("--auto", default="", metavar="CMDS", help="commands replayed forever when none are waiting, e.g. mwwd")
+    parser.add_argument("--seed", type=int, default=288)
+    args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    arena = Arena.load(args.arena) if args.arena else Arena.from_dict(DEFAULT_ARENA)
+    try:
+        serve(args.host, args.port, arena, args.rate, args.flood, args.auto, args.seed)
+    except PermissionError:
+        parser.exit(1, f"Cannot bind port {args.port} (ports below 1024 need extra rights); try --port 2888 "
+                       "and set CYBOT_PORT to match.\n")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
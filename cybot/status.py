@@ -0,0 +1,64 @@
+"""Latest-value coalescing for STATUS telemetry.
+
+The firmware sends a STATUS line about every 100 ms. Redrawing the sensor panel
+for each one means a backlog of N lines costs N full redraws, even though only
+the last one is still visible afterwards. StatusCoalescer keeps only the newest
+sample of a drain pass and renders it once when the pass ends.
+
+Edge-triggered information is not lost:
+  * a latched field (a bumper by default) that goes 0 -> 1 anywhere in the pass
+    is rendered as active even if a later line in the same pass has it back at 0;
+  * on_sample runs for every STATUS line, in arrival order, so state that other
+    messages depend on (e.g. borderandholes' last_front_cliff_state, read when a
+    MOVE arrives) is still tracked line by line.
+"""
+
+DEFAULT_LATCH_FIELDS = ("bump_l", "bump_r")
+
+
+class StatusCoalescer:
+    """Collapses the STATUS samples of one drain pass into a single render call.
+
+    render(sample)     -- the script's update_sensor_status (gets a cybot.model.StatusSample)
+    on_sample(sample)  -- optional, called for every STATUS line
+    """
+
+    def __init__(self, render, on_sample=None, latch_fields=DEFAULT_LATCH_FIELDS):
+        self.render = render
+        self.on_sample = on_sample
+        self.latch_fields = tuple(latch_fields)
+        self._latest = None        # Newest sample not rendered yet
+        self._latched = set()      # Latch fields that rose to 1 since the last render
+        self._previous = {}        # Latch field values of the last sample seen (for edge detection)
+        self.received = 0          # STATUS samples pushed
+        self.rendered = 0          # render() calls actually made
+
+    def push(self, sample):
+        """Records one parsed STATUS sample."""
+        self.received += 1
+        for name in self.latch_fields:
+            value = getattr(sample, name)
+            if value == 1 and self._previous.get(name) != 1:
+                self._latched.add(name) # Rising edge: keep it even if it drops again before the render
+            if value is not None:
+                self._previous[name] = value
+        if self.on_sample:
+            self.on_sample(sample)
+        self._latest = sample
+
+    def has_pending(self):
+        return self._latest is not None
+
+    def flush(self):
+        """Renders the newest sample (with latched edges applied), if any arrived since the last flush."""
+        if self._latest is None:
+            return
+        sample = self._latest
+        if self._latched:
+            sample = sample.copy()
+            for name in self._latched:
+                setattr(sample, name, 1)
+        self._latest = None
+        self._latched.clear()
+        self.rendered += 1
+        self.render(sample)
@@ -0,0 +1,71 @@
+"""Cross-thread wake-up for the Tk main loop.
+
+The ingest thread calls notify() after it queues data; the Tk thread then runs
+the drain callback right away instead of finding the data on its next
+``after(100, ...)`` poll. On POSIX a self-pipe is registered with
+``createfilehandler`` so the write from the ingest thread never touches Tcl.
+Elsewhere (Windows) it falls back to a ``<<CyBotWake>>`` virtual event, which
+tkinter marshals onto the Tk thread. Repeated notifies before the callback has
+run are coalesced into one wake-up.
+"""
+import os
+import threading
+import tkinter as tk
+
+WAKE_EVENT = "<<CyBotWake>>"
+
+
+class TkWakeup:
+    """Runs callback on the Tk thread whenever notify() is called from any thread."""
+
+    def __init__(self, widget, callback):
+        self.widget = widget
+        self.callback = callback
+        self._pending = threading.Event() # Set between notify() and the callback running
+        self._read_fd = self._write_fd = None
+        if os.name == "posix" and hasattr(widget.tk, "createfilehandler"):
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._read_fd, False)
+            os.set_blocking(self._write_fd, False)
+            widget.tk.createfilehandler(self._read_fd, tk.READABLE, self._on_readable)
+        else:
+            widget.bind(WAKE_EVENT, self._on_event)
+
+    def notify(self):
+        """Requests a callback on the Tk thread. Safe to call from any thread, cheap when already pending."""
+        if self._pending.is_set():
+            return
+        self._pending.set()
+        try:
+            if self._write_fd is not None:
+                os.write(self._write_fd, b"\0")
+            else:
+                self.widget.event_generate(WAKE_EVENT, when="tail")
+        except (BlockingIOError, OSError, RuntimeError, tk.TclError):
+            pass # Pipe already full (a wake-up is pending) or the window is gone
+
+    def close(self):
+        if self._read_fd is not None:
+            try:
+                self.widget.tk.deletefilehandler(self._read_fd)
+            except tk.TclError:
+                pass
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+            self._read_fd = self._write_fd = None
+
+    def _on_readable(self, fd, mask):
+        try:
+            while os.read(fd, 512):
+                pass
+        except BlockingIOError:
+            pass
+        self._fire()
+
+    def _on_event(self, event):
+        self._fire()
+
+    def _fire(self):
+        # Clear before draining so data queued during the callback triggers another wake-up
+        self._pending.clear()
+        self.callback()
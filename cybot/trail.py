@@ -0,0 +1,292 @@
+"""Movement trail panel: cumulative pose cache plus incremental drawing.
+
+redraw_trail_on_panel used to run on every MOVE: it deleted every trail item,
+replayed the whole movement history from the canvas center (a cos/sin per
+move) and recreated every line, so a run of n moves cost O(n^2) canvas work.
+
+TrailPath keeps the trail as cumulative poses in cm from the start point,
+together with the unit heading vector at each point, computed once per MOVE.
+TrailView draws it: while the canvas size and scale stay the same, a draw()
+only creates the segments added since the previous draw (one line per move).
+A resize or scale change replays the cached poses, which is a multiply-add per
+point and no trigonometry.
+
+MapTrailLayer is the main map's trail (SomewhatWorkingGUI.py). Instead of one
+2-point line item per MOVE it keeps a raw pose log for export and draws each
+continuous path as two polylines: a short live tail, updated with coords(), and
+the older part, simplified with Douglas-Peucker (simplify_polyline) to a pixel
+tolerance before it is appended. The canvas item count no longer grows with
+the length of the run. Its points are world coordinates mapped through a
+cybot.worldmap.Viewport, so the trail follows the map's pan and zoom.
+"""
+import csv
+import math
+from array import array
+
+import tkinter as tk
+
+START_HEADING_DEG = 90.0 # The trail starts facing up
+START_DOT_RADIUS = 3
+MAP_TRAIL_TAIL_POINTS = 64 # Raw points in a live tail before it is simplified into the path's history line
+MAP_TRAIL_TOLERANCE_PX = 1.0 # Douglas-Peucker tolerance on screen; at zoom z it is 1/z map units
+
+
+class TrailPath:
+    """Points where a straight move ended, in cm relative to the start (y up).
+
+    Point 0 is the start. Turns only change the heading; each non-zero
+    distance adds one point, i.e. one segment from the previous point.
+    """
+
+    def __init__(self, start_heading_deg=START_HEADING_DEG):
+        self.start_heading_deg = start_heading_deg
+        self.clear()
+
+    def clear(self):
+        self.heading_deg = self.start_heading_deg
+        rad = math.radians(self.start_heading_deg)
+        self.xs = array('d', [0.0])
+        self.ys = array('d', [0.0])
+        self.cos_h = array('d', [math.cos(rad)]) # Heading of the segment ending at each point, as a unit vector
+        self.sin_h = array('d', [math.sin(rad)])
+        self.markers = [None] # Optional marker kind per point (e.g. the front cliff state seen on arrival)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def add(self, turn_deg, step_cm, marker=None):
+        """Applies one move (turn first, then straight distance). Returns True if it added a segment."""
+        if turn_deg:
+            self.heading_deg = (self.heading_deg - turn_deg) % 360 # Positive turn = clockwise on screen
+        if not step_cm:
+            return False
+        rad = math.radians(self.heading_deg)
+        cos_h, sin_h = math.cos(rad), math.sin(rad)
+        self.xs.append(self.xs[-1] + step_cm * cos_h)
+        self.ys.append(self.ys[-1] + step_cm * sin_h)
+        self.cos_h.append(cos_h)
+        self.sin_h.append(sin_h)
+        self.markers.append(marker)
+        return True
+
+
+class TrailView:
+    """Draws a TrailPath centered on a canvas; only new segments are drawn unless the size or scale changed.
+
+    marker_colors maps marker kinds to colors; marked points get a dashed line
+    of marker_length_px across the trail (tag "cliff_marker").
+    """
+
+    def __init__(self, canvas, path, scale, marker_colors=None, marker_length_px=20):
+        self.canvas = canvas
+        self.path = path
+        self.scale = scale # Pixels per cm
+        self.marker_colors = marker_colors or {}
+        self.marker_length_px = marker_length_px
+        self._drawn_for = None # (width, height, scale) of the last full replay
+        self._drawn = 0 # Path points already on the canvas
+
+    def invalidate(self):
+        """Forces a full replay on the next draw() (after the path was cleared or the canvas wiped)."""
+        self._drawn_for = None
+
+    def draw(self):
+        """Brings the canvas up to date with the path. Returns False while the canvas has no usable size."""
+        canvas = self.canvas
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return False
+        geometry = (width, height, self.scale)
+        if geometry != self._drawn_for or self._drawn > len(self.path):
+            canvas.delete("trail_segment", "cliff_marker", "trail_start_dot")
+            self._drawn_for = geometry
+            self._drawn = 1
+            cx, cy = width / 2, height / 2
+            canvas.create_oval(cx - START_DOT_RADIUS, cy - START_DOT_RADIUS, cx + START_DOT_RADIUS, cy + START_DOT_RADIUS,
+                               fill="blue", outline="blue", tags="trail_start_dot")
+        self._draw_points(self._drawn, len(self.path), width / 2, height / 2)
+        self._drawn = len(self.path)
+        return True
+
+    def _draw_points(self, first, end, cx, cy):
+        canvas, path, scale = self.canvas, self.path, self.scale
+        xs, ys = path.xs, path.ys
+        half_len = self.marker_length_px / 2.0
+        for i in range(first, end):
+            x, y = cx + xs[i] * scale, cy - ys[i] * scale
+            canvas.create_line(cx + xs[i - 1] * scale, cy - ys[i - 1] * scale, x, y,
+                               fill="black", width=2, arrow=tk.LAST, tags="trail_segment")
+            color = self.marker_colors.get(path.markers[i])
+            if color is not None:
+                # Perpendicular to the heading: (cos, sin) rotated by +90 degrees, y inverted on the canvas
+                dx, dy = -half_len * path.sin_h[i], -half_len * path.cos_h[i]
+                canvas.create_line(x - dx, y - dy, x + dx, y + dy, fill=color, width=2,
+                                   dash=(4, 4), tags="cliff_marker")
+
+
+def simplify_polyline(xs, ys, tolerance):
+    """Douglas-Peucker: indices of the points to keep so that no dropped point is
+    farther than tolerance from the simplified line. First and last are always kept.
+    """
+    n = len(xs)
+    if n <= 2:
+        return list(range(n))
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tol_sq = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        x0, y0 = xs[first], ys[first]
+        dx, dy = xs[last] - x0, ys[last] - y0
+        seg_len_sq = dx * dx + dy * dy
+        worst, worst_d = -1, tol_sq
+        for i in range(first + 1, last):
+            px, py = xs[i] - x0, ys[i] - y0
+            if seg_len_sq > 0:
+                cross = px * dy - py * dx
+                d = cross * cross / seg_len_sq # Squared distance to the line through first and last
+            else:
+                d = px * px + py * py # First and last coincide: distance to that point
+            if d > worst_d:
+                worst, worst_d = i, d
+        if worst >= 0:
+            keep[worst] = True
+            stack.append((first, worst))
+            stack.append((worst, last))
+    return [i for i in range(n) if keep[i]]
+
+
+class _MapPath:
+    """One continuous part of the map trail: raw log range, simplified history line and live tail line."""
+    __slots__ = ("first", "history_item", "history_coords", "tail_item", "tail_start")
+
+    def __init__(self, first):
+        self.first = first # Raw log index of the path's first point
+        self.history_item = None
+        self.history_coords = [] # Flat, simplified points first..tail_start (trail coordinates)
+        self.tail_item = None
+        self.tail_start = first # Raw log index where the live tail begins
+
+
+class MapTrailLayer:
+    """The robot's trail on the main map, as a few long polylines instead of one item per move.
+
+    Points are world cm when a viewport (cybot.worldmap.Viewport) is given,
+    otherwise canvas pixels. Every extend() goes to the raw pose log (x, y,
+    heading), which is never simplified (write_csv()). The canvas shows one
+    history line plus one live tail per continuous path; a new path starts
+    whenever a segment does not begin where the last one ended (e.g. after the
+    robot was reset to the origin). The history is simplified to tolerance_px
+    on screen at the viewport's zoom; redraw() follows pans and zooms.
+    """
+
+    def __init__(self, canvas, viewport=None, tag="trail", tolerance_px=MAP_TRAIL_TOLERANCE_PX,
+                 tail_points=MAP_TRAIL_TAIL_POINTS, **line_options):
+        self.canvas = canvas
+        self.viewport = viewport
+        self.tag = tag
+        self.tolerance_px = tolerance_px
+        self.tail_points = max(3, tail_points)
+        self.line_options = line_options # create_line options (fill, width, ...)
+        self.zoom = viewport.zoom if viewport is not None else 1.0 # Pixels per unit the history was simplified for
+        self.xs = array('d') # Raw pose log
+        self.ys = array('d')
+        self.headings = array('d')
+        self._paths = [] # _MapPath per continuous part currently drawn
+        self._drawn_for = self._view_key() # Viewport mapping the items' coordinates were computed for
+
+    def __len__(self):
+        return len(self.xs)
+
+    def item_count(self):
+        """Canvas items currently used by the trail."""
+        return sum((path.history_item is not None) + (path.tail_item is not None) for path in self._paths)
+
+    def extend(self, from_x, from_y, to_x, to_y, heading_deg):
+        """Adds the segment (from -> to) the robot just drove."""
+        self.redraw() # Items must match the current mapping before new coordinates are added
+        path = self._paths[-1] if self._paths else None
+        tolerance = self.tolerance_px / self.zoom
+        if path is None or abs(self.xs[-1] - from_x) > tolerance or abs(self.ys[-1] - from_y) > tolerance:
+            if not self.xs or self.xs[-1] != from_x or self.ys[-1] != from_y:
+                self._log(from_x, from_y, heading_deg) # Else (e.g. after clear()) the log already ends there
+            path = _MapPath(len(self.xs) - 1)
+            self._paths.append(path)
+        self._log(to_x, to_y, heading_deg)
+        if len(self.xs) - path.tail_start >= self.tail_points:
+            # All but the last segment of the tail go into the history line
+            end = len(self.xs) - 2
+            self._append_history(path, path.tail_start, end)
+            path.tail_start = end
+        self._draw_tail(path)
+
+    def clear(self):
+        """Removes the drawn trail. The raw pose log is kept (a cleared trail is still exported)."""
+        self.canvas.delete(self.tag)
+        self._paths = []
+
+    def redraw(self):
+        """Brings the items up to date after the viewport changed (pan, zoom, resize); cheap when it did not.
+
+        A new zoom re-simplifies the history, so the tolerance stays tolerance_px on screen.
+        """
+        key = self._view_key()
+        if key == self._drawn_for:
+            return
+        self._drawn_for = key
+        if self.viewport.zoom != self.zoom:
+            self.zoom = self.viewport.zoom
+            for path in self._paths:
+                path.history_coords = []
+                self._append_history(path, path.first, path.tail_start)
+        else:
+            for path in self._paths:
+                if path.history_item is not None:
+                    self.canvas.coords(path.history_item, self._screen(path.history_coords))
+        for path in self._paths:
+            self._draw_tail(path)
+
+    def write_csv(self, file):
+        """Writes the raw pose log (x, y, heading_deg; cm with a viewport, else pixels) to an open text file."""
+        unit = "cm" if self.viewport is not None else "px"
+        writer = csv.writer(file)
+        writer.writerow((f"x_{unit}", f"y_{unit}", "heading_deg"))
+        writer.writerows(zip(self.xs, self.ys, self.headings))
+
+    def _view_key(self):
+        return None if self.viewport is None else self.viewport.key()
+
+    def _screen(self, coords):
+        return coords if self.viewport is None else self.viewport.screen_coords(coords)
+
+    def _log(self, x, y, heading_deg):
+        self.xs.append(x)
+        self.ys.append(y)
+        self.headings.append(heading_deg)
+
+    def _append_history(self, path, first, last):
+        """Appends raw points first..last (inclusive) to the path's history line, simplified."""
+        if last <= first:
+            return
+        xs, ys = self.xs[first:last + 1], self.ys[first:last + 1]
+        kept = simplify_polyline(xs, ys, self.tolerance_px / self.zoom)
+        coords = path.history_coords
+        if coords:
+            kept = kept[1:] # Its first point is the previous chunk's last point
+        for i in kept:
+            coords += (xs[i], ys[i])
+        if path.history_item is None:
+            path.history_item = self.canvas.create_line(self._screen(coords), tags=self.tag, **self.line_options)
+        else:
+            self.canvas.coords(path.history_item, self._screen(coords))
+
+    def _draw_tail(self, path):
+        xs, ys = self.xs, self.ys
+        coords = []
+        for i in range(path.tail_start, len(xs)):
+            coords += (xs[i], ys[i])
+        if path.tail_item is None:
+            path.tail_item = self.canvas.create_line(self._screen(coords), tags=self.tag, **self.line_options)
+        else:
+            self.canvas.coords(path.tail_item, self._screen(coords))
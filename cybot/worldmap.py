@@ -0,0 +1,218 @@
+"""World-coordinate map view: pan/zoom viewport and a tiled, cached raster layer.
+
+The main map used to be the canvas itself: the robot started at the canvas
+center, MAP_SCALE was fixed at 2 px/cm and a robot that drove past the edge
+was simply off-screen. Positions are now world cm (x right, y up, the start
+pose at the origin) and a Viewport maps them onto the canvas:
+
+  * pan()/zoom_at()/center_on() change what is shown. Vector items (trail
+    pieces, objects, bumps) carry follow_tag and are moved/scaled with the
+    canvas' own ``move``/``scale`` commands, so they are never recreated;
+  * zoom goes through fixed levels (powers of two by default), so a tile is
+    a whole number of pixels at every level and tiles line up without seams.
+
+TileLayer draws a tiled raster source (cybot.occupancy.OccupancyGrid) on the
+canvas. Only tiles that exist and intersect the viewport get an image item;
+rendered tiles are PhotoImages kept in an LRU cache keyed by tile and zoom
+level, and re-rendered only when the source reports a new tile version.
+"""
+import math
+from collections import OrderedDict
+
+import tkinter as tk
+
+ZOOM_LEVELS = (0.25, 0.5, 1.0, 2.0, 4.0) # Canvas pixels per cm
+DEFAULT_ZOOM = 2.0
+TILE_CACHE_SIZE = 96 # Rendered tile images kept (one per tile and zoom level)
+
+
+class Viewport:
+    """World cm <-> canvas pixels for one canvas: the world point center_x/y_cm is at the canvas center."""
+
+    def __init__(self, canvas, zoom=DEFAULT_ZOOM, zoom_levels=ZOOM_LEVELS, follow_tag="world_item"):
+        self.canvas = canvas
+        self.zoom_levels = tuple(sorted(zoom_levels))
+        if zoom not in self.zoom_levels:
+            raise ValueError(f"zoom {zoom} is not one of {self.zoom_levels}")
+        self.zoom = zoom
+        self.follow_tag = follow_tag # Canvas items in world coordinates that pan/zoom must move along
+        self.center_x_cm = self.center_y_cm = 0.0
+        self.width = self.height = 0 # Canvas size, kept up to date by resize()
+
+    def key(self):
+        """Changes whenever the mapping changes (for views that redraw on change)."""
+        return (self.center_x_cm, self.center_y_cm, self.zoom, self.width, self.height)
+
+    def to_screen(self, x_cm, y_cm):
+        return ((x_cm - self.center_x_cm) * self.zoom + self.width / 2,
+                self.height / 2 - (y_cm - self.center_y_cm) * self.zoom)
+
+    def to_world(self, x_px, y_px):
+        return (self.center_x_cm + (x_px - self.width / 2) / self.zoom,
+                self.center_y_cm - (y_px - self.height / 2) / self.zoom)
+
+    def screen_coords(self, coords):
+        """Flat world [x0, y0, x1, y1, ...] -> flat canvas coordinates."""
+        zoom, ox, oy = self.zoom, self.width / 2 - self.center_x_cm * self.zoom, self.height / 2 + self.center_y_cm * self.zoom
+        out = [0.0] * len(coords)
+        out[0::2] = [x * zoom + ox for x in coords[0::2]]
+        out[1::2] = [oy - y * zoom for y in coords[1::2]]
+        return out
+
+    def bounds(self):
+        """Visible world rectangle (x0, y0, x1, y1)."""
+        x0, y1 = self.to_world(0, 0)
+        x1, y0 = self.to_world(self.width, self.height)
+        return x0, y0, x1, y1
+
+    def contains(self, x_cm, y_cm, margin_px=0):
+        """True if the world point is on the canvas, at least margin_px from every edge."""
+        x, y = self.to_screen(x_cm, y_cm)
+        return margin_px <= x <= self.width - margin_px and margin_px <= y <= self.height - margin_px
+
+    def resize(self, width, height):
+        """New canvas size (from <Configure>); the world center stays at the canvas center. Returns True if it changed."""
+        if (width, height) == (self.width, self.height):
+            return False
+        self._apply(lambda: self._set_size(width, height))
+        return True
+
+    def pan(self, dx_px, dy_px):
+        """Moves the view contents by (dx, dy) pixels (a drag)."""
+        if dx_px or dy_px:
+            self._apply(lambda: self._set_center(self.center_x_cm - dx_px / self.zoom, self.center_y_cm + dy_px / self.zoom))
+
+    def center_on(self, x_cm, y_cm):
+        self._apply(lambda: self._set_center(x_cm, y_cm))
+
+    def zoom_at(self, steps, x_px, y_px):
+        """Goes steps zoom levels in (>0) or out (<0), keeping the world point under (x_px, y_px) in place.
+
+        Returns True if the zoom changed (False at the first/last level).
+        """
+        index = self.zoom_levels.index(self.zoom)
+        new_index = min(max(index + steps, 0), len(self.zoom_levels) - 1)
+        if new_index == index:
+            return False
+        anchor_x, anchor_y = self.to_world(x_px, y_px)
+        new_zoom = self.zoom_levels[new_index]
+
+        def change():
+            self.zoom = new_zoom
+            self._set_center(anchor_x - (x_px - self.width / 2) / new_zoom, anchor_y + (y_px - self.height / 2) / new_zoom)
+        self._apply(change)
+        return True
+
+    def _set_center(self, x_cm, y_cm):
+        self.center_x_cm, self.center_y_cm = x_cm, y_cm
+
+    def _set_size(self, width, height):
+        self.width, self.height = width, height
+
+    def _apply(self, change):
+        """Runs change() and moves/scales the follow_tag items to the new mapping."""
+        old_x, old_y = self.to_screen(0.0, 0.0)
+        old_zoom = self.zoom
+        change()
+        new_x, new_y = self.to_screen(0.0, 0.0)
+        if self.zoom != old_zoom:
+            factor = self.zoom / old_zoom
+            self.canvas.scale(self.follow_tag, old_x, old_y, factor, factor)
+        if (new_x, new_y) != (old_x, old_y):
+            self.canvas.move(self.follow_tag, new_x - old_x, new_y - old_y)
+
+
+class TileLayer:
+    """Draws the tiles of a tiled source that are in view, one image item per tile, below every other item.
+
+    source needs tile_cm, tile_keys_in(x0, y0, x1, y1), tile_bounds(key),
+    tile_version(key) and render_tile(key, size_px) -> uint8 RGB array.
+    hits/misses count cached and newly rendered tile images.
+    """
+
+    def __init__(self, canvas, viewport, source, tag="map_tile", cache_size=TILE_CACHE_SIZE):
+        self.canvas = canvas
+        self.viewport = viewport
+        self.source = source
+        self.tag = tag
+        self.cache_size = cache_size
+        self._cache = OrderedDict() # (tile key, zoom) -> [version, PhotoImage], least recently used first
+        self._items = {} # Tile key -> canvas image item currently showing it
+        self._spare = [] # Hidden image items, reused before creating new ones
+        self.hits = 0
+        self.misses = 0
+
+    def draw(self):
+        """Shows the visible tiles. Returns False while the canvas has no usable size."""
+        viewport = self.viewport
+        if viewport.width <= 1 or viewport.height <= 1:
+            return False
+        canvas, zoom = self.canvas, viewport.zoom
+        size_px = int(round(self.source.tile_cm * zoom))
+        visible = self.source.tile_keys_in(*viewport.bounds())
+        items = {}
+        for key in visible:
+            photo = self._photo(key, zoom, size_px)
+            x0, _, _, y1 = self.source.tile_bounds(key)
+            x, y = viewport.to_screen(x0, y1) # Top-left corner
+            item = self._items.pop(key, None)
+            if item is None:
+                if self._spare:
+                    item = self._spare.pop()
+                    canvas.itemconfigure(item, state="normal")
+                else:
+                    item = canvas.create_image(0, 0, anchor="nw", tags=self.tag)
+                    canvas.tag_lower(item)
+            canvas.itemconfigure(item, image=photo)
+            canvas.coords(item, round(x), round(y))
+            items[key] = item
+        for item in self._items.values(): # Tiles scrolled out of view
+            canvas.itemconfigure(item, state="hidden", image="")
+            self._spare.append(item)
+        self._items = items
+        self._evict(len(items))
+        return True
+
+    def clear(self):
+        """Hides every tile and drops the cached images (e.g. after the source was cleared)."""
+        for item in self._items.values():
+            self.canvas.itemconfigure(item, state="hidden", image="")
+            self._spare.append(item)
+        self._items = {}
+        self._cache.clear()
+
+    def _photo(self, key, zoom, size_px):
+        version = self.source.tile_version(key)
+        entry = self._cache.get((key, zoom))
+        if entry is not None:
+            self._cache.move_to_end((key, zoom))
+            if entry[0] == version:
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        pixels = self.source.render_tile(key, size_px)
+        ppm = b"P6 %d %d 255\n" % (size_px, size_px) + pixels.tobytes()
+        if entry is None:
+            photo = tk.PhotoImage(master=self.canvas, width=size_px, height=size_px, data=ppm, format="PPM")
+            self._cache[(key, zoom)] = [version, photo]
+        else:
+            photo = entry[1]
+            photo.configure(data=ppm, format="PPM")
+            entry[0] = version
+        return photo
+
+    def _evict(self, in_use):
+        """Drops least recently used images beyond cache_size; images on screen (the newest in_use) are kept."""
+        excess = len(self._cache) - max(self.cache_size, in_use)
+        for _ in range(max(0, excess)):
+            self._cache.popitem(last=False)
+
+
+def wheel_steps(event):
+    """Zoom steps for a mouse wheel event: <MouseWheel> (Windows/macOS delta) or <Button-4>/<Button-5> (X11)."""
+    if getattr(event, "num", None) == 4:
+        return 1
+    if getattr(event, "num", None) == 5:
+        return -1
+    delta = getattr(event, "delta", 0)
+    return int(math.copysign(1, delta)) if delta else 0
@@ -0,0 +1,84 @@
+"""Ordering and counters of cybot.ingestqueue.IngestQueue (no display needed).
+
+Run from the repo root:  python -m unittest discover -s tests   (or python -m pytest tests)
+"""
+import queue
+import unittest
+
+from cybot.ingestqueue import IngestQueue
+
+STATUS = "STATUS:BUMP_L={},BUMP_R=0,CLIFF_L_SIG=1500,CLIFF_FL_SIG=1500,CLIFF_FR_SIG=1500,CLIFF_R_SIG=1500,PING={}.00"
+
+
+def drain(q):
+    """Every item get_nowait() hands out, flattened to lines (non-list items as they are)."""
+    out = []
+    while True:
+        try:
+            item = q.get_nowait()[0]
+        except queue.Empty:
+            return out
+        if isinstance(item, list):
+            out.extend(item)
+        else:
+            out.append(item)
+
+
+class IngestQueueTest(unittest.TestCase):
+
+    def test_room_keeps_every_line_in_order(self):
+        q = IngestQueue(max_lines=100)
+        q.put([STATUS.format(0, 1), "SCAN:ANGLE=0.00,DIST_CM=50.00,IR_RAW=900", "INFO:a"])
+        q.put(["MOVE: ANGLE_DEG=0.00,DIST_CM=10.00", STATUS.format(0, 2)])
+        q.put("CONNECTION_CLOSED")
+        self.assertEqual(drain(q), [STATUS.format(0, 1), "SCAN:ANGLE=0.00,DIST_CM=50.00,IR_RAW=900", "INFO:a",
+                                    "MOVE: ANGLE_DEG=0.00,DIST_CM=10.00", STATUS.format(0, 2), "CONNECTION_CLOSED"])
+        self.assertEqual(q.stats()["superseded"], 0)
+        self.assertEqual(q.lines_queued, 0)
+        self.assertTrue(q.empty())
+
+    def test_superseded_status_does_not_jump_ahead(self):
+        q = IngestQueue(max_lines=2)
+        q.put([STATUS.format(0, 1), "SCAN:1", "INFO:a"])
+        q.put(["MOVE:1", STATUS.format(0, 2), "DEBUG:b"])
+        q.put("LOST")
+        q.put([STATUS.format(0, 3)])
+        # a=2 was over capacity and waited alone; a=3 replaced it at the tail, behind MOVE and LOST
+        self.assertEqual(drain(q), [STATUS.format(0, 1), "SCAN:1", "MOVE:1", "LOST", STATUS.format(0, 3)])
+        stats = q.stats()
+        self.assertEqual(stats["dropped"], {"INFO": 1, "DEBUG": 1})
+        self.assertEqual(stats["superseded"], 1)
+        self.assertEqual(stats["overflow"], 1) # MOVE:1 is kept although the queue was full
+        self.assertEqual(q.lines_queued, 0)
+
+    def test_qsize_skips_superseded_entries(self):
+        q = IngestQueue(max_lines=1)
+        q.put(["SCAN:1"])
+        q.put([STATUS.format(0, 1)])
+        q.put([STATUS.format(0, 2)])
+        self.assertEqual(q.qsize(), 2)
+        self.assertEqual(q.lines_queued, 2)
+        drain(q)
+        self.assertEqual(q.qsize(), 0)
+        # The slot was delivered, so the next over-capacity line starts a new one
+        q.put(["SCAN:2"])
+        q.put([STATUS.format(0, 3)])
+        self.assertEqual(drain(q), ["SCAN:2", STATUS.format(0, 3)])
+
+    def test_bump_edge_survives_superseding(self):
+        q = IngestQueue(max_lines=1)
+        q.put(["SCAN:1"])
+        q.put([STATUS.format(1, 1), STATUS.format(0, 2)])
+        q.put([STATUS.format(0, 3)])
+        self.assertEqual(drain(q), ["SCAN:1", STATUS.format(1, 3)])
+        self.assertEqual(q.stats()["superseded"], 2)
+
+    def test_stamps_travel_with_the_entry(self):
+        q = IngestQueue()
+        q.put(["SCAN:1"], 1.0, 2.0)
+        self.assertEqual(q.get_nowait(), (["SCAN:1"], 1.0, 2.0))
+        self.assertRaises(queue.Empty, q.get_nowait)
+
+
+if __name__ == "__main__":
+    unittest.main()